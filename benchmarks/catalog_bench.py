@@ -0,0 +1,112 @@
+"""
+Catalogue refresh benchmark: what a refresh costs against the mock stores'
+sitemaps, from the first full pass to refreshes after a few changes.
+
+Runs CatalogRefresher over every store's mock catalogue (robots.txt, a
+sitemap index, paged product sitemaps, JSON-LD product pages) in one process,
+page cache included, and reports per step the requests served, how many of
+them were 304 Not Modified, sitemaps read, product pages fetched, removals
+found and change events.
+
+    python benchmarks/catalog_bench.py
+    python benchmarks/catalog_bench.py --catalog-size 1000 --latency 30 --json catalog.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import old_stores  # noqa: E402
+from catalog_refresh import FULL_RECHECK_AFTER, STORE_SITES, CatalogRefresher  # noqa: E402
+from mock_stores import MockStores  # noqa: E402
+
+# Catalogue edits between the second and third refresh: (store, changed, removed, added)
+CHANGES = [("Sigma", 5, 0, 3), ("KimoStore", 2, 2, 0)]
+
+
+def run_step(mock, name, refresher, full=False):
+    """One refresh; returns its report row and events"""
+    requests, not_modified = mock.requests, mock.not_modified
+    refresher.full_recheck_after = 0 if full else FULL_RECHECK_AFTER
+    started = time.perf_counter()
+    events = refresher.refresh()
+    elapsed = time.perf_counter() - started
+    stats = refresher.last_stats
+    return {
+        "step": name,
+        "requests": mock.requests - requests,
+        "not_modified": mock.not_modified - not_modified,
+        "sitemaps_read": stats.get("sitemaps_read", 0),
+        "fetched": stats.get("fetched", 0),
+        "removed": stats.get("removed", 0),
+        "events": len(events),
+        "seconds": round(elapsed, 2),
+    }, events
+
+
+def run(args):
+    old_stores.configure_rate_limits({store: (0, 1) for store in old_stores.STORE_HOSTS}, default=(0, 1))
+    state = Path(tempfile.mkdtemp()) / "catalog-state.json"
+    results = []
+    with MockStores(latency_ms=args.latency, jitter_ms=args.jitter, page_kb=args.page_kb,
+                    catalog_size=args.catalog_size) as mock:
+        mock.route_scrapers()
+        refresher = CatalogRefresher(state, max_pages=args.max_pages)
+        # The scrapers' page helpers print progress; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(run_step(mock, "first pass", refresher)[0])
+            results.append(run_step(mock, "unchanged", refresher)[0])
+            changed = {}
+            for seed, (store, n_changed, n_removed, n_added) in enumerate(CHANGES):
+                for kind, urls in mock.change_catalog(store, n_changed, n_removed, n_added, seed=seed).items():
+                    changed.setdefault(kind, []).extend(urls)
+            row, events = run_step(mock, "after changes", refresher)
+            results.append(row)
+            results.append(run_step(mock, "full re-read", refresher, full=True)[0])
+
+    kinds = {}
+    for event in events:
+        kinds[event["kind"]] = kinds.get(event["kind"], 0) + 1
+    expected = {kind: len(urls) for kind, urls in changed.items()}
+    return results, kinds, expected
+
+
+def print_table(results):
+    print(f"{'step':16} {'requests':>9} {'304s':>6} {'sitemaps':>9} {'pages':>6} {'removed':>8} {'events':>7} {'s':>7}")
+    for r in results:
+        print(f"{r['step']:16} {r['requests']:>9} {r['not_modified']:>6} {r['sitemaps_read']:>9} "
+              f"{r['fetched']:>6} {r['removed']:>8} {r['events']:>7} {r['seconds']:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catalogue refresh cost against the mock stores' sitemaps")
+    parser.add_argument("--catalog-size", type=int, default=150, help="products per store")
+    parser.add_argument("--latency", type=float, default=0, help="mock response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="uniform +/- jitter in ms")
+    parser.add_argument("--page-kb", type=int, default=2, help="approximate product page size")
+    parser.add_argument("--max-pages", type=int, help="product pages fetched per store and refresh")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results, kinds, expected = run(args)
+    print(f"Mock catalogue: {len(STORE_SITES)} stores x {args.catalog_size} products; "
+          f"changes: {', '.join(f'{n} {k}' for k, n in expected.items())}\n")
+    print_table(results)
+    print(f"\nEvents after changes: {', '.join(f'{n} {k}' for k, n in sorted(kinds.items())) or 'none'}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "results": results, "events": kinds}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Cold import-time check for the scraping library.
+
+Imports each module in a fresh interpreter, reports the best of several runs
+and fails when it goes over budget or drags in a UI/heavy dependency that
+should only load on first use.
+
+    python benchmarks/import_time.py
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# module -> (budget in ms, modules that must NOT be loaded by importing it)
+BUDGETS = {
+    "offers": (50, ["pandas", "numpy", "streamlit"]),
+    "old_stores": (100, ["streamlit", "pandas", "requests", "bs4"]),
+}
+
+RUNS = 5
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": sorted(m for m in {forbidden!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module, forbidden):
+    """Best-of-RUNS cold import time in ms, plus any forbidden modules it loaded"""
+    best = None
+    loaded = []
+    for _ in range(RUNS):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, forbidden=forbidden)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        best = result["ms"] if best is None else min(best, result["ms"])
+        loaded = result["loaded"]
+    return best, loaded
+
+
+def main():
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        ms, loaded = measure(module, forbidden)
+        ok = ms <= budget and not loaded
+        failed |= not ok
+        status = "✅" if ok else "❌"
+        extra = f" (loaded: {', '.join(loaded)})" if loaded else ""
+        print(f"{status} import {module}: {ms:.1f} ms (budget {budget} ms){extra}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Load test: many concurrent app users searching against the mock stores.
+
+Each simulated user behaves like an app session: it picks queries from a
+weighted mix, keeps its own 5-minute result cache (as scrape_all_optimized
+does in st.session_state) and calls the engine's search() on a miss, with
+think time in between. The mock server runs in a separate process, so the
+threads, sockets and memory reported here are the scraping side only.
+
+    python benchmarks/load_test.py --users 1,4,16 --duration 60
+    python benchmarks/load_test.py --users 8,32 --latency 150 --jitter 80 --json load.json
+
+Per concurrency level it reports search latency, the queueing delay before a
+store scraper starts (the engine's per-search thread pool), peak threads and
+open sockets, RSS growth, and how often the session cache, the shared
+single-flight search and the product-page cache saved work.
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import old_stores  # noqa: E402
+import price_engine  # noqa: E402
+import telemetry  # noqa: E402
+from mock_stores import route_to  # noqa: E402
+from scrape_bench import percentile  # noqa: E402
+
+# (query, weight): a few hot queries and a long tail, like real traffic
+QUERY_MIX = [
+    ("rtx 4070", 20), ("rtx 4060", 14), ("ryzen 5 7600", 10), ("ssd 1tb", 9), ("rtx 4070 super", 7),
+    ("rx 7800 xt", 6), ("i5 13400f", 5), ("ddr5 32gb", 5), ("b650 motherboard", 4), ("rtx 4090", 3),
+    ("750w psu", 3), ("27 inch monitor", 3), ("nvme 2tb", 2), ("i7 14700k", 2), ("rx 7600", 2),
+]
+
+SESSION_CACHE_TTL = 300  # same as the app
+
+# Set by each simulated user around a search; the engine copies the context
+# into its scraper threads, so a scraper can tell how long it sat in the queue
+_search_started = ContextVar("search_started", default=None)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.queue_delays = []
+        self.session_hits = 0
+        self.session_misses = 0
+        self.errors = 0
+
+    def add(self, attr, value):
+        with self.lock:
+            getattr(self, attr).append(value)
+
+    def count(self, attr):
+        with self.lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+
+def instrument_scrapers(recorder):
+    """Wrap the engine's store scrapers to record their queueing delay"""
+    def wrap(func):
+        @functools.wraps(func)
+        def queued(query):
+            started = _search_started.get()
+            if started is not None:
+                recorder.add("queue_delays", time.perf_counter() - started)
+            return func(query)
+        return queued
+
+    for name, func in list(price_engine.STORE_SCRAPERS.items()):
+        price_engine.STORE_SCRAPERS[name] = wrap(func)
+
+
+def open_sockets():
+    """Sockets open in this process (Linux /proc), or None where unavailable"""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        with contextlib.suppress(OSError):
+            count += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+    return count
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Sampler(threading.Thread):
+    """Peak thread and socket counts while a level runs"""
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_sockets = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            sockets = open_sockets()
+            if sockets is not None:
+                self.peak_sockets = max(self.peak_sockets, sockets)
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def simulate_user(user_id, deadline, args, recorder):
+    rng = random.Random(f"{args.seed}-{user_id}")
+    queries, weights = zip(*QUERY_MIX)
+    cache = {}  # the session's own result cache
+
+    while time.perf_counter() < deadline:
+        query = rng.choices(queries, weights)[0]
+        stores = None
+        if rng.random() < args.subset_share:
+            stores = rng.sample(list(price_engine.STORE_SCRAPERS), rng.randint(2, 5))
+        key = price_engine.search_key(query, stores)
+
+        cached = cache.get(key)
+        if cached and time.monotonic() - cached < SESSION_CACHE_TTL:
+            recorder.count("session_hits")
+        else:
+            recorder.count("session_misses")
+            token = _search_started.set(time.perf_counter())
+            started = time.perf_counter()
+            try:
+                price_engine.search(query, stores)
+                cache[key] = time.monotonic()
+            except Exception:
+                recorder.count("errors")
+            finally:
+                recorder.add("latencies", time.perf_counter() - started)
+                _search_started.reset(token)
+
+        time.sleep(rng.expovariate(1 / args.think) if args.think else 0)
+
+
+def run_level(users, args):
+    recorder = Recorder()
+    instrument_scrapers(recorder)
+    old_stores.clear_page_cache()
+    telemetry.reset()
+    searches_before = price_engine.search_stats()
+    rss_before = rss_mb()
+
+    sampler = Sampler()
+    sampler.start()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=simulate_user, args=(i, deadline, args, recorder), name=f"user-{i}")
+        for i in range(users)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+
+    # Undo the wrappers so the next level wraps the originals again
+    for name, func in list(price_engine.STORE_SCRAPERS.items()):
+        price_engine.STORE_SCRAPERS[name] = getattr(func, "__wrapped__", func)
+
+    searches = price_engine.search_stats()
+    pages = old_stores.page_cache_stats()
+    page_lookups = pages["hits"] + pages["misses"] + pages["coalesced"]
+    lookups = recorder.session_hits + recorder.session_misses
+    requests_sent = sum(row.get("http_requests", 0) for row in telemetry.store_summary())
+
+    return {
+        "users": users,
+        "elapsed_s": round(elapsed, 1),
+        "searches": lookups,
+        "scrapes": searches["calls"] - searches_before["calls"]
+                   - (searches["coalesced"] - searches_before["coalesced"]),
+        "errors": recorder.errors,
+        "searches_per_s": round(lookups / elapsed, 2),
+        "latency_p50_ms": round(percentile(recorder.latencies, 50) * 1000),
+        "latency_p95_ms": round(percentile(recorder.latencies, 95) * 1000),
+        "latency_p99_ms": round(percentile(recorder.latencies, 99) * 1000),
+        "queue_p50_ms": round(percentile(recorder.queue_delays, 50) * 1000),
+        "queue_p95_ms": round(percentile(recorder.queue_delays, 95) * 1000),
+        "peak_threads": sampler.peak_threads,
+        "peak_sockets": sampler.peak_sockets,
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "session_cache_hit_ratio": round(recorder.session_hits / lookups, 3) if lookups else None,
+        "coalesced_searches": searches["coalesced"] - searches_before["coalesced"],
+        "page_cache_hit_ratio": round((pages["hits"] + pages["coalesced"]) / page_lookups, 3) if page_lookups else None,
+        "http_requests": requests_sent,
+    }
+
+
+@contextlib.contextmanager
+def mock_server(args):
+    """Start benchmarks/mock_stores.py in a child process (or use --mock-url)"""
+    if args.mock_url:
+        yield args.mock_url
+        return
+
+    cmd = [sys.executable, str(Path(__file__).with_name("mock_stores.py")), "serve", "--port", str(args.mock_port),
+           "--latency", str(args.latency), "--jitter", str(args.jitter), "--page-kb", str(args.page_kb)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", args.mock_port), timeout=0.2):
+                break
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("mock store server did not start")
+        yield f"http://127.0.0.1:{args.mock_port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def print_table(rows):
+    columns = [
+        ("users", "users"), ("searches", "searches"), ("scrapes", "scrapes"), ("searches_per_s", "srch/s"),
+        ("latency_p50_ms", "p50 ms"), ("latency_p95_ms", "p95 ms"), ("latency_p99_ms", "p99 ms"),
+        ("queue_p50_ms", "queue p50"), ("queue_p95_ms", "queue p95"), ("peak_threads", "threads"),
+        ("peak_sockets", "sockets"), ("rss_growth_mb", "+RSS MB"), ("session_cache_hit_ratio", "sess hit"),
+        ("coalesced_searches", "joined"), ("page_cache_hit_ratio", "page hit"), ("http_requests", "requests"),
+    ]
+    print(" ".join(f"{title:>9}" for _, title in columns))
+    for row in rows:
+        print(" ".join(f"{'' if row[key] is None else row[key]:>9}" for key, _ in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent app users against the mock stores")
+    parser.add_argument("--users", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=60, help="seconds per level (running searches finish)")
+    parser.add_argument("--think", type=float, default=2.0, help="mean think time between searches in seconds")
+    parser.add_argument("--subset-share", type=float, default=0.3,
+                        help="share of searches limited to a few stores instead of all")
+    parser.add_argument("--latency", type=float, default=80, help="mock response latency in ms")
+    parser.add_argument("--jitter", type=float, default=40, help="uniform +/- jitter in ms")
+    parser.add_argument("--page-kb", type=int, default=60)
+    parser.add_argument("--mock-port", type=int, default=8901)
+    parser.add_argument("--mock-url", help="use an already running mock server instead of starting one")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="apply the real per-store rate limits")
+    parser.add_argument("--parse-processes", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the per-level results to this file")
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.users.split(",")]
+    logging.basicConfig(level=logging.ERROR, format="%(levelname)s %(name)s: %(message)s")
+    if not args.keep_rate_limits:
+        old_stores.configure_rate_limits({store: (0, 1) for store in old_stores.STORE_HOSTS}, default=(0, 1))
+    old_stores.configure_parse_pool(args.parse_processes)
+
+    rows = []
+    with mock_server(args) as url:
+        route_to(url)
+        for users in levels:
+            print(f"Running {users} users for {args.duration:g}s...", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):
+                rows.append(run_level(users, args))
+
+    print_table(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "levels": rows}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
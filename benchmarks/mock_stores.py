@@ -0,0 +1,570 @@
+"""
+Local stand-in for the 18 store sites, for benchmarks and load tests.
+
+Serves each store's search endpoint in the format its scraper parses (journal3
+and WoodMart JSON, Shopify suggest JSON, search-page HTML) and product pages
+with the stock/price markup the stock parsers look for. Responses come from
+recorded fixtures when there are any for the URL, otherwise they are
+generated deterministically from the query. Each store also has a catalogue
+of catalog_size products behind robots.txt and a sitemap index, which
+change_catalog() edits between catalogue refreshes.
+
+    python benchmarks/mock_stores.py serve --port 8900 --latency 80 --jitter 40
+    python benchmarks/mock_stores.py record --query "rtx 4070"   # needs internet
+
+In-process use (what the benchmarks do):
+
+    with MockStores(latency_ms=50) as mock:
+        mock.route_scrapers()          # old_stores' session now talks to the mock
+        search("rtx 4070")
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import old_stores  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# Query-string keys the store search endpoints use
+QUERY_KEYS = ["search", "keyword", "query", "q", "s", "search_query"]
+
+BRANDS = ["MSI", "ASUS", "Gigabyte", "Zotac", "PNY", "Palit", "Gainward", "Inno3D"]
+VARIANTS = ["Gaming X", "Ventus 2X", "TUF OC", "Eagle", "Twin Edge", "Dual", "Phoenix", "Aero OC",
+            "Trio", "Windforce", "AMP", "Verto", "StormX", "JetStream", "Prime", "Strix"]
+
+
+def fixture_key(host, path_qs):
+    return hashlib.sha1(f"{host}{path_qs}".encode()).hexdigest()[:16]
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Recorded responses, keyed by fixture_key(host, path?query)"""
+    fixtures = {}
+    if directory.is_dir():
+        for path in directory.glob("*/*.json"):
+            record = json.loads(path.read_text(encoding="utf-8"))
+            fixtures[fixture_key(record["host"], record["path"])] = record
+    return fixtures
+
+
+# === Generated responses ===
+
+def _products(host, query, count):
+    """Deterministic product list for a store and query"""
+    rng = random.Random(f"{host}|{query.lower()}")
+    words = query.upper() if query else "RTX 4070"
+    products = []
+    for i in range(count):
+        name = f"{rng.choice(BRANDS)} {words} {rng.choice(VARIANTS)} {8 + 4 * (i % 3)}GB"
+        slug = f"{name.lower().replace(' ', '-')}-{i}"
+        products.append({"name": name, "slug": slug, "price": rng.randrange(8000, 120000, 50)})
+    return products
+
+
+def _money(price, european=False):
+    amount = f"{price:,}".replace(",", ".") if european else f"{price:,}"
+    return (f'<span class="woocommerce-Price-amount amount"><bdi>{amount}&nbsp;'
+            f'<span class="woocommerce-Price-currencySymbol">EGP</span></bdi></span>')
+
+
+def _journal3(host, products):
+    return {"response": [
+        {"name": p["name"], "href": f"https://{host}/product/{p['slug']}", "price": f"{p['price']:,} EGP",
+         "special": ""}
+        for p in products
+    ]}
+
+
+def _woodmart(host, products, european=False):
+    return {"suggestions": [
+        {"value": p["name"], "permalink": f"https://{host}/product/{p['slug']}",
+         "price": _money(p["price"], european)}
+        for p in products
+    ]}
+
+
+def _param(params, name, default):
+    try:
+        return int(params[name][0])
+    except (KeyError, ValueError):
+        return default
+
+
+def listing_body(store, host, path, params, query, count):
+    """
+    (content type, body) of a store's search endpoint for a query with
+    `count` matching products; paged and count-limited endpoints honour
+    their page/per_page, number and limit parameters
+    """
+    products = _products(host, query, count)
+
+    if store == "DeltaComputer":
+        per_page, page = _param(params, "per_page", 15), _param(params, "page", 1)
+        return "application/json", json.dumps({
+            "data": [{"name": p["name"], "slug": p["slug"], "price": str(p["price"])}
+                     for p in products[(page - 1) * per_page:page * per_page]],
+            "meta": {"current_page": page, "last_page": max(1, -(-count // per_page)), "per_page": per_page,
+                     "total": count},
+        })
+    if store == "KimoStore" and path.rstrip("/") == "/search":
+        per_page, page = 24, _param(params, "page", 1)
+        cards = "".join(
+            f'<div class="product-item"><a class="product-item__title" href="/products/{p["slug"]}?_pos={i}">{p["name"]}</a>'
+            f'<span class="price">LE {p["price"]:,}.00</span></div>'
+            for i, p in enumerate(products[(page - 1) * per_page:page * per_page])
+        )
+        last = max(1, -(-count // per_page))
+        pages = "".join(f'<a href="/search?page={n}&amp;q={query}&amp;type=product">{n}</a>' for n in range(1, last + 1))
+        return "text/html", _page(f'<div class="product-list">{cards}</div><nav class="pagination">{pages}</nav>', 24)
+    if store == "KimoStore":
+        products = products[:_param(params, "resources[limit]", 10)]
+    elif "number" in params:
+        products = products[:_param(params, "number", 20)]
+
+    if store in ("Elnekhely", "ElBadrGroup", "AHWStore", "HighEndStore", "MaximumHardware"):
+        return "application/json", json.dumps(_journal3(host, products))
+    if store in ("ElnourTech", "SolidHardware", "UpToDate", "CompuNileStore", "QuantumTechnology"):
+        # Quantum shows prices with dots as thousands separators
+        return "application/json", json.dumps(_woodmart(host, products, european=store == "QuantumTechnology"))
+    if store == "AlFrensia":
+        return "application/json", json.dumps({"suggestions": [
+            {"value": p["name"], "url": f"https://{host}/product/{p['slug']}", "price": _money(p["price"])}
+            for p in products
+        ]})
+    if store == "BarakaComputer":
+        return "application/json", json.dumps([
+            {"title": p["name"], "url": f"https://{host}/product/{p['slug']}", "price": _money(p["price"])}
+            for p in products
+        ])
+    if store == "KimoStore":
+        return "application/json", json.dumps({"resources": {"results": {"products": [
+            {"title": p["name"], "url": f"/products/{p['slug']}"} for p in products
+        ]}}})
+    if store == "Sigma":
+        items = "".join(
+            f'<li><a href="product/{p["slug"]}">{p["name"]}</a><span>{p["price"]:,} EGP</span></li>'
+            for p in products
+        )
+        return "text/html", f'<ul id="country-list">{items}</ul>'
+    if store == "ABCShop":
+        items = "".join(
+            f'<a class="dropdown-item p-2" href="/shop/{p["slug"]}"><div class="h6 fw-bold">{p["name"]}</div>'
+            f'<b><span class="oe_currency_value">{p["price"]:,}.00</span> EGP</b></a>'
+            for p in products
+        )
+        return "text/html", _page(f'<div class="dropdown-menu">{items}</div>', 8)
+    if store == "CompuMarts":
+        items = "".join(
+            f'<li class="js-pagination-result"><div class="card"><p class="card__title">'
+            f'<a href="/products/{p["slug"]}">{p["name"]}</a></p><div class="price">'
+            f'<span class="price__current"><span class="js-value">{p["price"]:,}.00 EGP</span></span></div></div></li>'
+            for p in products
+        )
+        return "text/html", _page(f'<ul class="grid">{items}</ul>', 24)
+    if store == "CompuScience":
+        items = "".join(
+            f'<article class="product-miniature"><h2 class="product-title"><a href="https://{host}/ar/{p["slug"]}">'
+            f'{p["name"]}</a></h2><span class="price">{p["price"]:,}.00\xa0EGP</span></article>'
+            for p in products
+        )
+        return "text/html", _page(f'<section id="products">{items}</section>', 24)
+    return "application/json", json.dumps({"suggestions": []})
+
+
+def _page(content, padding_kb):
+    """Wrap content in a store-like page with roughly padding_kb of navigation/markup"""
+    menu = "".join(
+        f'<li class="menu-item menu-item-{i}"><a class="nav-link" href="/category/{i}">Category {i}</a>'
+        f'<ul class="sub-menu"><li><a href="/category/{i}/a">Sub A</a></li><li><a href="/category/{i}/b">Sub B</a></li></ul></li>'
+        for i in range(max(1, padding_kb * 1024 // 220))
+    )
+    return (f'<!DOCTYPE html><html><head><title>Store</title></head><body><header><nav><ul class="menu">{menu}'
+            f'</ul></nav></header><main>{content}</main><footer><p>© Store</p></footer></body></html>')
+
+
+def product_body(host, path, page_kb, revision=0):
+    """Product page; roughly one product in five is out of stock. A new revision reprices and restocks it."""
+    digest = hashlib.sha1(f"{host}{path}{'#%d' % revision if revision else ''}".encode()).digest()
+    in_stock = digest[0] % 5 != 0
+    price = 8000 + int.from_bytes(digest[1:4], "big") % 100000
+    name = path.rstrip("/").rsplit("/", 1)[-1].replace("-", " ").title()
+
+    if in_stock:
+        stock = ('<ul class="list-unstyled"><li class="product-stock in-stock"><b>Stock:</b> <span>In Stock</span></li></ul>'
+                 '<p class="stock in-stock">In stock</p>'
+                 '<span class="product-form__inventory inventory">In stock</span>'
+                 '<button type="submit" class="single_add_to_cart_button btn-cart"><i class="fa fa-shopping-cart"></i> Add to cart</button>')
+    else:
+        stock = ('<ul class="list-unstyled"><li class="product-stock out-of-stock"><b>Stock:</b> <span>Out Of Stock</span></li></ul>'
+                 '<p class="stock out-of-stock">Out of stock</p>'
+                 '<span class="product-form__inventory inventory">Sold out</span>'
+                 '<span class="product-label product-label--sold-out">Sold out</span>'
+                 '<div id="product_stock_notification_message">Get notified when back in stock</div>'
+                 '<button type="submit" class="single_add_to_cart_button btn-cart" disabled><i class="fa fa-shopping-cart"></i> Out of stock</button>')
+
+    ld = json.dumps({"@context": "https://schema.org", "@type": "Product", "name": name, "offers": {
+        "@type": "Offer", "price": f"{price}.00", "priceCurrency": "EGP",
+        "availability": f"https://schema.org/{'InStock' if in_stock else 'OutOfStock'}"}})
+    content = (f'<script type="application/ld+json">{ld}</script>'
+               f'<div class="product-info"><h1 class="product_title">{name}</h1>'
+               f'<div class="price"><span class="price-item price-item--regular">LE {price:,}.00 EGP</span></div>'
+               f'{stock}<div class="description">{"<p>Specification line.</p>" * 40}</div></div>')
+    return "text/html", _page(content, page_kb)
+
+
+SITEMAP_SIZE = 100  # product URLs per generated sitemap file
+_EPOCH = 1717200000  # lastmod of unchanged catalogue products (2024-06-01)
+
+
+def _lastmod(timestamp):
+    return time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(timestamp))
+
+
+def _urlset(entries):
+    urls = "".join(f"<url><loc>{loc}</loc><lastmod>{_lastmod(ts)}</lastmod></url>" for loc, ts in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+
+def _sitemap_index(entries):
+    maps = "".join(f"<sitemap><loc>{loc}</loc><lastmod>{_lastmod(ts)}</lastmod></sitemap>" for loc, ts in entries)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{maps}</sitemapindex>')
+
+
+# === Server ===
+
+class MockStores:
+    """
+    Threaded HTTP server impersonating every store host. Each request sleeps
+    latency_ms plus uniform +/- jitter_ms before answering.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=50, jitter_ms=20,
+                 listing_count=20, page_kb=60, fixtures=None, seed=0, catalog_size=200):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.listing_count = listing_count
+        self.page_kb = page_kb
+        self.fixtures = load_fixtures() if fixtures is None else fixtures
+        self.requests = 0
+        self.not_modified = 0  # requests answered 304
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._store_by_host = {h: s for s, hosts in old_stores.STORE_HOSTS.items() for h in hosts}
+        self.catalog_size = catalog_size
+        self.catalog_revisions = {}  # (host, path) -> (revision, changed at)
+        self.catalog_removed = {}  # (host, path) -> removed at
+        self.catalog_added = {}  # host -> products added after the first catalog_size
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real stores
+
+            def do_GET(self):
+                host = self.headers.get("X-Mock-Host", "")
+                status, content_type, body = mock.respond(host, self.path)
+                payload = body.encode("utf-8")
+                # Strong validator over the body, and Last-Modified where the catalogue
+                # knows it, so conditional re-checks get 304s
+                etag = f'"{hashlib.md5(payload).hexdigest()[:16]}"'
+                modified = mock.last_modified(host, urlsplit(self.path).path) if status == 200 else None
+                if status == 200 and self.not_modified(etag, modified):
+                    status, payload = 304, b""
+                mock.sleep()
+                self.send_response(status)
+                if status != 304:
+                    self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                if status in (200, 304):
+                    self.send_header("ETag", etag)
+                if modified is not None:
+                    self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+                self.end_headers()
+                self.wfile.write(payload)
+                with mock._lock:
+                    mock.requests += 1
+                    mock.not_modified += status == 304
+                    mock.bytes_sent += len(payload)
+
+            def not_modified(self, etag, modified):
+                """If-None-Match decides when sent; If-Modified-Since only without it"""
+                if "If-None-Match" in self.headers:
+                    return self.headers["If-None-Match"] == etag
+                since = self.headers.get("If-Modified-Since")
+                if since is None or modified is None:
+                    return False
+                try:
+                    return int(modified) <= parsedate_to_datetime(since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def sleep(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        delay = max(0.0, self.latency_ms + jitter) / 1000
+        if delay:
+            time.sleep(delay)
+
+    def respond(self, host, path_qs):
+        """(status, content type, body) for a request to `host` (the real store host)"""
+        host = host[4:] if host.startswith("www.") else host
+        recorded = self.fixtures.get(fixture_key(host, path_qs))
+        if recorded:
+            return recorded["status"], recorded["content_type"], recorded["body"]
+
+        store = self._store_by_host.get(host)
+        if store is None:
+            return 404, "text/plain", "unknown host"
+
+        parts = urlsplit(path_qs)
+        params = parse_qs(parts.query)
+        query = next((params[k][0] for k in QUERY_KEYS if k in params), None)
+        if query is not None:
+            return (200,) + listing_body(store, host, parts.path, params, query, self.listing_count)
+        catalog = self.catalog_response(host, parts.path)
+        if catalog is not None:
+            return catalog
+        with self._lock:
+            revision = self.catalog_revisions.get((host, parts.path), (0, 0))[0]
+        return (200,) + product_body(host, parts.path, self.page_kb, revision)
+
+    def change_product(self, url):
+        """Reprice/restock the product page at url (any store product); returns its new revision"""
+        parts = urlsplit(url)
+        host = parts.hostname[4:] if parts.hostname.startswith("www.") else parts.hostname
+        with self._lock:
+            revision = self.catalog_revisions.get((host, parts.path), (0, 0))[0] + 1
+            self.catalog_revisions[(host, parts.path)] = (revision, time.time())
+        return revision
+
+    # --- Catalogue (sitemaps) ---
+
+    def catalog_paths(self, host):
+        """Product paths of a store's catalogue, removed ones included"""
+        return [f"/product/catalog-item-{i}" for i in range(self.catalog_size + self.catalog_added.get(host, 0))]
+
+    def _catalog_entries(self, host):
+        with self._lock:
+            return [(f"https://{host}{path}", self.catalog_revisions.get((host, path), (0, _EPOCH))[1])
+                    for path in self.catalog_paths(host) if (host, path) not in self.catalog_removed]
+
+    def last_modified(self, host, path):
+        """
+        When a catalogue response last changed (a timestamp), or None when
+        unknown. A removal counts as a change of every product sitemap.
+        """
+        host = host[4:] if host.startswith("www.") else host
+        if not self.catalog_size:
+            return None
+        if path == "/sitemap.xml" or (path.startswith("/product-sitemap") and path.endswith(".xml")):
+            with self._lock:
+                removals = [ts for (h, _), ts in self.catalog_removed.items() if h == host]
+            return max([ts for _, ts in self._catalog_entries(host)] + removals + [_EPOCH])
+        if path == "/page-sitemap.xml":
+            return _EPOCH
+        with self._lock:
+            if (host, path) in self.catalog_removed:
+                return None
+            default = _EPOCH if path.startswith("/product/catalog-item-") else None
+            return self.catalog_revisions.get((host, path), (0, default))[1]
+
+    def catalog_response(self, host, path):
+        """robots.txt, the sitemap index, its product and page sitemaps, and catalogue product pages"""
+        if not self.catalog_size:
+            return None
+        if path == "/robots.txt":
+            return 200, "text/plain", f"User-agent: *\nDisallow: /cart\nSitemap: https://{host}/sitemap.xml\n"
+        entries = self._catalog_entries(host)
+        chunks = [entries[i:i + SITEMAP_SIZE] for i in range(0, len(entries), SITEMAP_SIZE)]
+        if path == "/sitemap.xml":
+            maps = [(f"https://{host}/product-sitemap{n + 1}.xml", max(ts for _, ts in chunk))
+                    for n, chunk in enumerate(chunks)]
+            return 200, "application/xml", _sitemap_index(maps + [(f"https://{host}/page-sitemap.xml", _EPOCH)])
+        if path == "/page-sitemap.xml":
+            return 200, "application/xml", _urlset([(f"https://{host}/about", _EPOCH), (f"https://{host}/contact", _EPOCH)])
+        if path.startswith("/product-sitemap") and path.endswith(".xml"):
+            n = int(path[len("/product-sitemap"):-len(".xml")] or 1) - 1
+            return (200, "application/xml", _urlset(chunks[n])) if 0 <= n < len(chunks) else (404, "text/plain", "")
+        if path.startswith("/product/catalog-item-"):
+            with self._lock:
+                if (host, path) in self.catalog_removed:
+                    return 404, "text/html", _page("<h1>Page not found</h1>", 4)
+                revision = self.catalog_revisions.get((host, path), (0, 0))[0]
+            return (200,) + product_body(host, path, self.page_kb, revision)
+        return None
+
+    def change_catalog(self, store, changed=0, removed=0, added=0, seed=0):
+        """
+        Edit a store's catalogue: reprice/restock `changed` products (their
+        lastmod moves), drop `removed` and append `added`. Returns the URLs
+        touched per kind.
+        """
+        host = old_stores.STORE_HOSTS[store][0]
+        rng = random.Random(f"{store}|{seed}")
+        now = time.time()
+        with self._lock:
+            live = [p for p in self.catalog_paths(host) if (host, p) not in self.catalog_removed]
+            picked = rng.sample(live, min(len(live), changed + removed))
+            for path in picked[:changed]:
+                revision = self.catalog_revisions.get((host, path), (0, 0))[0] + 1
+                self.catalog_revisions[(host, path)] = (revision, now)
+            self.catalog_removed.update(((host, path), now) for path in picked[changed:])
+            start = self.catalog_size + self.catalog_added.get(host, 0)
+            self.catalog_added[host] = self.catalog_added.get(host, 0) + added
+            new = [f"/product/catalog-item-{i}" for i in range(start, start + added)]
+            for path in new:
+                self.catalog_revisions[(host, path)] = (0, now)
+        return {kind: [f"https://{host}{p}" for p in paths]
+                for kind, paths in (("changed", picked[:changed]), ("removed", picked[changed:]), ("added", new))}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-stores", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def route_scrapers(self):
+        """Point old_stores' shared session at this server (for the rest of the process)"""
+        route_to(self.base_url)
+
+
+def route_to(base_url):
+    """
+    Replace old_stores' pooled session with one whose adapters send every
+    store request to base_url, keeping the real host in X-Mock-Host.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    target = urlsplit(base_url)
+
+    class MockRouteAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.headers["X-Mock-Host"] = parts.hostname or ""
+            path_qs = parts.path + (f"?{parts.query}" if parts.query else "")
+            request.url = f"{target.scheme}://{target.netloc}{path_qs}"
+            return super().send(request, **kwargs)
+
+    session = requests.Session()
+    adapter = MockRouteAdapter(pool_connections=old_stores.POOL_SIZE, pool_maxsize=old_stores.POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    with old_stores._session_lock:
+        old_stores._session = session
+
+
+# === Recording ===
+
+def record(query, stores=None, directory=FIXTURES_DIR):
+    """Run the real scrapers once and save every response they get as a fixture"""
+    import requests
+    from price_engine import STORE_SCRAPERS
+
+    saved = []
+    original = requests.Session.send
+
+    def recording_send(session, request, **kwargs):
+        response = original(session, request, **kwargs)
+        parts = urlsplit(request.url)
+        host = parts.hostname or ""
+        host = host[4:] if host.startswith("www.") else host
+        path_qs = parts.path + (f"?{parts.query}" if parts.query else "")
+        target = directory / host / f"{fixture_key(host, path_qs)}.json"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps({
+            "host": host,
+            "path": path_qs,
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type", "text/html").split(";")[0],
+            "body": response.text,
+        }, ensure_ascii=False), encoding="utf-8")
+        saved.append(target)
+        return response
+
+    requests.Session.send = recording_send
+    try:
+        old_stores.configure_rate_limits(default=(2.0, 2))
+        for name, scraper in STORE_SCRAPERS.items():
+            if not stores or name in stores:
+                print(f"Recording {name}...", file=sys.stderr)
+                scraper(query)
+    finally:
+        requests.Session.send = original
+    return saved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock store server for offline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="run the mock server in the foreground")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8900)
+    serve.add_argument("--latency", type=float, default=50, help="mean response latency in ms")
+    serve.add_argument("--jitter", type=float, default=20, help="uniform +/- jitter in ms")
+    serve.add_argument("--listing-count", type=int, default=20)
+    serve.add_argument("--page-kb", type=int, default=60, help="approximate product page size")
+    serve.add_argument("--catalog-size", type=int, default=200, help="products per store in the sitemaps")
+
+    rec = sub.add_parser("record", help="capture live store responses into benchmarks/fixtures")
+    rec.add_argument("--query", default="rtx 4070")
+    rec.add_argument("--stores", help="comma-separated store names (default: all)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        stores = [s.strip() for s in args.stores.split(",")] if args.stores else None
+        saved = record(args.query, stores)
+        print(f"Saved {len(saved)} responses under {FIXTURES_DIR}")
+        return 0
+
+    mock = MockStores(args.host, args.port, args.latency, args.jitter, args.listing_count, args.page_kb,
+                      catalog_size=args.catalog_size)
+    print(f"Mock stores on {mock.base_url} ({len(mock.fixtures)} recorded responses); Ctrl+C to stop")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Offline scraping benchmarks against the mock store server.
+
+Runs every store scraper and the full engine search (what the app's
+scrape_all_optimized calls) over benchmarks/mock_stores.py, plus the result
+filtering on a large synthetic frame. Reports throughput, p50/p95/p99 latency
+and peak traced memory, and can fail on a regression against a saved run.
+
+    python benchmarks/scrape_bench.py
+    python benchmarks/scrape_bench.py --latency 120 --jitter 60 --iterations 10 --json after.json
+    python benchmarks/scrape_bench.py --baseline before.json --max-regression 0.15
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import old_stores  # noqa: E402
+from mock_stores import MockStores  # noqa: E402
+
+QUERY = "rtx 4070"
+
+
+def percentile(samples, q):
+    """q-th percentile (0-100) with linear interpolation"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def summarize(name, samples, items=0, peak_kb=None):
+    total = sum(samples)
+    return {
+        "name": name,
+        "runs": len(samples),
+        "ops_per_s": round(len(samples) / total, 2) if total else None,
+        "items": items,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "peak_kb": peak_kb,
+    }
+
+
+def run(func, iterations, before=None):
+    """Latencies of `iterations` calls of func (before() runs untimed first), and the last result"""
+    samples = []
+    result = None
+    for _ in range(iterations):
+        if before:
+            before()
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def peak_memory(func, before=None):
+    """Peak traced allocation of one call in KiB (a separate pass; tracing slows the call down)"""
+    if before:
+        before()
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def synthetic_frame(rows, seed=0):
+    from offers import AVAILABILITY_VALUES, STORE_NAMES, Offer, offers_to_frame
+
+    rng = random.Random(seed)
+    words = ["rtx", "4070", "4060", "ti", "super", "msi", "asus", "gaming", "oc", "ventus", "16gb", "8gb", "ryzen", "7600"]
+    return offers_to_frame([
+        Offer(
+            name=" ".join(rng.sample(words, 5)).title(),
+            url=f"https://example.com/p/{i}",
+            price=rng.randrange(5000, 150000, 50),
+            store=rng.choice(STORE_NAMES),
+            availability=rng.choice(AVAILABILITY_VALUES),
+        )
+        for i in range(rows)
+    ])
+
+
+def bench_scrapers(args, before):
+    from price_engine import STORE_SCRAPERS
+
+    old_stores.deep_search.set(args.deep)
+    results = []
+    for name, scraper in STORE_SCRAPERS.items():
+        samples, offers = run(lambda: scraper(QUERY), args.iterations, before)
+        results.append(summarize(f"scrape:{name}", samples, len(offers)))
+    return results
+
+
+def bench_search(args, before):
+    from price_engine import search
+
+    def run_search():
+        return search(QUERY, deep=args.deep, expand=args.expand)
+
+    samples, df = run(run_search, args.iterations, before)
+    peak = peak_memory(run_search, before) if args.memory else None
+    name = "search:all stores (expanded)" if args.expand else "search:all stores"
+    return [summarize(name, samples, len(df), peak)]
+
+
+def bench_filters(args):
+    from price_engine import PriceIndex, apply_filters, build_sort_index, filter_products_by_all_words
+    from product_matching import best_price_view, match_products
+    from specs import FacetIndex, add_specs
+
+    df = add_specs(synthetic_frame(args.rows))
+    index = build_sort_index(df, "Price (Low to High)")
+    price_index = PriceIndex(df)
+    facet_index = FacetIndex(df)
+    facets = {"brand": ["MSI"], "capacity": ["16GB"]}
+    cases = {
+        "filter_products_by_all_words": lambda: filter_products_by_all_words(df, QUERY),
+        "apply_filters": lambda: apply_filters(df, 20000, 90000, ["In Stock"], "Price (Low to High)"),
+        "apply_filters (presorted)": lambda: apply_filters(df, 20000, 90000, ["In Stock"], "Price (Low to High)", index),
+        "apply_filters (price index)": lambda: apply_filters(df, 20000, 90000, ["In Stock"], "Price (Low to High)",
+                                                             price_index=price_index),
+        "build_sort_index (relevance)": lambda: build_sort_index(df, "Relevance", QUERY),
+        "add_specs": lambda: add_specs(df),
+        "apply_filters (facets)": lambda: apply_filters(df, 20000, 90000, ["In Stock"], "Price (Low to High)", index,
+                                                        facets=facets, facet_index=facet_index),
+        "facet counts": lambda: facet_index.counts(facets),
+        "match_products": lambda: match_products(df),
+        "best_price_view": lambda: best_price_view(df),
+    }
+
+    results = []
+    for name, func in cases.items():
+        samples, out = run(func, args.filter_iterations)
+        peak = peak_memory(func) if args.memory else None
+        results.append(summarize(f"{name}[{args.rows}]", samples, len(out), peak))
+    return results
+
+
+def compare(results, baseline_path, max_regression):
+    """Benchmarks whose p50 got slower than the baseline by more than max_regression"""
+    baseline = {r["name"]: r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get(r["name"])
+        if before and before["p50_ms"] and r["p50_ms"] > before["p50_ms"] * (1 + max_regression):
+            regressions.append(f"{r['name']}: p50 {before['p50_ms']} -> {r['p50_ms']} ms")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'benchmark':42} {'runs':>5} {'ops/s':>9} {'items':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>9}")
+    for r in results:
+        peak = "" if r["peak_kb"] is None else r["peak_kb"]
+        print(f"{r['name']:42} {r['runs']:>5} {r['ops_per_s'] or 0:>9} {r['items']:>6} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {peak:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scraping benchmarks over the mock store server")
+    parser.add_argument("--latency", type=float, default=50, help="mock response latency in ms")
+    parser.add_argument("--jitter", type=float, default=20, help="uniform +/- jitter in ms")
+    parser.add_argument("--page-kb", type=int, default=60, help="approximate product page size")
+    parser.add_argument("--listing-count", type=int, default=20, help="matching products per store and query")
+    parser.add_argument("--deep", action="store_true", help="deep search (fetch every result page)")
+    parser.add_argument("--expand", action="store_true", help="search the query's alternative spellings too")
+    parser.add_argument("--iterations", type=int, default=3, help="runs per scraper and of the full search")
+    parser.add_argument("--rows", type=int, default=20000, help="rows in the synthetic frame for the filter benchmarks")
+    parser.add_argument("--filter-iterations", type=int, default=50)
+    parser.add_argument("--only", choices=["scrapers", "search", "filters"], action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--warm", action="store_true", help="keep the product-page cache between runs")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="apply the real per-store rate limits")
+    parser.add_argument("--parse-processes", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare p50 against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p50 slowdown vs the baseline")
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["scrapers", "search", "filters"]
+    before = None if args.warm else old_stores.clear_page_cache
+    if not args.keep_rate_limits:
+        old_stores.configure_rate_limits({store: (0, 1) for store in old_stores.STORE_HOSTS}, default=(0, 1))
+    old_stores.configure_parse_pool(args.parse_processes)
+
+    results = []
+    with MockStores(latency_ms=args.latency, jitter_ms=args.jitter, page_kb=args.page_kb,
+                    listing_count=args.listing_count) as mock:
+        mock.route_scrapers()
+        # The scrapers print progress; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            if "scrapers" in groups:
+                results += bench_scrapers(args, before)
+            if "search" in groups:
+                results += bench_search(args, before)
+        requests_served = mock.requests
+    if "filters" in groups:
+        results += bench_filters(args)
+
+    if requests_served:
+        print(f"Mock stores: {args.latency:g}±{args.jitter:g} ms, {requests_served} requests served\n")
+    print_table(results)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "results": results}, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            return 1
+        print(f"✅ No p50 regression over {args.max_regression:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
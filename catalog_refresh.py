@@ -0,0 +1,517 @@
+"""
+Catalogue refresh: keep every store's whole product catalogue up to date from
+its sitemaps, fetching only the product pages that changed.
+
+    python catalog_refresh.py --state catalog-state.json
+    python catalog_refresh.py --stores Sigma,KimoStore --every 3600 -o changes.jsonl
+    python catalog_refresh.py --max-pages 500 --history history/
+
+The first refresh of a store fetches every product page its sitemaps list
+(--max-pages spreads that over several runs). Later refreshes only fetch new
+products and products whose sitemap lastmod moved, and write what changed as
+JSON Lines events, the same kinds as watchlist.py: new, gone, price_drop,
+price_rise, back_in_stock, out_of_stock.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin
+
+from offers import AVAILABILITY_VALUES, Offer, offers_to_frame
+from old_stores import (
+    WORKING_COOKIES, WORKING_HEADERS, configure_parse_pool, fetch_product_page, http_get, pages_since, run_parser,
+    parse_stock_abcshop, parse_stock_ahwstore, parse_stock_alfrensia, parse_stock_compumarts,
+    parse_stock_compunilestore, parse_stock_elbadrgroup, parse_stock_elnekhely, parse_stock_elnourtech,
+    parse_stock_highendstore, parse_stock_kimostore, parse_stock_maximumhardware, parse_stock_quantum,
+    parse_stock_sigma, parse_stock_uptodate,
+)
+from price_engine import PRICE_HISTORY_DIR, STORE_SCRAPERS, apply_rate_limits, configure_history, record_history
+from watchlist import (
+    add_schedule_args, diff_offers, offer_hash, parse_schedule_args, run_schedule, setup_logging,
+)
+
+# A store's sitemaps are found through robots.txt, or at the usual
+# /sitemap.xml locations. When a sitemap index names product sitemaps, only
+# those are read. A sitemap is skipped when the index's lastmod for it
+# hasn't moved. Otherwise it is fetched with the ETag / Last-Modified of its
+# previous read, so an unchanged one costs a 304.
+#
+# The product URLs listed are then compared with the state file. Only new
+# URLs and URLs whose lastmod moved get their product page fetched. A URL
+# that a re-read sitemap no longer lists may just have moved to a sibling
+# page of a paged sitemap that was skipped, so its page is fetched too, and
+# only a 404/410 marks it removed. After a full, complete re-read, URLs no
+# sitemap lists are marked removed directly.
+#
+# Product pages are fetched through old_stores' page cache, but only a page
+# downloaded during the current refresh is reused (old_stores.pages_since):
+# a page cached before its lastmod moved would store the old offer under the
+# new lastmod.
+#
+# Two cases still need periodic full passes:
+#   - deleting a product doesn't move the index's lastmod, so every sitemap
+#     is re-read at least every FULL_RECHECK_AFTER seconds;
+#   - stock changes often don't move a product's lastmod, so every product
+#     is re-fetched at least every RECHECK_AFTER seconds.
+
+logger = logging.getLogger("catalog_refresh")
+
+FULL_RECHECK_AFTER = 24 * 3600
+RECHECK_AFTER = 7 * 24 * 3600
+PAGE_WORKERS = 4     # product pages fetched at the same time per store
+MAX_SITEMAPS = 200   # sitemap files read per store and refresh
+SITEMAP_PATHS = ["/sitemap.xml", "/sitemap_index.xml", "/wp-sitemap.xml"]
+
+STORE_SITES = {
+    "Sigma": "https://www.sigma-computer.com",
+    "Elnekhely": "https://www.elnekhelytechnology.com",
+    "ElBadrGroup": "https://elbadrgroupeg.store",
+    "BarakaComputer": "https://barakacomputer.net",
+    "DeltaComputer": "https://delta-computer.net",
+    "ElnourTech": "https://elnour-tech.com",
+    "SolidHardware": "https://solidhardware.store",
+    "AlFrensia": "https://alfrensia.com",
+    "AHWStore": "https://ahw.store",
+    "KimoStore": "https://kimostore.net",
+    "UpToDate": "https://uptodate.store",
+    "ABCShop": "https://www.abcshop-eg.com",
+    "CompuMarts": "https://www.compumarts.com",
+    "CompuNileStore": "https://compunilestore.com",
+    "CompuScience": "https://compuscience.com.eg",
+    "MaximumHardware": "https://maximumhardware.store",
+    "HighEndStore": "https://highendstore.net",
+    "QuantumTechnology": "https://quantumtechnologyeg.com",
+}
+
+# The scrapers' own stock parsers; other stores rely on the page's structured data
+STOCK_PARSERS = {
+    "Sigma": parse_stock_sigma,
+    "Elnekhely": parse_stock_elnekhely,
+    "ElBadrGroup": parse_stock_elbadrgroup,
+    "ElnourTech": parse_stock_elnourtech,
+    "AlFrensia": parse_stock_alfrensia,
+    "AHWStore": parse_stock_ahwstore,
+    "KimoStore": parse_stock_kimostore,
+    "UpToDate": parse_stock_uptodate,
+    "ABCShop": parse_stock_abcshop,
+    "CompuMarts": parse_stock_compumarts,
+    "CompuNileStore": parse_stock_compunilestore,
+    "MaximumHardware": parse_stock_maximumhardware,
+    "QuantumTechnology": parse_stock_quantum,
+    "HighEndStore": parse_stock_highendstore,
+}
+
+# Extra request arguments a store's product pages need (as in its get_stock_status_*)
+PAGE_KWARGS = {
+    "Sigma": {"headers": {"User-Agent": "Mozilla/5.0"}},
+    "ElBadrGroup": {"headers": WORKING_HEADERS, "cookies": WORKING_COOKIES},
+}
+
+_LD_JSON = re.compile(r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+_META = re.compile(r'<meta[^>]+(?:property|name)=["\']([^"\']+)["\'][^>]+content=["\']([^"\']*)["\']', re.I)
+_AVAILABILITY = {
+    "instock": "In Stock", "limitedavailability": "In Stock", "onlineonly": "In Stock",
+    "outofstock": "Out of Stock", "soldout": "Out of Stock", "discontinued": "Out of Stock",
+}
+
+
+# === Parsing ===
+
+def parse_sitemap(content):
+    """
+    ("index", [(loc, lastmod)]) for a sitemap index, ("urlset", [(loc, lastmod)])
+    for a sitemap; lastmod is None when missing. Gzipped sitemaps are accepted.
+    """
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    root = ET.fromstring(content)
+    kind = "index" if root.tag.rsplit("}", 1)[-1] == "sitemapindex" else "urlset"
+    entries = []
+    for element in root:
+        fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in element}
+        if fields.get("loc"):
+            entries.append((fields["loc"], fields.get("lastmod") or None))
+    return kind, entries
+
+
+def _ld_products(html):
+    """schema.org Product objects in a page's JSON-LD blocks"""
+    found = []
+    for block in _LD_JSON.findall(html):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                kind = item.get("@type")
+                if kind == "Product" or (isinstance(kind, list) and "Product" in kind):
+                    found.append(item)
+                stack.extend(item.get("@graph", []))
+    return found
+
+
+def _price(value):
+    try:
+        return int(round(float(str(value).replace(",", ""))))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_product_page(html):
+    """
+    {"name", "price", "availability"} of a product page from its JSON-LD
+    Product (or og:/product: meta tags), or None when it isn't a product page.
+    availability is None when the page doesn't say.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "replace")
+
+    for product in _ld_products(html):
+        offers = product.get("offers") or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        price = _price(offers.get("price", offers.get("lowPrice")))
+        if price is None:
+            continue
+        availability = str(offers.get("availability", "")).rsplit("/", 1)[-1].lower()
+        return {"name": str(product.get("name") or "").strip(), "price": price,
+                "availability": _AVAILABILITY.get(availability)}
+
+    meta = dict((key.lower(), value) for key, value in _META.findall(html))
+    price = _price(meta.get("product:price:amount") or meta.get("og:price:amount"))
+    if price is None:
+        return None
+    availability = (meta.get("product:availability") or "").replace(" ", "").lower()
+    return {"name": meta.get("og:title", "").strip(), "price": price, "availability": _AVAILABILITY.get(availability)}
+
+
+# === Refresh ===
+
+class CatalogRefresher:
+    """
+    The known product URLs, their sitemap lastmods and last offers per store,
+    kept in a JSON state file between refreshes (in memory only without one)
+    """
+
+    def __init__(self, state_path=None, max_pages=None,
+                 full_recheck_after=FULL_RECHECK_AFTER, recheck_after=RECHECK_AFTER):
+        self.state_path = state_path
+        self.max_pages = max_pages
+        self.full_recheck_after = full_recheck_after
+        self.recheck_after = recheck_after
+        self.stores = {}  # store -> {"roots", "full_read_at", "sitemaps", "products"}
+        self.last_stats = {}
+        self._lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.stores = json.load(f).get("stores", {})
+
+    def save(self):
+        if not self.state_path:
+            return
+        tmp = f"{self.state_path}.tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"stores": self.stores}, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    @staticmethod
+    def sitemap_roots(site):
+        """Sitemap URLs robots.txt declares, or the usual locations when it declares none"""
+        try:
+            response = http_get(urljoin(site, "/robots.txt"))
+            if response.status_code == 200:
+                roots = [line.split(":", 1)[1].strip() for line in response.text.splitlines()
+                         if line.lower().startswith("sitemap:")]
+                if roots:
+                    return roots
+        except Exception as e:
+            logger.warning(f"robots.txt of {site}: {e}")
+        return [urljoin(site, path) for path in SITEMAP_PATHS]
+
+    def read_sitemaps(self, store, entry, full):
+        """
+        Walk the store's sitemaps. Returns the product URLs of the sitemaps
+        read ({url: (lastmod, sitemap)}), the sitemaps read, the sitemaps
+        still valid (read, unchanged or skipped), the new sitemap records, and
+        whether the walk saw everything (no failure, no cut-off).
+        """
+        known = entry.get("sitemaps", {})
+        roots = entry.get("roots") or self.sitemap_roots(STORE_SITES[store])
+        guesses = {urljoin(STORE_SITES[store], path) for path in SITEMAP_PATHS}
+        listed, read, alive, records = {}, set(), set(), {}
+        complete = True
+        found_root = False
+        queue = [(url, None, True) for url in roots]
+        seen = set()
+
+        while queue:
+            url, lastmod, is_root = queue.pop(0)
+            if url in seen:
+                continue
+            if len(seen) >= MAX_SITEMAPS:
+                logger.warning(f"{store}: more than {MAX_SITEMAPS} sitemaps, the rest is read next time")
+                complete = False
+                break
+            seen.add(url)
+            record = known.get(url, {})
+
+            if not full and lastmod and record.get("lastmod") == lastmod:
+                # The index says it hasn't changed since it was last read
+                alive.add(url)
+                records[url] = record
+                continue
+
+            headers = {}
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+            try:
+                response = http_get(url, headers=headers)
+            except Exception as e:
+                logger.warning(f"{store}: sitemap {url}: {e}")
+                complete = False
+                continue
+
+            if response.status_code == 304 and record:
+                alive.add(url)
+                records[url] = dict(record, lastmod=lastmod)
+                queue += [(child, child_lastmod, False) for child, child_lastmod in record.get("children", [])]
+                found_root |= is_root
+                continue
+            if response.status_code != 200:
+                if not is_root:
+                    logger.warning(f"{store}: sitemap {url} answered {response.status_code}")
+                    complete = False
+                continue
+            try:
+                kind, entries = parse_sitemap(response.content)
+            except ET.ParseError as e:
+                if not is_root:
+                    logger.warning(f"{store}: sitemap {url} is not valid XML: {e}")
+                    complete = False
+                continue
+
+            found_root |= is_root
+            alive.add(url)
+            record = {"lastmod": lastmod, "etag": response.headers.get("ETag"),
+                      "last_modified": response.headers.get("Last-Modified")}
+            if kind == "index":
+                products = [e for e in entries if "product" in e[0].lower()] or entries
+                record["children"] = products
+                queue += [(child, child_lastmod, False) for child, child_lastmod in products]
+            else:
+                read.add(url)
+                for loc, loc_lastmod in entries:
+                    listed[loc] = (loc_lastmod, url)
+            records[url] = record
+            if is_root and url in guesses:
+                # The first usual location that answers is the catalogue; the others aren't needed
+                queue = [item for item in queue if item[0] not in guesses]
+
+        if found_root and not entry.get("roots"):
+            entry["roots"] = [url for url in roots if url in alive]
+        return listed, read, alive, records, complete and found_root
+
+    def fetch_offer(self, store, url, since=None):
+        """(status, parsed product or None) of one product page, downloaded after `since` (time.monotonic())"""
+        token = pages_since.set(time.monotonic() if since is None else since)
+        try:
+            response = fetch_product_page(url, timeout=10, **PAGE_KWARGS.get(store, {}))
+        finally:
+            pages_since.reset(token)
+        if response.status_code != 200:
+            return response.status_code, None
+        product = run_parser(parse_product_page, response.content)
+        if product is None:
+            return 200, None
+        parser = STOCK_PARSERS.get(store)
+        if parser is not None:
+            availability = run_parser(parser, response.content)
+            if availability in AVAILABILITY_VALUES and availability != "Check site":
+                product["availability"] = availability
+        product["availability"] = product["availability"] or "Check site"
+        return 200, product
+
+    def refresh_store(self, store):
+        """Bring one store's catalogue up to date; returns its change events and fetched offers"""
+        with self._lock:
+            entry = json.loads(json.dumps(self.stores.get(store, {})))
+        products = entry.setdefault("products", {})
+        # Until a store's first pass is complete (see --max-pages) its offers are a baseline, not changes
+        baseline = "caught_up_at" not in entry
+        now, started = time.time(), time.monotonic()
+        full = now - entry.get("full_read_at", 0) >= self.full_recheck_after
+
+        listed, read, alive, records, complete = self.read_sitemaps(store, entry, full)
+        for url, (_, sitemap) in listed.items():
+            # Products move between the files of a paged sitemap as others come and go
+            if url in products:
+                products[url]["sitemap"] = sitemap
+
+        # Gone from a sitemap that was read, or listed by a sitemap gone from a complete walk
+        vanished = [url for url, known in products.items()
+                    if not known.get("removed_at") and url not in listed
+                    and (known.get("sitemap") in read or (complete and known.get("sitemap") not in alive))]
+        # Only a full walk has seen every sitemap; otherwise the product page decides
+        removed = vanished if full and complete else []
+        unverified = [] if removed else vanished
+
+        # Product pages to fetch: changed first, then new ones, vanished ones and ones not checked for too long
+        changed, new, stale = [], [], []
+        for url, (lastmod, _) in listed.items():
+            known = products.get(url)
+            if known is None or known.get("removed_at"):
+                new.append(url)
+            elif lastmod and lastmod != known.get("lastmod"):
+                changed.append(url)
+        skip = set(vanished) | set(changed)
+        for url, known in products.items():
+            if (not known.get("removed_at") and url not in skip
+                    and now - known.get("fetched_at", 0) >= self.recheck_after):
+                stale.append(url)
+        wanted = changed + new + unverified + stale
+        to_fetch = wanted if self.max_pages is None else wanted[:self.max_pages]
+
+        fetched, failed = {}, set()
+        with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+            futures = {executor.submit(self.fetch_offer, store, url, started): url for url in to_fetch}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    status, product = future.result()
+                except Exception as e:
+                    logger.warning(f"{store}: {url}: {e}")
+                    failed.add(url)
+                    continue
+                if status in (404, 410):
+                    removed.append(url)
+                elif status != 200:
+                    failed.add(url)
+                else:
+                    fetched[url] = product
+
+        old, new_offers, offers = {}, {}, []
+        for url, product in fetched.items():
+            known = products.get(url, {})
+            if known.get("offer") and not known.get("removed_at"):
+                old[url] = known["offer"]
+            lastmod, sitemap = listed.get(url, (known.get("lastmod"), known.get("sitemap")))
+            offer = None
+            if product is not None:
+                name = product["name"] or (known.get("offer") or [None, url])[1]
+                offer = [offer_hash(name, url, product["price"], product["availability"]), name,
+                         product["price"], product["availability"]]
+                new_offers[url] = offer
+                offers.append(Offer(name, url, product["price"], store, product["availability"]))
+            products[url] = {"lastmod": lastmod, "sitemap": sitemap, "fetched_at": now, "offer": offer}
+        for url in set(removed):
+            known = products.get(url)
+            if known is None or known.get("removed_at"):
+                continue
+            if known.get("offer"):
+                old[url] = known["offer"]
+            products[url] = dict(known, removed_at=now)
+
+        # A sitemap with products still to fetch is read again next time, whatever its lastmod says
+        unfetched = set(wanted) - fetched.keys() - set(removed)
+        pending = {listed[url][1] for url in unfetched if url in listed}
+        for url in pending:
+            records[url] = {key: value for key, value in records.get(url, {}).items()
+                            if key not in ("lastmod", "etag", "last_modified")}
+        entry["sitemaps"] = records
+        if full and complete and not pending:
+            entry["full_read_at"] = now
+        if baseline and complete and not unfetched:
+            entry["caught_up_at"] = now
+
+        events = [] if baseline else [dict(event, store=store) for event in diff_offers(old, new_offers)]
+        stats = {
+            "listed": sum(1 for known in products.values() if not known.get("removed_at")),
+            "sitemaps_read": len(read), "sitemaps_alive": len(alive), "fetched": len(fetched),
+            "removed": len(set(removed)), "failed": len(failed), "pending": len(wanted) - len(to_fetch),
+        }
+        with self._lock:
+            self.stores[store] = entry
+        return events, offers, stats
+
+    def refresh(self, stores=None, parallel=4):
+        """Refresh every store (or the given ones) once and return the change events"""
+        selected = [store for store in STORE_SITES if store in STORE_SCRAPERS and (not stores or store in stores)]
+        self.last_stats = {"stores": len(selected)}
+        events, offers = [], []
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+            futures = {executor.submit(self.refresh_store, store): store for store in selected}
+            for future in as_completed(futures):
+                store = futures[future]
+                try:
+                    found, fetched, stats = future.result()
+                except Exception as e:
+                    logger.error(f"Refresh failed: {store}: {e}")
+                    continue
+                logger.info(
+                    f"{store}: {stats['listed']} products, {stats['fetched']} pages fetched, "
+                    f"{stats['removed']} removed, {stats['sitemaps_read']} of {stats['sitemaps_alive']} sitemaps read"
+                    + (f", {stats['pending']} left for the next refresh" if stats["pending"] else "")
+                )
+                events += found
+                offers += fetched
+                for key, value in stats.items():
+                    self.last_stats[key] = self.last_stats.get(key, 0) + value
+
+        record_history(offers_to_frame(offers), "")
+        self.save()
+        self.last_stats["events"] = len(events)
+        return events
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the stores' catalogues from their sitemaps")
+    parser.add_argument("--state", default="catalog-state.json",
+                        help="known products kept between refreshes (default: catalog-state.json)")
+    add_schedule_args(parser, "refresh")
+    parser.add_argument("--max-pages", type=int, help="product pages fetched per store and refresh")
+    parser.add_argument("--full-after", type=float, default=FULL_RECHECK_AFTER, metavar="SECONDS",
+                        help="re-read every sitemap at least this often")
+    parser.add_argument("--recheck-after", type=float, default=RECHECK_AFTER, metavar="SECONDS",
+                        help="re-fetch every product page at least this often")
+    parser.add_argument("--parallel", type=int, default=4, help="stores refreshed at the same time")
+    parser.add_argument("--history", default=PRICE_HISTORY_DIR, metavar="DIR",
+                        help="also append every fetched offer to the price history in DIR")
+    return parse_schedule_args(parser, argv, STORE_SITES)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+
+    configure_parse_pool(args.parse_processes)
+    apply_rate_limits(args.rate_limit)
+    configure_history(args.history)
+    refresher = CatalogRefresher(args.state, max_pages=args.max_pages,
+                                 full_recheck_after=args.full_after, recheck_after=args.recheck_after)
+
+    def summary(seconds):
+        stats = refresher.last_stats
+        return (f"{stats['stores']} stores in {seconds:.1f}s: "
+                f"{stats.get('fetched', 0)} of {stats.get('listed', 0)} product pages fetched, "
+                f"{stats.get('removed', 0)} removed, {stats['events']} changes")
+
+    return run_schedule(args, lambda: refresher.refresh(args.stores, parallel=args.parallel), summary)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
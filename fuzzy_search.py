@@ -0,0 +1,219 @@
+import functools
+import re
+import threading
+
+# Typo-tolerant query matching. A query word matches a product name when:
+#   - it is a substring of the name (the original all-words rule), or
+#   - it matches with spaces or dashes where its letters and digits meet or
+#     where it has a dash, so "rtx4070" finds "RTX 4070", "4070ti" finds
+#     "4070 Ti" and "rx-7600" finds "RX 7600", or
+#   - it is a plain word (no digits, 4+ letters) within a small edit
+#     distance of one of the name's words: "gforce" finds "GeForce".
+# Words with digits never match fuzzily: 4060 is not a typo of 4070.
+#
+# TrigramIndex keeps a vocabulary of name words with a posting list per
+# character trigram, so the words close to a query word are found without
+# comparing it to the whole vocabulary. The engine fills one from every
+# search's results and uses it for "did you mean" suggestions.
+
+_TOKEN = re.compile(r"[^\W_]+")
+_PARTS = re.compile(r"\d+|[^\W\d_]+")
+_SEPARATORS = re.compile(r"[\s\-_/.,]+")
+
+MAX_VOCABULARY = 50000  # words kept by a TrigramIndex; later words only update counts
+
+
+@functools.lru_cache(maxsize=1024)
+def word_pattern(word):
+    """
+    Regex for a query word allowing separators between its letter and digit
+    runs, or None when plain substring matching says the same
+    """
+    parts = _PARTS.findall(word)
+    if len(parts) < 2 or _SEPARATORS.sub("", word) != "".join(parts):
+        return None
+    return re.compile(r"[\s\-_/.,]*".join(map(re.escape, parts)))
+
+
+def tokens(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+def max_edits(word):
+    """Edits allowed when matching a query word: none for model numbers and short words"""
+    if len(word) < 4 or not word.isalpha():
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Edit distance of a and b counting a swap of adjacent letters as one edit
+    ("suepr" -> "super"), or limit + 1 as soon as it must exceed limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_matches(name, words):
+    """True when every query word matches the name (see the rules above)"""
+    lower = str(name).lower()
+    if all(word in lower for word in words):
+        return True
+
+    name_words = None
+    for word in words:
+        if word in lower:
+            continue
+        pattern = word_pattern(word)
+        if pattern is not None and pattern.search(lower):
+            continue
+        limit = max_edits(word)
+        if not limit:
+            return False
+        if name_words is None:
+            name_words = set(tokens(lower))
+        if not any(w.isalpha() and edit_distance(word, w, limit) <= limit for w in name_words):
+            return False
+    return True
+
+
+class TrigramIndex:
+    """Vocabulary of name words and how often each was seen, indexed by trigram"""
+
+    def __init__(self, max_words=MAX_VOCABULARY):
+        self.max_words = max_words
+        self.words = []
+        self.counts = []
+        self.ids = {}
+        self.postings = {}  # trigram -> set of word ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def add_words(self, words):
+        with self._lock:
+            for word in words:
+                i = self.ids.get(word)
+                if i is not None:
+                    self.counts[i] += 1
+                    continue
+                if self.max_words is not None and len(self.words) >= self.max_words:
+                    continue
+                i = self.ids[word] = len(self.words)
+                self.words.append(word)
+                self.counts.append(1)
+                for gram in trigrams(word):
+                    self.postings.setdefault(gram, set()).add(i)
+
+    def add_names(self, names):
+        self.add_words(word for name in names for word in tokens(name))
+
+    def similar(self, word, limit=None):
+        """
+        Vocabulary words within `limit` edits of word (default: max_edits),
+        closest and most frequent first, as (word, distance, count)
+        """
+        limit = max_edits(word) if limit is None else limit
+        if not limit:
+            return []
+        grams = trigrams(word)
+        shared = {}
+        with self._lock:
+            for gram in grams:
+                for i in self.postings.get(gram, ()):
+                    shared[i] = shared.get(i, 0) + 1
+            # An edit changes at most 3 trigrams (a swap 4), so closer words share at least this many
+            needed = max(1, len(grams) - 4 * limit)
+            candidates = [(self.words[i], self.counts[i]) for i, n in shared.items() if n >= needed]
+
+        matches = []
+        for candidate, count in candidates:
+            if candidate == word or not candidate.isalpha():
+                continue
+            distance = edit_distance(word, candidate, limit)
+            if distance <= limit:
+                matches.append((candidate, distance, count))
+        return sorted(matches, key=lambda m: (m[1], -m[2], m[0]))
+
+    def _split(self, word):
+        """Known word pairs a joined word splits into ("rtx4070" -> "rtx 4070")"""
+        return [f"{word[:i]} {word[i:]}" for i in range(2, len(word) - 1)
+                if word[:i] in self.ids and word[i:] in self.ids]
+
+    def suggest(self, query, limit=3):
+        """
+        Corrected spellings of a query from the vocabulary: unknown words are
+        replaced by close known words or split into known words. The best
+        correction comes first, then ones that change a single word differently.
+        """
+        words = query.lower().split()
+        options = []
+        for word in words:
+            if word in self.ids or not word:
+                options.append([word])
+                continue
+            alternatives = [(1, split) for split in self._split(word)]
+            alternatives += [(distance, w) for w, distance, _ in self.similar(word)]
+            alternatives.sort(key=lambda a: a[0])
+            options.append([w for _, w in alternatives[:limit]] or [word])
+
+        best = [choices[0] for choices in options]
+        suggestions = [" ".join(best)]
+        for position, choices in enumerate(options):
+            for choice in choices[1:]:
+                suggestions.append(" ".join(best[:position] + [choice] + best[position + 1:]))
+
+        original = " ".join(words)
+        unique = []
+        for suggestion in suggestions:
+            if suggestion != original and suggestion not in unique:
+                unique.append(suggestion)
+        return unique[:limit]
+
+
+def match_mask(names, words):
+    """
+    Boolean Series: which names match every query word. The vectorized
+    counterpart of name_matches for a column of names.
+    """
+    lower = names.astype(str).str.lower()
+    vocabulary = None
+    mask = None
+    for word in words:
+        pattern = word_pattern(word)
+        if pattern is None:
+            hit = lower.str.contains(word, regex=False)
+        else:
+            hit = lower.str.contains(pattern.pattern)
+        if max_edits(word) and not hit.all():
+            if vocabulary is None:
+                vocabulary = TrigramIndex(max_words=None)
+                vocabulary.add_names(lower.unique())
+            close = [w for w, _, _ in vocabulary.similar(word) if word not in w]
+            if close:
+                # Whole name words only, as in name_matches
+                hit |= lower.str.contains(r"(?<![^\W_])(?:" + "|".join(map(re.escape, close)) + r")(?![^\W_])")
+        mask = hit if mask is None else mask & hit
+    return lower == lower if mask is None else mask
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Canonical store labels, matching the store keys used in the app's store list.
+# The store column is categorical over these, ordered alphabetically so that
+# "Store Name" sorting is unchanged.
+STORE_NAMES = [
+    "Sigma", "Elnekhely", "ElBadrGroup", "BarakaComputer",
+    "DeltaComputer", "ElnourTech", "SolidHardware", "AlFrensia",
+    "AHWStore", "KimoStore", "UpToDate", "ABCShop", "CompuMarts",
+    "CompuNileStore", "CompuScience", "MaximumHardware",
+    "QuantumTechnology", "HighEndStore", "NewVision"
+]
+
+AVAILABILITY_VALUES = ["In Stock", "Out of Stock", "Check site"]
+
+OFFER_COLUMNS = ["name", "url", "price", "store", "availability"]
+
+# Labels scrapers have historically used that don't reduce to a canonical key
+_STORE_ALIASES = {
+    "uptodatestore": "UpToDate",
+}
+
+_STORE_LOOKUP = {name.lower(): name for name in STORE_NAMES}
+_STORE_LOOKUP.update(_STORE_ALIASES)
+
+
+def canonical_store(label: str) -> str:
+    """Map a scraper's store label ("Kimostore", "AHW Store", ...) to its canonical name"""
+    key = str(label or "").replace(" ", "").lower()
+    return _STORE_LOOKUP.get(key, label)
+
+
+def canonical_availability(value: Optional[str]) -> str:
+    """Anything that isn't a known stock status is shown as "Check site" """
+    return value if value in AVAILABILITY_VALUES else "Check site"
+
+
+@dataclass(slots=True, frozen=True)
+class Offer:
+    """One product offer from one store, in the canonical schema"""
+    name: str
+    url: str
+    price: int
+    store: str
+    availability: str = "Check site"
+
+    @classmethod
+    def from_record(cls, record: dict, store: Optional[str] = None) -> Optional["Offer"]:
+        """
+        Build an Offer from a scraper's raw dict, accepting the legacy
+        title/source keys. Returns None for records without a name or a
+        usable price.
+        """
+        name = str(record.get("name") or record.get("title") or "").strip()
+        price = record.get("price")
+        if not name or price is None:
+            return None
+
+        try:
+            price = int(round(float(price)))
+        except (TypeError, ValueError):
+            return None
+
+        return cls(
+            name=name,
+            url=str(record.get("url") or ""),
+            price=price,
+            store=canonical_store(store or record.get("store") or record.get("source")),
+            availability=canonical_availability(record.get("availability")),
+        )
+
+
+def offers_to_frame(offers: Iterable[Offer]) -> "pd.DataFrame":
+    """
+    Build the results DataFrame column-wise with fixed dtypes: int32 price
+    and categorical store/availability, instead of letting pandas infer
+    object columns from a list of dicts.
+    """
+    # Imported here so scrapers can build Offers without loading pandas
+    import numpy as np
+    import pandas as pd
+
+    offers: List[Offer] = list(offers)
+    stores = [o.store for o in offers]
+    unknown_stores = sorted(set(stores).difference(STORE_NAMES))
+
+    return pd.DataFrame({
+        "name": [o.name for o in offers],
+        "url": [o.url for o in offers],
+        "price": np.fromiter((o.price for o in offers), dtype=np.int32, count=len(offers)),
+        "store": pd.Categorical(stores, categories=sorted(STORE_NAMES + unknown_stores)),
+        "availability": pd.Categorical([o.availability for o in offers], categories=AVAILABILITY_VALUES),
+    }, columns=OFFER_COLUMNS)
+
+
+def frame_to_records(df: "pd.DataFrame") -> List[dict]:
+    """JSON-ready offer dicts from a results DataFrame (plain int prices and str labels)"""
+    return [
+        {
+            "name": row.name,
+            "price": int(row.price),
+            "store": str(row.store),
+            "availability": str(row.availability),
+            "url": row.url,
+        }
+        for row in df.itertuples(index=False)
+    ]
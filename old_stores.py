@@ -1,98 +1,727 @@
-import streamlit as st
-import requests
-from bs4 import BeautifulSoup
+import importlib
+import json
 import re
-import pandas as pd
-from datetime import datetime
-import time
-from difflib import SequenceMatcher
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-from functools import wraps
+import time
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+from offers import Offer
+from fuzzy_search import name_matches
+import telemetry
+import tracing
+
+# The store scrapers are a plain library: no Streamlit, and requests/bs4 are
+# only imported when the first request is made, so workers, CLIs and tests can
+# import this module cheaply (see benchmarks/import_time.py for the budget).
+
+class _LazyModule:
+    """Stand-in for a heavy module that imports it on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+requests = _LazyModule("requests")
+_bs4 = _LazyModule("bs4")
+
+def BeautifulSoup(*args, **kwargs):
+    """bs4.BeautifulSoup, imported on first use"""
+    return _bs4.BeautifulSoup(*args, **kwargs)
+
+# === Shared HTTP layer ===
+# All scrapers go through one pooled requests.Session, so a search (or a batch
+# of searches) reuses TCP/TLS connections per store. Product pages are cached
+# briefly by URL: the same product found by several queries, or fetched for both
+# price and stock (KimoStore), is downloaded once, and concurrent requests for
+# the same page wait for one download instead of each starting their own.
+
+DEFAULT_TIMEOUT = 15
+POOL_SIZE = 32
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_SIZE = 2048
+
+_session = None
+_session_lock = threading.Lock()
+
+_page_cache = {}  # url -> (expires_at, response)
+_page_cache_lock = threading.Lock()
+_page_cache_stats = {"hits": 0, "misses": 0}
+
+# Re-checks that report changes (watchlist.py, catalog_refresh.py) set this to
+# when they started (time.monotonic()): product pages cached before then are
+# downloaded again, pages fetched during the re-check are still shared.
+pages_since = ContextVar("pages_since", default=None)
+
+def get_http_session():
+    """The process-wide pooled session, created on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+# === Per-host rate limiting ===
+# Every outgoing request takes a token from its host's bucket. An idle store is
+# hit immediately (up to `burst` requests), a busy one is smoothed to `rate`
+# requests per second, shared by all threads, queries and users of the process.
+
+DEFAULT_RATE_LIMIT = (5.0, 10)  # (requests per second, burst)
+
+# Stores known to throttle or drop aggressive clients get slower buckets
+STORE_RATE_LIMITS = {
+    "ElBadrGroup": (2.0, 4),
+    "ElnourTech": (2.0, 4),
+    "MaximumHardware": (2.0, 4),
+}
 
-def get_stock_status_sigma(product_url):
+# Hosts each store's scraper talks to, so limits can be set per store
+STORE_HOSTS = {
+    "Sigma": ["sigma-computer.com"],
+    "Elnekhely": ["elnekhelytechnology.com"],
+    "ElBadrGroup": ["elbadrgroupeg.store"],
+    "BarakaComputer": ["barakacomputer.net"],
+    "DeltaComputer": ["delta-computer.net", "api.delta-computer.net"],
+    "ElnourTech": ["elnour-tech.com"],
+    "SolidHardware": ["solidhardware.store"],
+    "AlFrensia": ["alfrensia.com"],
+    "AHWStore": ["ahw.store"],
+    "KimoStore": ["kimostore.net"],
+    "UpToDate": ["uptodate.store"],
+    "ABCShop": ["abcshop-eg.com"],
+    "CompuMarts": ["compumarts.com"],
+    "CompuNileStore": ["compunilestore.com"],
+    "CompuScience": ["compuscience.com.eg"],
+    "MaximumHardware": ["maximumhardware.store"],
+    "QuantumTechnology": ["quantumtechnologyeg.com"],
+    "HighEndStore": ["highendstore.net"],
+    "NewVision": ["newvision.com.eg"],
+}
+
+_HOST_STORES = {host: store for store, hosts in STORE_HOSTS.items() for host in hosts}
+
+class TokenBucket:
     """
-    Fetch the actual stock status from the Sigma product page
+    Thread-safe token bucket; acquire() blocks until a token is available.
+    clock and sleep default to time.monotonic and time.sleep.
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waited = 0.0
+
+    def acquire(self):
+        """Take a token, sleeping for it if the bucket is empty; returns the wait in seconds"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now, even if it is only paid back later, so
+            # waiting threads are served in arrival order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.requests += 1
+            self.waited += wait
+        if wait:
+            self._sleep(wait)
+        return wait
+
+_buckets = {}  # host -> TokenBucket, or None when the host is unlimited
+_buckets_lock = threading.Lock()
+
+def _host_of(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def _bucket_for(url):
+    host = _host_of(url)
+    with _buckets_lock:
+        if host not in _buckets:
+            rate, burst = STORE_RATE_LIMITS.get(_HOST_STORES.get(host), DEFAULT_RATE_LIMIT)
+            _buckets[host] = TokenBucket(rate, burst) if rate else None
+        return _buckets[host]
+
+def configure_rate_limits(limits=None, default=None):
+    """
+    Override per-store limits ({store: (rate, burst)}) and/or the default for
+    other hosts. A rate of 0 disables limiting. Takes effect immediately.
+    """
+    global DEFAULT_RATE_LIMIT
+    with _buckets_lock:
+        if default is not None:
+            DEFAULT_RATE_LIMIT = default
+        STORE_RATE_LIMITS.update(limits or {})
+        _buckets.clear()
+
+def rate_limit_stats():
+    """Per-host request counts and total seconds spent waiting for a token"""
+    with _buckets_lock:
+        return {
+            host: {"requests": bucket.requests, "waited": round(bucket.waited, 3)}
+            for host, bucket in _buckets.items() if bucket is not None
+        }
+
+def store_for_url(url):
+    """Store a URL belongs to, by host; falls back to the store being scraped"""
+    return _HOST_STORES.get(_host_of(url)) or telemetry.current_store.get()
+
+def _send(url, phase, **kwargs):
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    store = store_for_url(url)
+
+    bucket = _bucket_for(url)
+    if bucket is not None:
+        wait_started = time.perf_counter()
+        waited = bucket.acquire()
+        if waited:
+            telemetry.incr("rate_limit_wait_seconds_total", store, waited)
+            tracing.record("rate limit", "rate_limit", store, wait_started, time.perf_counter())
+
+    telemetry.incr("http_requests_total", store)
+    started = time.perf_counter()
+    response = None
+    error = None
     try:
-        response = requests.get(product_url, headers=headers, timeout=10)
+        response = get_http_session().get(url, **kwargs)
+    except requests.Timeout as e:
+        telemetry.incr("http_timeouts_total", store)
+        error = f"timeout: {e}"
+        raise
+    except requests.RequestException as e:
+        telemetry.incr("http_errors_total", store)
+        error = str(e)
+        raise
+    finally:
+        ended = time.perf_counter()
+        telemetry.observe(phase, store, ended - started)
+        # requests can't split out DNS/TLS; `elapsed` is the time until the
+        # response headers were parsed, the rest is reading the body
+        tracing.record(
+            f"GET {_host_of(url)}", phase, store, started, ended, url=url, error=error,
+            status=response.status_code if response is not None else None,
+            headers_ms=round(response.elapsed.total_seconds() * 1000, 1) if response is not None else None,
+            bytes=len(response.content) if response is not None else None,
+        )
+
+    telemetry.incr("http_bytes_total", store, len(response.content))
+    if response.status_code >= 400:
+        telemetry.incr("http_errors_total", store)
+    return response
+
+def http_get(url, **kwargs):
+    """requests.get through the shared session and the host's rate limiter, with a default timeout"""
+    validators = conditional_listing.get()
+    if validators is None:
+        return _send(url, "listing_fetch", **kwargs)
+    return validators.send(url, kwargs)
+
+# === Conditional listing requests ===
+# A re-check of a known search (watchlist.py) hands the scraper the ETag /
+# Last-Modified its previous scrape of the same store got for the first
+# listing request. When the store answers 304 Not Modified, every further
+# request of that scrape raises NotModified, so the scraper gives up (its
+# usual error path) without fetching product pages, and the caller reuses the
+# offers it already has for the store.
+
+class NotModified(Exception):
+    """The store's listing is unchanged since the validators were taken"""
+
+class ListingValidators:
+    """
+    Validators of one store scrape. `previous` is the to_dict() of an earlier
+    scrape of the same query and store; after the scrape, to_dict() holds the
+    validators to send next time and not_modified tells whether the store
+    answered 304.
+    """
+
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.current = {}
+        self.not_modified = False
+        self._first = True
+        self._lock = threading.Lock()
+
+    def send(self, url, kwargs):
+        with self._lock:
+            if self.not_modified:
+                raise NotModified(f"listing not modified: {url}")
+            first, self._first = self._first, False
+        if not first:
+            return _send(url, "listing_fetch", **kwargs)
+
+        # Only the first listing request is conditional: it decides what the
+        # rest of the scrape fetches
+        key = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+        headers = dict(kwargs.get("headers") or {})
+        if self.previous.get("key") == key:
+            if self.previous.get("etag"):
+                headers["If-None-Match"] = self.previous["etag"]
+            if self.previous.get("last_modified"):
+                headers["If-Modified-Since"] = self.previous["last_modified"]
+        response = _send(url, "listing_fetch", **dict(kwargs, headers=headers))
+
+        if response.status_code == 304:
+            telemetry.incr("listing_not_modified_total", store_for_url(url))
+            with self._lock:
+                self.not_modified = True
+            self.current = dict(self.previous)
+            raise NotModified(f"listing not modified: {url}")
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the cart icon element and check the text after it
-            cart_icons = soup.select("i.fa.fa-shopping-cart")
-            
-            for cart_icon in cart_icons:
-                # Get the parent element or next sibling to find the text
-                parent = cart_icon.parent
-                if parent:
-                    text = parent.get_text().strip().lower()
-                    if "add to cart" in text:
-                        return "In Stock"
-                    elif "out of stock" in text:
-                        return "Out of Stock"
-                
-                # Also check next sibling text
-                next_element = cart_icon.next_sibling
-                if next_element and hasattr(next_element, 'strip'):
-                    text = next_element.strip().lower()
-                    if "add to cart" in text:
-                        return "In Stock"
-                    elif "out of stock" in text:
-                        return "Out of Stock"
-            
-            # Alternative approach: look for button text directly
-            buttons = soup.select("button, a[class*='cart'], [class*='add-to-cart']")
-            for button in buttons:
-                text = button.get_text().strip().lower()
-                if "add to cart" in text:
-                    return "In Stock"
-                elif "out of stock" in text:
-                    return "Out of Stock"
-            
-            # Additional fallback: check for common stock indicators
-            stock_texts = soup.find_all(text=re.compile(r"(out of stock|add to cart)", re.IGNORECASE))
-            for text in stock_texts:
-                text_lower = text.strip().lower()
-                if "add to cart" in text_lower:
-                    return "In Stock"
-                elif "out of stock" in text_lower:
-                    return "Out of Stock"
-                    
-        return "Check site"
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.current = {"key": key, "etag": etag, "last_modified": last_modified}
+        return response
+
+    def to_dict(self):
+        return dict(self.current)
+
+conditional_listing = ContextVar("conditional_listing", default=None)
+
+class _FlightCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one: the first caller
+    runs the function, callers arriving while it runs wait for it and get the
+    same result (or exception). Nothing is kept once the call returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, func, *args, **kwargs):
+        return self.call(key, func, *args, **kwargs)[0]
+
+    def call(self, key, func, *args, **kwargs):
+        """Like do(), but returns (result, ran_it) to tell the leader from followers"""
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _FlightCall()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result, True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+# Concurrent fetches of the same product page (several queries or users
+# matching one product) share a single download
+_page_flight = SingleFlight()
+
+def _cached_page(url):
+    """The cached response for url while it is fresh, else None (call with _page_cache_lock held)"""
+    cached = _page_cache.get(url)
+    if cached is None:
+        return None
+    expires, response = cached
+    since = pages_since.get()
+    if expires <= time.monotonic() or (since is not None and expires - PAGE_CACHE_TTL < since):
+        return None
+    return response
+
+def _download_product_page(url, **kwargs):
+    with _page_cache_lock:
+        # A download for this URL may have finished since the caller looked
+        cached = _cached_page(url)
+        if cached is not None:
+            _page_cache_stats["hits"] += 1
+            telemetry.incr("page_cache_total", store_for_url(url), result="hit")
+            return cached
+        _page_cache_stats["misses"] += 1
+
+    telemetry.incr("page_cache_total", store_for_url(url), result="miss")
+    response = _send(url, "page_fetch", **kwargs)
+
+    if response.status_code == 200:
+        now = time.monotonic()
+        with _page_cache_lock:
+            if len(_page_cache) >= PAGE_CACHE_SIZE:
+                # Drop expired entries first, then the oldest ones
+                for key in [k for k, (expires, _) in _page_cache.items() if expires <= now]:
+                    del _page_cache[key]
+                while len(_page_cache) >= PAGE_CACHE_SIZE:
+                    del _page_cache[next(iter(_page_cache))]
+            _page_cache[url] = (now + PAGE_CACHE_TTL, response)
+
+    return response
+
+def fetch_product_page(url, **kwargs):
+    """
+    GET a product page, reusing a successful response for the same URL for
+    PAGE_CACHE_TTL seconds (only one fetched since pages_since, when set)
+    """
+    with _page_cache_lock:
+        cached = _cached_page(url)
+        if cached is not None:
+            _page_cache_stats["hits"] += 1
+            telemetry.incr("page_cache_total", store_for_url(url), result="hit")
+            return cached
+
+    response, downloaded = _page_flight.call(url, _download_product_page, url, **kwargs)
+    if not downloaded:
+        telemetry.incr("page_cache_total", store_for_url(url), result="coalesced")
+    return response
+
+def page_cache_stats():
+    """
+    Product-page counters since start (or the last clear): cache hits,
+    downloads (misses) and fetches that joined an in-flight download
+    """
+    with _page_cache_lock:
+        return dict(_page_cache_stats, coalesced=_page_flight.stats["coalesced"], size=len(_page_cache))
+
+def clear_page_cache():
+    with _page_cache_lock:
+        _page_cache.clear()
+        _page_cache_stats.update(hits=0, misses=0)
+        _page_flight.stats.update(calls=0, coalesced=0)
+
+# === Parse stage ===
+# Downloading is I/O and runs fine on threads, but BeautifulSoup parsing is
+# pure-Python CPU work that the GIL serializes. Every HTML parser below is a
+# module-level function taking the raw page bytes and returning plain records
+# (a list of dicts, or a stock label), so run_parser can hand it to a process
+# pool when one is configured. Without a pool it runs inline, as before.
+
+_parse_pool = None
+_parse_pool_size = 0
+_parse_pool_lock = threading.Lock()
+
+def configure_parse_pool(workers):
+    """Parse HTML in `workers` processes; 0 or None parses in the calling thread"""
+    global _parse_pool, _parse_pool_size
+    workers = int(workers or 0)
+    with _parse_pool_lock:
+        if workers == _parse_pool_size:
+            return
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+        if workers > 0:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: forking a process that already runs scraper threads is unsafe
+            _parse_pool = ProcessPoolExecutor(max_workers=workers,
+                                              mp_context=multiprocessing.get_context("spawn"))
+        _parse_pool_size = workers
+
+def parse_pool_size():
+    return _parse_pool_size
+
+def run_parser(parser, content, *args):
+    """Run parser(content, *args) in the parse pool if there is one, else inline"""
+    phase = "listing_parse" if parser.__name__.startswith("parse_listing") else "stock_parse"
+    with telemetry.timed(phase, telemetry.current_store.get(), name=parser.__name__, bytes=len(content)):
+        trace = tracing.current_trace.get()
+        if trace is not None and trace.profile_parse:
+            # Profiled parses run inline so cProfile sees them
+            return trace.profile(parser, content, *args)
+
+        pool = _parse_pool
+        if pool is None:
+            return parser(content, *args)
+        return pool.submit(parser, content, *args).result()
+
+def fetch_stock_status(product_url, parser, store, headers=None, cookies=None,
+                       default="Check site", error_default="Check site"):
+    """Download a product page (through the page cache) and parse its stock status"""
+    try:
+        response = fetch_product_page(product_url, headers=headers, cookies=cookies, timeout=10)
+        if response.status_code != 200:
+            return default
+        return run_parser(parser, response.content)
     except Exception as e:
-        print(f"Error fetching stock status from Sigma: {e}")
-        return "Check site"
+        print(f"Error fetching stock status from {store}: {e}")
+        return error_default
+
+# === Shared listing pipeline ===
+# Listing endpoints return name/url/price in one request per store, while stock
+# (and for some stores price) needs one request per product page. Every scraper
+# pushes its listing candidates through run_listing_pipeline so that the
+# query-matching, price-sanity and dedup stages run before any product page is
+# fetched.
+
+def query_words(query):
+    """Split a search query into the lowercase words a product name must contain"""
+    return query.lower().strip().split() if query else []
+
+def name_matches_query(name, words):
+    """Check that a product name matches ALL of the given query words (typo-tolerant, see fuzzy_search)"""
+    return name_matches(name, words)
+
+def prefilter_listing(items, query, require_price=True, seen=None):
+    """
+    Drop listing candidates that would be discarded after scraping anyway:
+    names missing a query word, prices <= 1 EGP and (name, price) duplicates.
+    Pass the same `seen` set for several pages of one listing to dedup across them.
+    """
+    scope = expansion_scope.get()
+    words = scope.words if scope is not None else query_words(query)
+    seen = set() if seen is None else seen
+    kept = []
+
+    for item in items:
+        name = str(item.get("name") or "").strip()
+        if not name or not name_matches_query(name, words):
+            continue
+
+        price = item.get("price")
+        if require_price and not (price and price > 1):
+            continue
+
+        key = (name, price) if require_price else (name, item.get("url"))
+        if key in seen:
+            continue
+
+        seen.add(key)
+        item["name"] = name
+        kept.append(item)
+
+    return kept
+
+def run_listing_pipeline(items, query, stock_func=None, price_func=None, seen=None):
+    """
+    Pre-filter listing candidates, then enrich only the survivors from their
+    product pages. Items with availability=None get it from stock_func; when
+    price_func is given the listing has no prices and they are fetched first.
+    Returns canonical Offer records.
+    """
+    candidates = prefilter_listing(items, query, require_price=price_func is None, seen=seen)
+
+    enriched = []
+    for item in candidates:
+        if price_func is not None:
+            item["price"] = price_func(item["url"])
+            if not (item["price"] and item["price"] > 1):
+                continue
+
+        if stock_func is not None and item.get("availability") is None:
+            item["availability"] = stock_func(item["url"]) or "Check site"
+
+        enriched.append(item)
+
+    if price_func is not None:
+        # Prices only became known during enrichment, dedup on them now
+        enriched = prefilter_listing(enriched, query)
+
+    offers = (Offer.from_record(item) for item in enriched)
+    return [offer for offer in offers if offer is not None]
+
+# === Query expansion ===
+# In expansion mode the engine runs each store's scraper once per query
+# variant ("rtx 4070", "geforce rtx 4070", ...) at the same time. The variants
+# of one store share an ExpansionScope, so every listing is matched against
+# the original query's words. A product page reached by several variants is
+# downloaded once through the page cache and its single-flight, and the
+# engine keeps one offer per URL when it merges the variants. Nothing is
+# reserved up front, so a variant that fails and is retried still gets its
+# products.
+
+class ExpansionScope:
+    def __init__(self, query):
+        self.words = query_words(query)
+
+expansion_scope = ContextVar("expansion_scope", default=None)
+
+# === Deep search ===
+# Listing endpoints only return their first page. In deep mode (set by the
+# engine for the whole search; threads started with the caller's context see
+# it) scrapers that can tell how many pages a listing has fetch the rest
+# concurrently, within a per-store page and time budget, and push each page
+# through the listing pipeline as it lands. Endpoints that take a result
+# count instead of a page number just ask for more results.
+
+DEEP_MAX_PAGES = 10     # per store, including the first
+DEEP_PAGE_WORKERS = 4   # concurrent page downloads per store
+DEEP_TIME_BUDGET = 20   # seconds per store for the extra pages
+DEEP_RESULT_COUNT = 100 # result count for count-based endpoints (WoodMart AJAX)
+
+deep_search = ContextVar("deep_search", default=False)
+
+def listing_size(default):
+    """Result count to request from a count-based listing endpoint"""
+    return max(default, DEEP_RESULT_COUNT) if deep_search.get() else default
+
+def fetch_remaining_pages(page_count, fetch_page):
+    """
+    In deep mode, yield the listing items of pages 2..page_count in the order
+    they land. fetch_page(n) downloads and parses page n. Pages past
+    DEEP_MAX_PAGES or still missing when DEEP_TIME_BUDGET runs out are skipped;
+    the budget counts the downloads only, not the caller's work between pages.
+    """
+    if not deep_search.get() or not page_count or page_count <= 1:
+        return
+
+    import contextvars
+    import queue
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = telemetry.current_store.get()
+    last = min(page_count, DEEP_MAX_PAGES)
+    deadline = time.monotonic() + DEEP_TIME_BUDGET
+    executor = ThreadPoolExecutor(max_workers=min(DEEP_PAGE_WORKERS, last - 1), thread_name_prefix="page")
+    futures = {
+        executor.submit(contextvars.copy_context().run, fetch_page, n): n
+        for n in range(2, last + 1)
+    }
+    # Pages are stamped when they land, so ones that landed in time are kept however long the caller takes
+    landed = queue.Queue()
+    for future in futures:
+        future.add_done_callback(lambda f: landed.put((f, time.monotonic())))
+    try:
+        for _ in range(len(futures)):
+            try:
+                future, finished = landed.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                finished = None
+            if finished is None or finished > deadline:
+                print(f"⏱️ {store}: deep search budget used up, skipping remaining pages")
+                break
+            try:
+                items = future.result()
+            except Exception as e:
+                print(f"❌ Error fetching {store} page {futures[future]}: {e}")
+                continue
+            telemetry.incr("listing_pages_total", store)
+            yield items
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def page_count_from_links(html, param="page"):
+    """
+    Highest page number linked from a search results page (1 if none), from
+    ?page=N style or WordPress /page/N/ links. A regex over the raw page, so
+    the listing parser's output stays a plain list.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="ignore")
+    numbers = re.findall(rf'href="[^"]*?(?:[?&](?:amp;)?{param}=|/page/)(\d+)', html)
+    return max([1] + [int(n) for n in numbers])
+
+def parse_stock_sigma(html):
+    """Stock status from a downloaded Sigma product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the cart icon element and check the text after it
+    cart_icons = soup.select("i.fa.fa-shopping-cart")
+
+    for cart_icon in cart_icons:
+        # Get the parent element or next sibling to find the text
+        parent = cart_icon.parent
+        if parent:
+            text = parent.get_text().strip().lower()
+            if "add to cart" in text:
+                return "In Stock"
+            elif "out of stock" in text:
+                return "Out of Stock"
+
+        # Also check next sibling text
+        next_element = cart_icon.next_sibling
+        if next_element and hasattr(next_element, 'strip'):
+            text = next_element.strip().lower()
+            if "add to cart" in text:
+                return "In Stock"
+            elif "out of stock" in text:
+                return "Out of Stock"
+
+    # Alternative approach: look for button text directly
+    buttons = soup.select("button, a[class*='cart'], [class*='add-to-cart']")
+    for button in buttons:
+        text = button.get_text().strip().lower()
+        if "add to cart" in text:
+            return "In Stock"
+        elif "out of stock" in text:
+            return "Out of Stock"
+
+    # Additional fallback: check for common stock indicators
+    stock_texts = soup.find_all(text=re.compile(r"(out of stock|add to cart)", re.IGNORECASE))
+    for text in stock_texts:
+        text_lower = text.strip().lower()
+        if "add to cart" in text_lower:
+            return "In Stock"
+        elif "out of stock" in text_lower:
+            return "Out of Stock"
+
+    return "Check site"
+
+def get_stock_status_sigma(product_url):
+    """
+    Fetch the actual stock status from the Sigma product page
+    """
+    return fetch_stock_status(product_url, parse_stock_sigma, "Sigma", headers={"User-Agent": "Mozilla/5.0"})
+
+def parse_listing_sigma(html):
+    """Listing candidates from Sigma's search autocomplete HTML"""
+    soup = BeautifulSoup(html, "html.parser")
+    results = []
+
+    for li in soup.select("ul#country-list li"):
+        a = li.find("a")
+        span = li.find("span")
+        if a and span:
+            price = extract_price(span.text)
+            product_url = "https://www.sigma-computer.com/" + a['href']
+
+            results.append({
+                "name": a.text.strip(),
+                "url": product_url,
+                "price": price,
+                "store": "Sigma",
+                "availability": None
+            })
+    return results
 
 def scrape_sigma(query):
     url = "https://www.sigma-computer.com/searchautocomplete"
     params = {"keyword": query}
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=10)
-        soup = BeautifulSoup(r.text, "html.parser")
-        results = []
-        
-        for li in soup.select("ul#country-list li"):
-            a = li.find("a")
-            span = li.find("span")
-            if a and span:
-                price = extract_price(span.text)
-                if price and price > 1:  # Filter out 1 EGP prices
-                    product_url = "https://www.sigma-computer.com/" + a['href']
-                    
-                    # Get actual stock status from product page
-                    stock_status = get_stock_status_sigma(product_url)
-                    
-                    results.append({
-                        "name": a.text.strip(),
-                        "url": product_url,
-                        "price": price,
-                        "store": "Sigma",
-                        "availability": stock_status
-                    })
-        return results
+        r = http_get(url, params=params, headers=headers, timeout=10)
+        results = run_parser(parse_listing_sigma, r.content)
+
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_sigma)
     except Exception as e:
         print(f"Error scraping Sigma: {e}")
         return []
@@ -106,44 +735,41 @@ def extract_price(price_str):
 
 
 # ✅ 2. Elnekhely Technology (JSON)
+def parse_stock_elnekhely(html):
+    """Stock status from a downloaded Elnekhely product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("li.product-stock")
+    if stock_element:
+        if "in-stock" in stock_element.get("class", []):
+            return "In Stock"
+        elif "out-of-stock" in stock_element.get("class", []):
+            return "Out of Stock"
+        else:
+            # Fallback: check the text content
+            stock_text = stock_element.get_text().lower()
+            if "in stock" in stock_text:
+                return "In Stock"
+            elif "out of stock" in stock_text:
+                return "Out of Stock"
+
+    # Additional fallback: look for other common stock indicators
+    stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out of Stock')")
+    for indicator in stock_indicators:
+        text = indicator.get_text().lower()
+        if "in stock" in text:
+            return "In Stock"
+        elif "out of stock" in text:
+            return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_elnekhely(product_url):
     """
     Fetch the actual stock status from the product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("li.product-stock")
-            if stock_element:
-                if "in-stock" in stock_element.get("class", []):
-                    return "In Stock"
-                elif "out-of-stock" in stock_element.get("class", []):
-                    return "Out of Stock"
-                else:
-                    # Fallback: check the text content
-                    stock_text = stock_element.get_text().lower()
-                    if "in stock" in stock_text:
-                        return "In Stock"
-                    elif "out of stock" in stock_text:
-                        return "Out of Stock"
-            
-            # Additional fallback: look for other common stock indicators
-            stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out of Stock')")
-            for indicator in stock_indicators:
-                text = indicator.get_text().lower()
-                if "in stock" in text:
-                    return "In Stock"
-                elif "out of stock" in text:
-                    return "Out of Stock"
-                    
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching stock status: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_elnekhely, "Elnekhely", headers={"User-Agent": "Mozilla/5.0"})
 
 def scrape_elnekhely(query):
     url = f"https://www.elnekhelytechnology.com/index.php?route=journal3/search&search={query}"
@@ -152,7 +778,7 @@ def scrape_elnekhely(query):
         "Accept": "application/json"
     }
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = http_get(url, headers=headers, timeout=10)
         results = []
 
         if r.status_code == 200 and "response" in r.json():
@@ -161,21 +787,19 @@ def scrape_elnekhely(query):
                     price_str = item.get("special") or item.get("price")
                     price = extract_price(price_str)
                     product_url = item["href"]
-                    
-                    if price and price > 1:  # Filter out 1 EGP prices
-                        # Get actual stock status from product page
-                        stock_status = get_stock_status_elnekhely(product_url)
-                        
-                        results.append({
-                            "name": item["name"],
-                            "url": product_url,
-                            "price": price,
-                            "store": "Elnekhely",
-                            "availability": stock_status
-                        })
-        return results
+
+                    results.append({
+                        "name": item["name"],
+                        "url": product_url,
+                        "price": price,
+                        "store": "Elnekhely",
+                        "availability": None
+                    })
+
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_elnekhely)
     except Exception as e:
-        st.error(f"Error scraping Elnekhely: {e}")
+        print(f"❌ Error scraping Elnekhely: {e}")
         return []
 
 def extract_price(price_str):
@@ -216,50 +840,47 @@ WORKING_COOKIES = {
 }
 
 
+def parse_stock_elbadrgroup(html):
+    """Stock status from a downloaded ElBadrGroup product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("li.product-stock")
+    if stock_element:
+        if "in-stock" in stock_element.get("class", []):
+            return "In Stock"
+        elif "out-of-stock" in stock_element.get("class", []):
+            return "Out of Stock"
+        else:
+            # Fallback: check the text content
+            stock_text = stock_element.get_text().lower().strip()
+            if "in stock" in stock_text:
+                return "In Stock"
+            elif "out of stock" in stock_text:
+                return "Out of Stock"
+
+    # Additional fallback: look for other common stock indicators
+    stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out Of Stock')")
+    for indicator in stock_indicators:
+        text = indicator.get_text().lower().strip()
+        if "in stock" in text:
+            return "In Stock"
+        elif "out of stock" in text:
+            return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_elbadrgroup(product_url):
     """
     Fetch the actual stock status from the ElBadrGroup product page
     """
-    try:
-        response = requests.get(product_url, headers=WORKING_HEADERS, cookies=WORKING_COOKIES, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("li.product-stock")
-            if stock_element:
-                if "in-stock" in stock_element.get("class", []):
-                    return "In Stock"
-                elif "out-of-stock" in stock_element.get("class", []):
-                    return "Out of Stock"
-                else:
-                    # Fallback: check the text content
-                    stock_text = stock_element.get_text().lower().strip()
-                    if "in stock" in stock_text:
-                        return "In Stock"
-                    elif "out of stock" in stock_text:
-                        return "Out of Stock"
-            
-            # Additional fallback: look for other common stock indicators
-            stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out Of Stock')")
-            for indicator in stock_indicators:
-                text = indicator.get_text().lower().strip()
-                if "in stock" in text:
-                    return "In Stock"
-                elif "out of stock" in text:
-                    return "Out of Stock"
-                    
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching stock status from ElBadrGroup: {e}")
-        return "Check site"
-
+    return fetch_stock_status(product_url, parse_stock_elbadrgroup, "ElBadrGroup", headers=WORKING_HEADERS, cookies=WORKING_COOKIES)
 
 def scrape_elbadrgroupe(query):
     url = f"https://elbadrgroupeg.store/index.php?route=journal3/search&search={query}"
     
     try:
-        r = requests.get(url, headers=WORKING_HEADERS, cookies=WORKING_COOKIES, timeout=10)
+        r = http_get(url, headers=WORKING_HEADERS, cookies=WORKING_COOKIES, timeout=10)
         results = []
         if r.status_code == 200:
             try:
@@ -270,23 +891,21 @@ def scrape_elbadrgroupe(query):
                             price_str = item.get("special") or item.get("price")
                             price = extract_price(price_str)
                             product_url = item.get("href", "#")
-                            
-                            if price and price > 1:  # Filter out 1 EGP prices
-                                # Get actual stock status from product page
-                                stock_status = get_stock_status_elbadrgroup(product_url)
-                                
-                                results.append({
-                                    "name": item["name"],
-                                    "url": product_url,
-                                    "price": price,
-                                    "store": "ElBadrGroup",
-                                    "availability": stock_status
-                                })
+
+                            results.append({
+                                "name": item["name"],
+                                "url": product_url,
+                                "price": price,
+                                "store": "ElBadrGroup",
+                                "availability": None
+                            })
             except Exception as e:
                 print("❌ Error parsing JSON from ElBadrGroup:", e)
-        return results
+
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_elbadrgroup)
     except Exception as e:
-        st.error(f"Error scraping ElBadrGroup: {e}")
+        print(f"❌ Error scraping ElBadrGroup: {e}")
         return []
         
 #✅ 4. barakacomputer
@@ -307,7 +926,7 @@ def scrape_barakacomputer(query):
     }
 
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = http_get(url, headers=headers, timeout=10)
         results = []
 
         if r.status_code == 200:
@@ -320,20 +939,19 @@ def scrape_barakacomputer(query):
                         price_html = item.get("price")
                         if name and link and price_html:
                             price = extract_price_from_html(price_html)
-                            if price and price > 1:  # Filter out 1 EGP prices
-                                results.append({
-                                    "name": name.strip(),
-                                    "url": link,
-                                    "price": price,
-                                    "store": "BarakaComputer",
-                                    "availability": "In Stock"
-                                })
+                            results.append({
+                                "name": name.strip(),
+                                "url": link,
+                                "price": price,
+                                "store": "BarakaComputer",
+                                "availability": "In Stock"
+                            })
             except Exception as e:
                 print("❌ Error parsing JSON from BarakaComputer:", e)
 
-        return results
+        return run_listing_pipeline(results, query)
     except Exception as e:
-        st.error(f"Error scraping BarakaComputer: {e}")
+        print(f"❌ Error scraping BarakaComputer: {e}")
         return []
 
 #✅ 5. delta-computer
@@ -348,32 +966,47 @@ def scrape_deltacomputer(query):
         "Accept": "application/json"
     }
 
+    def parse_page(data):
+        results = []
+        if "data" in data and isinstance(data["data"], list):
+            for item in data["data"]:
+                name = item.get("name") or item.get("title")
+                link = "https://delta-computer.net/product/" + str(item.get("slug", ""))
+                price = extract_price(item.get("price"))
+                if name:
+                    results.append({
+                        "name": name.strip(),
+                        "url": link,
+                        "price": price,
+                        "store": "DeltaComputer",
+                        "availability": "In Stock"
+                    })
+        return results
+
+    def fetch_page(page):
+        return parse_page(http_get(f"{url}&page={page}", headers=headers, timeout=10).json())
+
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = http_get(url, headers=headers, timeout=10)
         results = []
+        last_page = 1
 
         if r.status_code == 200:
             try:
                 data = r.json()
-                if "data" in data and isinstance(data["data"], list):
-                    for item in data["data"]:
-                        name = item.get("name") or item.get("title")
-                        link = "https://delta-computer.net/product/" + str(item.get("slug", ""))
-                        price = extract_price(item.get("price"))
-                        if name and price and price > 1:  # Filter out 1 EGP prices
-                            results.append({
-                                "name": name.strip(),
-                                "url": link,
-                                "price": price,
-                                "store": "DeltaComputer",
-                                "availability": "In Stock"
-                            })
+                results = parse_page(data)
+                # Laravel pagination: under "meta" for API resources, top level otherwise
+                last_page = (data.get("meta") or data).get("last_page") or 1
             except Exception as e:
                 print("❌ Error parsing JSON from DeltaComputer:", e)
 
-        return results
+        seen = set()
+        offers = run_listing_pipeline(results, query, seen=seen)
+        for items in fetch_remaining_pages(last_page, fetch_page):
+            offers += run_listing_pipeline(items, query, seen=seen)
+        return offers
     except Exception as e:
-        st.error(f"Error scraping DeltaComputer: {e}")
+        print(f"❌ Error scraping DeltaComputer: {e}")
         return []
 
 #✅ 6. elnour-tech (FIXED)
@@ -411,41 +1044,98 @@ def extract_price_european_format(price_text):
     except ValueError:
         return None
 
+def parse_stock_elnourtech(html):
+    """Stock status from a downloaded ElnourTech product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Check for out of stock indicators
+    out_of_stock_selectors = [
+        ".out-of-stock",
+        ".stock.out-of-stock",
+        "*:contains('Out of stock')",
+        "*:contains('نفدت الكمية')",
+        "button:disabled",
+        ".single_add_to_cart_button:disabled"
+    ]
+
+    for selector in out_of_stock_selectors:
+        element = soup.select_one(selector)
+        if element:
+            return "Out of Stock"
+
+    # Check if add to cart button is available
+    add_to_cart = soup.select_one(".single_add_to_cart_button, .add_to_cart_button")
+    if add_to_cart and "disabled" in add_to_cart.get("class", []):
+        return "Out of Stock"
+
+    return "In Stock"
+
 def get_stock_status_elnourtech(product_url):
     """
     Fetch the actual stock status from ElnourTech product page
     """
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Check for out of stock indicators
-            out_of_stock_selectors = [
-                ".out-of-stock",
-                ".stock.out-of-stock",
-                "*:contains('Out of stock')",
-                "*:contains('نفدت الكمية')",
-                "button:disabled",
-                ".single_add_to_cart_button:disabled"
-            ]
-            
-            for selector in out_of_stock_selectors:
-                element = soup.select_one(selector)
-                if element:
-                    return "Out of Stock"
-            
-            # Check if add to cart button is available
-            add_to_cart = soup.select_one(".single_add_to_cart_button, .add_to_cart_button")
-            if add_to_cart and "disabled" in add_to_cart.get("class", []):
-                return "Out of Stock"
-            
-            return "In Stock"
-                    
-    except Exception as e:
-        print(f"Error fetching stock status from ElnourTech: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_elnourtech, "ElnourTech", headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"})
+
+def parse_listing_elnourtech(html, limit=10):
+    """Listing candidates from an ElnourTech search results page (fallback path); limit=None keeps all"""
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+
+    # Try different product selectors
+    product_selectors = [
+        ".product",
+        ".woocommerce-product",
+        ".product-item",
+        ".shop-item",
+        "li[class*='product']"
+    ]
+
+    products = []
+    for selector in product_selectors:
+        products = soup.select(selector)
+        if products:
+            print(f"Found {len(products)} products with selector: {selector}")
+            break
+
+    for product in products[:limit]:
+        try:
+            # Get product name and link
+            link_element = product.select_one("a[href*='/product/'], .woocommerce-loop-product__link, h2 a")
+            if not link_element:
+                continue
+
+            name = link_element.get("title") or link_element.get_text().strip()
+            link = link_element.get("href")
+
+            if not name or not link:
+                continue
+
+            # Make sure link is absolute
+            if link.startswith('/'):
+                link = "https://elnour-tech.com" + link
+
+            # Get price
+            price_element = product.select_one(".price .amount, .woocommerce-Price-amount, .price")
+            if not price_element:
+                continue
+
+            price = extract_price_european_format(price_element.get_text())
+            if not price or price <= 0:
+                continue
+
+            results.append({
+                "name": name,
+                "url": link,
+                "price": price,
+                "store": "ElnourTech",
+                "availability": None
+            })
+
+        except Exception as e:
+            print(f"❌ Error parsing fallback product: {e}")
+            continue
+
+    return results
 
 def scrape_elnourtech(query):
     """
@@ -503,13 +1193,13 @@ def scrape_elnourtech(query):
     try:
         ajax_params = {
             "action": "woodmart_ajax_search",
-            "number": 20,
+            "number": listing_size(20),
             "post_type": "product",
             "query": query
         }
         
         print(f"Trying AJAX search for: {query}")
-        response = requests.get(primary_url, params=ajax_params, headers=headers, timeout=15)
+        response = http_get(primary_url, params=ajax_params, headers=headers, timeout=15)
         
         if response.status_code == 200:
             try:
@@ -533,25 +1223,23 @@ def scrape_elnourtech(query):
                         # Skip items without valid price
                         if not price or price <= 0:
                             continue
-                        
-                        # Get stock status
-                        stock_status = get_stock_status_elnourtech(link)
-                        
+
                         results.append({
                             "name": name,
                             "url": link,
                             "price": price,
                             "store": "ElnourTech",
-                            "availability": stock_status
+                            "availability": None
                         })
-                        
-                        print(f"✅ Added: {name} - {price} EGP - {stock_status}")
-                        
+
                     except Exception as e:
                         print(f"❌ Error parsing ElnourTech item: {e}")
                         continue
-                
+
                 if results:
+                    # Get stock status for matching products only
+                    results = run_listing_pipeline(results, query, stock_func=get_stock_status_elnourtech)
+                    print(f"✅ Added {len(results)} matching products from AJAX")
                     return results
                     
             except json.JSONDecodeError as e:
@@ -569,71 +1257,24 @@ def scrape_elnourtech(query):
     for fallback_url in fallback_urls:
         try:
             print(f"Trying fallback URL: {fallback_url}")
-            response = requests.get(fallback_url, headers=headers, timeout=15)
+            response = http_get(fallback_url, headers=headers, timeout=15)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Try different product selectors
-                product_selectors = [
-                    ".product",
-                    ".woocommerce-product",
-                    ".product-item",
-                    ".shop-item",
-                    "li[class*='product']"
-                ]
-                
-                products = []
-                for selector in product_selectors:
-                    products = soup.select(selector)
-                    if products:
-                        print(f"Found {len(products)} products with selector: {selector}")
-                        break
-                
-                for product in products[:10]:  # Limit to first 10 products
-                    try:
-                        # Get product name and link
-                        link_element = product.select_one("a[href*='/product/'], .woocommerce-loop-product__link, h2 a")
-                        if not link_element:
-                            continue
-                        
-                        name = link_element.get("title") or link_element.get_text().strip()
-                        link = link_element.get("href")
-                        
-                        if not name or not link:
-                            continue
-                        
-                        # Make sure link is absolute
-                        if link.startswith('/'):
-                            link = "https://elnour-tech.com" + link
-                        
-                        # Get price
-                        price_element = product.select_one(".price .amount, .woocommerce-Price-amount, .price")
-                        if not price_element:
-                            continue
-                        
-                        price = extract_price_european_format(price_element.get_text())
-                        if not price or price <= 0:
-                            continue
-                        
-                        # Get stock status
-                        stock_status = get_stock_status_elnourtech(link)
-                        
-                        results.append({
-                            "name": name,
-                            "url": link,
-                            "price": price,
-                            "store": "ElnourTech",
-                            "availability": stock_status
-                        })
-                        
-                        print(f"✅ Added from fallback: {name} - {price} EGP")
-                        
-                    except Exception as e:
-                        print(f"❌ Error parsing fallback product: {e}")
-                        continue
-                
+                limit = None if deep_search.get() else 10
+                results = run_parser(parse_listing_elnourtech, response.content, limit)
+
                 if results:
+                    # Get stock status for matching products only
+                    seen = set()
+                    results = run_listing_pipeline(results, query, stock_func=get_stock_status_elnourtech, seen=seen)
+
+                    def fetch_page(page, base=fallback_url):
+                        page_response = http_get(base.replace("/?s=", f"/page/{page}/?s="), headers=headers, timeout=15)
+                        return run_parser(parse_listing_elnourtech, page_response.content, None)
+
+                    for items in fetch_remaining_pages(page_count_from_links(response.content), fetch_page):
+                        results += run_listing_pipeline(items, query, stock_func=get_stock_status_elnourtech, seen=seen)
+                    print(f"✅ Added {len(results)} matching products from fallback")
                     return results
                     
         except requests.RequestException as e:
@@ -656,13 +1297,13 @@ def scrape_solidhardware(query):
             return int("".join(numbers)) if numbers else None
         return None
 
-    url = f"https://solidhardware.store/wp-admin/admin-ajax.php?action=woodmart_ajax_search&number=20&post_type=product&query={query}"
+    url = f"https://solidhardware.store/wp-admin/admin-ajax.php?action=woodmart_ajax_search&number={listing_size(20)}&post_type=product&query={query}"
     headers = {
         "User-Agent": "Mozilla/5.0",
         "Accept": "application/json"
     }
 
-    r = requests.get(url, headers=headers)
+    r = http_get(url, headers=headers)
     results = []
 
     if r.status_code == 200:
@@ -685,61 +1326,58 @@ def scrape_solidhardware(query):
         except Exception as e:
             print("❌ Error parsing JSON from SolidHardware:", e)
 
-    return results
+    return run_listing_pipeline(results, query)
 
 #✅ 8. alfrensia
+def parse_stock_alfrensia(html):
+    """Stock status from a downloaded Alfrensia product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("p.stock")
+    if stock_element:
+        # Check CSS classes first
+        if "in-stock" in stock_element.get("class", []):
+            return "In Stock"
+        elif "out-of-stock" in stock_element.get("class", []):
+            return "Out of Stock"
+
+        # Check text content for various stock messages
+        stock_text = stock_element.get_text().strip().lower()
+
+        # Check for in-stock indicators (English and Arabic)
+        in_stock_indicators = [
+            "in stock",
+            "متوفر في المخزون",
+            "left in stock"  # This covers "Only 2 left in stock", "Only 1 left in stock", etc.
+        ]
+
+        for indicator in in_stock_indicators:
+            if indicator in stock_text:
+                return "In Stock"
+
+        # If stock element exists but has no text and no in-stock class, it's likely out of stock
+        if not stock_text or stock_text == "":
+            return "Out of Stock"
+
+    # Additional fallback: look for other common stock indicators across the page
+    # Check for any element containing stock information
+    all_stock_elements = soup.find_all(text=re.compile(r'(in stock|متوفر في المخزون|left in stock)', re.IGNORECASE))
+    if all_stock_elements:
+        return "In Stock"
+
+    # Check for out of stock indicators
+    out_of_stock_elements = soup.find_all(text=re.compile(r'(out of stock|غير متوفر|نفد المخزون)', re.IGNORECASE))
+    if out_of_stock_elements:
+        return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_alfrensia(product_url):
     """
     Fetch the actual stock status from the product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("p.stock")
-            if stock_element:
-                # Check CSS classes first
-                if "in-stock" in stock_element.get("class", []):
-                    return "In Stock"
-                elif "out-of-stock" in stock_element.get("class", []):
-                    return "Out of Stock"
-                
-                # Check text content for various stock messages
-                stock_text = stock_element.get_text().strip().lower()
-                
-                # Check for in-stock indicators (English and Arabic)
-                in_stock_indicators = [
-                    "in stock",
-                    "متوفر في المخزون",
-                    "left in stock"  # This covers "Only 2 left in stock", "Only 1 left in stock", etc.
-                ]
-                
-                for indicator in in_stock_indicators:
-                    if indicator in stock_text:
-                        return "In Stock"
-                
-                # If stock element exists but has no text and no in-stock class, it's likely out of stock
-                if not stock_text or stock_text == "":
-                    return "Out of Stock"
-            
-            # Additional fallback: look for other common stock indicators across the page
-            # Check for any element containing stock information
-            all_stock_elements = soup.find_all(text=re.compile(r'(in stock|متوفر في المخزون|left in stock)', re.IGNORECASE))
-            if all_stock_elements:
-                return "In Stock"
-            
-            # Check for out of stock indicators
-            out_of_stock_elements = soup.find_all(text=re.compile(r'(out of stock|غير متوفر|نفد المخزون)', re.IGNORECASE))
-            if out_of_stock_elements:
-                return "Out of Stock"
-                    
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching stock status for Alfrensia: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_alfrensia, "Alfrensia", headers={"User-Agent": "Mozilla/5.0"})
 
 def extract_price_alfrensia(html_price):
     """Extract price from HTML content"""
@@ -758,7 +1396,7 @@ def scrape_alfrensia(query):
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_get(url, headers=headers, timeout=10)
         results = []
 
         if response.status_code == 200:
@@ -771,71 +1409,66 @@ def scrape_alfrensia(query):
                 price_html = item.get("price", "")
                 price = extract_price_alfrensia(price_html)
 
-                if title and product_url and price and price > 1:
-                    # Get actual stock status from product page
-                    stock_status = get_stock_status_alfrensia(product_url)
-                    
+                if title and product_url:
                     results.append({
                         "name": title,
                         "url": product_url,
                         "price": price,
                         "store": "Alfrensia",
-                        "availability": stock_status
+                        "availability": None
                     })
-                    
-        return results
+
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_alfrensia)
     except Exception as e:
         print(f"Error scraping Alfrensia: {e}")
         return []
 # ✅ 9. ahw.store
+def parse_stock_ahwstore(html):
+    """Stock status from a downloaded AHW Store product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("li.product-stock")
+    if stock_element:
+        # Check CSS classes first
+        classes = stock_element.get("class", [])
+        stock_span = stock_element.select_one("span")
+
+        if stock_span:
+            stock_text = stock_span.get_text().strip()
+
+            # Check for in-stock conditions
+            if "in-stock" in classes or stock_text.lower() in ["builds only", "in stock"]:
+                return "In Stock"
+
+            # Check for out-of-stock conditions
+            elif "out-of-stock" in classes or stock_text.lower() == "out of stock":
+                return "Out of Stock"
+
+        # Fallback: check the entire element text
+        full_text = stock_element.get_text().lower()
+        if "builds only" in full_text or "in stock" in full_text:
+            return "In Stock"
+        elif "out of stock" in full_text:
+            return "Out of Stock"
+
+    # Additional fallback: look for other stock indicators
+    stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out of Stock'), span:contains('Builds Only')")
+    for indicator in stock_indicators:
+        text = indicator.get_text().strip().lower()
+        if text in ["in stock", "builds only"]:
+            return "In Stock"
+        elif text == "out of stock":
+            return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_ahwstore(product_url):
     """
     Fetch the actual stock status from the AHW Store product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("li.product-stock")
-            if stock_element:
-                # Check CSS classes first
-                classes = stock_element.get("class", [])
-                stock_span = stock_element.select_one("span")
-                
-                if stock_span:
-                    stock_text = stock_span.get_text().strip()
-                    
-                    # Check for in-stock conditions
-                    if "in-stock" in classes or stock_text.lower() in ["builds only", "in stock"]:
-                        return "In Stock"
-                    
-                    # Check for out-of-stock conditions
-                    elif "out-of-stock" in classes or stock_text.lower() == "out of stock":
-                        return "Out of Stock"
-                
-                # Fallback: check the entire element text
-                full_text = stock_element.get_text().lower()
-                if "builds only" in full_text or "in stock" in full_text:
-                    return "In Stock"
-                elif "out of stock" in full_text:
-                    return "Out of Stock"
-            
-            # Additional fallback: look for other stock indicators
-            stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out of Stock'), span:contains('Builds Only')")
-            for indicator in stock_indicators:
-                text = indicator.get_text().strip().lower()
-                if text in ["in stock", "builds only"]:
-                    return "In Stock"
-                elif text == "out of stock":
-                    return "Out of Stock"
-                    
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching AHW Store stock status: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_ahwstore, "AHW Store", headers={"User-Agent": "Mozilla/5.0"})
 
 def scrape_ahwstore(query):
     url = f"https://ahw.store/index.php?route=journal3/search&search={query}"
@@ -845,7 +1478,7 @@ def scrape_ahwstore(query):
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_get(url, headers=headers, timeout=10)
         results = []
 
         if response.status_code == 200:
@@ -857,23 +1490,21 @@ def scrape_ahwstore(query):
                     price_str = item.get("special") or item.get("price")
                     price = extract_price(price_str)
 
-                    if name and link and price and price > 1:  # Filter out 1 EGP prices
-                        # Get actual stock status from product page
-                        stock_status = get_stock_status_ahwstore(link)
-                        
+                    if name and link:
                         results.append({
                             "name": name.strip(),
                             "url": link.strip(),
                             "price": price,
                             "store": "AHW Store",
-                            "availability": stock_status
+                            "availability": None
                         })
             except Exception as e:
                 print("❌ Error parsing JSON from AHW Store:", e)
 
-        return results
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_ahwstore)
     except Exception as e:
-        st.error(f"Error scraping AHW Store: {e}")
+        print(f"❌ Error scraping AHW Store: {e}")
         return []
 
 def extract_price(price_str):
@@ -884,94 +1515,144 @@ def extract_price(price_str):
     return int("".join(numbers)) if numbers else None
 
 # ✅ 10. kimostore
+def parse_stock_kimostore(html):
+    """Stock status from a downloaded KimoStore product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("span.product-form__inventory.inventory")
+    if stock_element:
+        stock_text = stock_element.get_text().strip().lower()
+
+        if "in stock" in stock_text:
+            return "In Stock"
+        elif "sold out" in stock_text:
+            return "Out of Stock"
+        else:
+            # Additional check for other possible text variations
+            if "available" in stock_text:
+                return "In Stock"
+            elif "unavailable" in stock_text or "out of stock" in stock_text:
+                return "Out of Stock"
+
+    # Alternative selectors as fallback
+    alternative_selectors = [
+        ".inventory--high",
+        ".inventory--low", 
+        ".inventory--medium",
+        "[data-inventory]",
+        ".stock-status"
+    ]
+
+    for selector in alternative_selectors:
+        element = soup.select_one(selector)
+        if element:
+            text = element.get_text().strip().lower()
+            if "in stock" in text or "available" in text:
+                return "In Stock"
+            elif "sold out" in text or "out of stock" in text or "unavailable" in text:
+                return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_kimostore(product_url):
     """
     Fetch the actual stock status from the KimoStore product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("span.product-form__inventory.inventory")
-            if stock_element:
-                stock_text = stock_element.get_text().strip().lower()
-                
-                if "in stock" in stock_text:
-                    return "In Stock"
-                elif "sold out" in stock_text:
-                    return "Out of Stock"
-                else:
-                    # Additional check for other possible text variations
-                    if "available" in stock_text:
-                        return "In Stock"
-                    elif "unavailable" in stock_text or "out of stock" in stock_text:
-                        return "Out of Stock"
-            
-            # Alternative selectors as fallback
-            alternative_selectors = [
-                ".inventory--high",
-                ".inventory--low", 
-                ".inventory--medium",
-                "[data-inventory]",
-                ".stock-status"
-            ]
-            
-            for selector in alternative_selectors:
-                element = soup.select_one(selector)
-                if element:
-                    text = element.get_text().strip().lower()
-                    if "in stock" in text or "available" in text:
-                        return "In Stock"
-                    elif "sold out" in text or "out of stock" in text or "unavailable" in text:
-                        return "Out of Stock"
-                        
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching stock status from KimoStore: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_kimostore, "KimoStore", headers={"User-Agent": "Mozilla/5.0"})
+
+def parse_price_kimostore(html):
+    """Price from a downloaded KimoStore product page, or None"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Price selectors
+    selectors = [
+        '.price-item--regular',
+        '.price__regular .price-item',
+        'span.price',
+        '.product__price span',
+        '.product__price .money',
+        '[data-product-price]',
+    ]
+
+    price = None
+    for selector in selectors:
+        tag = soup.select_one(selector)
+        if tag:
+            text = tag.get_text(strip=True)
+            match = re.search(r'[\d.,]+', text)
+            if match:
+                raw = match.group().replace(",", "")
+                try:
+                    price = int(float(raw))
+                    break
+                except:
+                    price = int(re.sub(r'\D', '', raw))
+                    break
+
+    return price
 
 def get_price_from_product_page(url):
     """Enhanced price extraction that also gets stock status"""
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        res = requests.get(url, headers=headers, timeout=10)
+        res = fetch_product_page(url, headers=headers, timeout=10)
         if res.status_code == 200:
-            soup = BeautifulSoup(res.text, "html.parser")
-            
-            # Price selectors
-            selectors = [
-                '.price-item--regular',
-                '.price__regular .price-item',
-                'span.price',
-                '.product__price span',
-                '.product__price .money',
-                '[data-product-price]',
-            ]
-            
-            price = None
-            for selector in selectors:
-                tag = soup.select_one(selector)
-                if tag:
-                    text = tag.get_text(strip=True)
-                    match = re.search(r'[\d.,]+', text)
-                    if match:
-                        raw = match.group().replace(",", "")
-                        try:
-                            price = int(float(raw))
-                            break
-                        except:
-                            price = int(re.sub(r'\D', '', raw))
-                            break
-            
-            return price
+            return run_parser(parse_price_kimostore, res.content)
     except Exception as e:
         print("❌ Error extracting price from KimoStore:", e)
     return None
 
+def parse_listing_kimostore(html):
+    """Product links from a KimoStore search results page (deep search); prices come from the product pages"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    results = []
+    seen_urls = set()
+    for link in soup.select("a[href*='/products/']"):
+        name = link.get_text(" ", strip=True)
+        path = link["href"].split("?")[0]
+        if not name or path in seen_urls:
+            continue
+        seen_urls.add(path)
+        results.append({
+            "name": name,
+            "url": path if path.startswith("http") else f"https://kimostore.net{path}",
+            "price": None,
+            "store": "Kimostore",
+            "availability": None
+        })
+    return results
+
+def scrape_kimostore_deep(query):
+    """All search result pages instead of the predictive-search suggestions"""
+    headers = {"User-Agent": "Mozilla/5.0"}
+
+    def fetch_page(page):
+        return http_get("https://kimostore.net/search",
+                        params={"q": query, "type": "product", "page": page}, headers=headers)
+
+    first = fetch_page(1)
+    if first.status_code != 200:
+        print("❌ HTTP Error from KimoStore:", first.status_code)
+        return []
+
+    seen = set()
+    enrich = dict(stock_func=get_stock_status_kimostore, price_func=get_price_from_product_page, seen=seen)
+    offers = run_listing_pipeline(run_parser(parse_listing_kimostore, first.content), query, **enrich)
+    remaining = fetch_remaining_pages(
+        page_count_from_links(first.content),
+        lambda page: run_parser(parse_listing_kimostore, fetch_page(page).content),
+    )
+    for items in remaining:
+        offers += run_listing_pipeline(items, query, **enrich)
+    return offers
+
 def scrape_kimostore(query):
+    if deep_search.get():
+        # Predictive search is capped at a handful of results
+        return scrape_kimostore_deep(query)
+
     url = "https://kimostore.net/search/suggest"
     params = {
         "section_id": "predictive-search",
@@ -988,7 +1669,7 @@ def scrape_kimostore(query):
         "Referer": "https://kimostore.net/",
     }
 
-    response = requests.get(url, headers=headers, params=params)
+    response = http_get(url, headers=headers, params=params)
 
     if response.status_code == 200:
         try:
@@ -1000,21 +1681,22 @@ def scrape_kimostore(query):
                 title = p.get("title", "").strip()
                 url_suffix = p.get("url", "#")
                 full_url = f"https://kimostore.net{url_suffix}"
-                
-                # Get price from product page
-                price = get_price_from_product_page(full_url)
-                
-                # Get stock status from product page
-                stock_status = get_stock_status_kimostore(full_url)
-                
+
                 results.append({
                     "name": title,
                     "url": full_url,
-                    "price": price,
+                    "price": None,
                     "store": "Kimostore",
-                    "availability": stock_status
+                    "availability": None
                 })
-            return results
+
+            # Price and stock status both come from the product page, so only
+            # fetch it for products whose title matches the query
+            return run_listing_pipeline(
+                results, query,
+                stock_func=get_stock_status_kimostore,
+                price_func=get_price_from_product_page
+            )
         except Exception as e:
             print("❌ JSON Parse Error from KimoStore:", e)
             return []
@@ -1022,34 +1704,30 @@ def scrape_kimostore(query):
         print("❌ HTTP Error from KimoStore:", response.status_code)
         return []
 # ✅ 11. uptodate
+def parse_stock_uptodate(html):
+    """Stock status from a downloaded Uptodate Store product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the specific out of stock element
+    out_of_stock_element = soup.select_one("p.stock.out-of-stock")
+    if out_of_stock_element and "out of stock" in out_of_stock_element.get_text().lower():
+        return "Out of Stock"
+
+    # Additional check for other possible out of stock indicators
+    stock_elements = soup.select("p.stock, .stock-status, .availability")
+    for element in stock_elements:
+        text = element.get_text().lower()
+        if "out of stock" in text:
+            return "Out of Stock"
+
+    # If no "Out of Stock" found, assume it's in stock
+    return "In Stock"
+
 def get_stock_status_uptodate(product_url):
     """
     Fetch the actual stock status from the product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the specific out of stock element
-            out_of_stock_element = soup.select_one("p.stock.out-of-stock")
-            if out_of_stock_element and "out of stock" in out_of_stock_element.get_text().lower():
-                return "Out of Stock"
-            
-            # Additional check for other possible out of stock indicators
-            stock_elements = soup.select("p.stock, .stock-status, .availability")
-            for element in stock_elements:
-                text = element.get_text().lower()
-                if "out of stock" in text:
-                    return "Out of Stock"
-            
-            # If no "Out of Stock" found, assume it's in stock
-            return "In Stock"
-            
-    except Exception as e:
-        print(f"Error fetching stock status for {product_url}: {e}")
-        return "In Stock"  # Default to In Stock if error occurs
+    return fetch_stock_status(product_url, parse_stock_uptodate, "Uptodate Store", headers={"User-Agent": "Mozilla/5.0"}, error_default="In Stock")
 
 def extract_price_uptodate(html_text):
     try:
@@ -1063,7 +1741,7 @@ def extract_price_uptodate(html_text):
         return None
 
 def scrape_uptodate(query):
-    url = f"https://uptodate.store/wp-admin/admin-ajax.php?action=woodmart_ajax_search&number=20&post_type=product&product_cat=0&query={query}"
+    url = f"https://uptodate.store/wp-admin/admin-ajax.php?action=woodmart_ajax_search&number={listing_size(20)}&post_type=product&product_cat=0&query={query}"
     headers = {
         "User-Agent": "Mozilla/5.0",
         "Accept": "application/json",
@@ -1071,7 +1749,7 @@ def scrape_uptodate(query):
         "Referer": "https://uptodate.store/"
     }
 
-    response = requests.get(url, headers=headers)
+    response = http_get(url, headers=headers)
     results = []
 
     if response.status_code == 200:
@@ -1083,53 +1761,78 @@ def scrape_uptodate(query):
                 price_html = item.get("price", "")
                 price = extract_price_uptodate(price_html)
 
-                if name and link and price and price > 1:
-                    # Get actual stock status from product page
-                    stock_status = get_stock_status_uptodate(link)
-                    
+                if name and link:
                     results.append({
                         "name": name,
-                        "url": link, 
+                        "url": link,
                         "price": price,
                         "store": "Uptodate Store",
-                        "availability": stock_status
+                        "availability": None
                     })
         except Exception as e:
             print("❌ Error parsing JSON from Uptodate Store:", e)
 
-    return results
+    # Get actual stock status from product page for matching products only
+    return run_listing_pipeline(results, query, stock_func=get_stock_status_uptodate)
 # ✅ 12. abcshop
+def parse_stock_abcshop(html):
+    """Stock status from a downloaded ABCShop product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the "Get notified when back in stock" element
+    notification_element = soup.select_one("#product_stock_notification_message")
+    if notification_element:
+        # Check if the text contains the out of stock message
+        text = notification_element.get_text().strip().lower()
+        if "get notified when back in stock" in text:
+            return "Out of Stock"
+
+    # Alternative: look for the text anywhere in the page
+    if "get notified when back in stock" in soup.get_text().lower():
+        return "Out of Stock"
+
+    # If we don't find the notification message, assume it's in stock
+    return "In Stock"
+
 def get_stock_status_abcshop(product_url):
     """
     Fetch the actual stock status from the product page
     Returns "Out of Stock" if "Get notified when back in stock" is found, otherwise "In Stock"
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the "Get notified when back in stock" element
-            notification_element = soup.select_one("#product_stock_notification_message")
-            if notification_element:
-                # Check if the text contains the out of stock message
-                text = notification_element.get_text().strip().lower()
-                if "get notified when back in stock" in text:
-                    return "Out of Stock"
-            
-            # Alternative: look for the text anywhere in the page
-            if "get notified when back in stock" in soup.get_text().lower():
-                return "Out of Stock"
-            
-            # If we don't find the notification message, assume it's in stock
-            return "In Stock"
-            
-    except Exception as e:
-        print(f"Error fetching stock status from ABCShop: {e}")
-        return "Check site"
-    
-    return "Check site"
+    return fetch_stock_status(product_url, parse_stock_abcshop, "ABCShop", headers={"User-Agent": "Mozilla/5.0"})
+
+def parse_listing_abcshop(html, base_url):
+    """Listing candidates from an ABCShop search page"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    results = []
+    product_links = soup.select("a.dropdown-item.p-2")
+
+    for item in product_links:
+        try:
+            name = item.select_one(".h6.fw-bold").text.strip()
+            link = base_url + item["href"]
+
+            price_el = item.select_one("b span.oe_currency_value")
+            if price_el:
+                raw_price = price_el.text.strip().replace(",", "")
+                price_val = round(float(raw_price)) 
+            else:
+                price_val = None
+
+            if name:
+                results.append({
+                    "name": name,
+                    "price": price_val,
+                    "url": link,
+                    "store": "ABC Shop",
+                    "availability": None
+                })
+
+        except Exception as e:
+            print(f"❌ Error parsing ABCShop item: {e}")
+
+    return results
 
 def scrape_abcshop(query):
     base_url = "https://www.abcshop-eg.com"
@@ -1140,120 +1843,54 @@ def scrape_abcshop(query):
     }
 
     try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        results = []
-        product_links = soup.select("a.dropdown-item.p-2")
-
-        for item in product_links:
-            try:
-                name = item.select_one(".h6.fw-bold").text.strip()
-                link = base_url + item["href"]
-                
-                price_el = item.select_one("b span.oe_currency_value")
-                if price_el:
-                    raw_price = price_el.text.strip().replace(",", "")
-                    price_val = round(float(raw_price)) 
-                else:
-                    price_val = None
-
-                if name and price_val and price_val > 1:
-                    # Get actual stock status from product page
-                    stock_status = get_stock_status_abcshop(link)
-                    
-                    results.append({
-                        "name": name,
-                        "price": price_val,
-                        "url": link,
-                        "store": "ABC Shop",
-                        "availability": stock_status
-                    })
-                    
-            except Exception as e:
-                print(f"❌ Error parsing ABCShop item: {e}")
+        response = http_get(search_url, headers=headers, timeout=10)
+        results = run_parser(parse_listing_abcshop, response.content, base_url)
 
-        return results
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_abcshop)
         
     except Exception as e:
         print(f"❌ Error scraping ABCShop: {e}")
         return []
         
 # ✅ 13. compumarts
-import requests
-from bs4 import BeautifulSoup
+
+def parse_stock_compumarts(html):
+    """Stock status from a downloaded CompuMarts product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the sold out label
+    sold_out_element = soup.select_one("span.product-label--sold-out")
+    if sold_out_element:
+        return "Out of Stock"
+
+    # Additional check for sold out text
+    sold_out_text = soup.select("span:contains('Sold out'), span:contains('sold out')")
+    if sold_out_text:
+        return "Out of Stock"
+
+    # Check for "Unavailable" text which is common on CompuMarts
+    unavailable_elements = soup.select("*:contains('Unavailable')")
+    if unavailable_elements:
+        return "Out of Stock"
+
+    # Check for stock status in button text
+    add_to_cart_button = soup.select_one("button[type='submit'], .btn-product-form")
+    if add_to_cart_button and "sold out" in add_to_cart_button.get_text().lower():
+        return "Out of Stock"
+
+    # If no sold out indicator found, assume it's in stock
+    return "In Stock"
 
 def get_stock_status_compumarts(product_url):
     """
     Fetch the actual stock status from the CompuMarts product page
     """
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the sold out label
-            sold_out_element = soup.select_one("span.product-label--sold-out")
-            if sold_out_element:
-                return "Out of Stock"
-            
-            # Additional check for sold out text
-            sold_out_text = soup.select("span:contains('Sold out'), span:contains('sold out')")
-            if sold_out_text:
-                return "Out of Stock"
-            
-            # Check for "Unavailable" text which is common on CompuMarts
-            unavailable_elements = soup.select("*:contains('Unavailable')")
-            if unavailable_elements:
-                return "Out of Stock"
-            
-            # Check for stock status in button text
-            add_to_cart_button = soup.select_one("button[type='submit'], .btn-product-form")
-            if add_to_cart_button and "sold out" in add_to_cart_button.get_text().lower():
-                return "Out of Stock"
-            
-            # If no sold out indicator found, assume it's in stock
-            return "In Stock"
-                    
-    except Exception as e:
-        print(f"Error fetching stock status from CompuMarts: {e}")
-        return "Check site"
-
-def scrape_compumarts(query):
-    base_url = "https://www.compumarts.com"
-    
-    # Try different possible search URL formats
-    possible_urls = [
-        f"{base_url}/search?q={query.replace(' ', '+')}",
-        f"{base_url}/search?query={query.replace(' ', '+')}",
-        f"{base_url}/collections/all?filter.v.availability=1&sort_by=best-selling&q={query.replace(' ', '+')}",
-        f"{base_url}/ar/search?options%5Bprefix%5D=last&q={query.replace(' ', '+')}"
-    ]
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
+    return fetch_stock_status(product_url, parse_stock_compumarts, "CompuMarts", headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"})
 
-    # Try different URL formats until one works
-    soup = None
-    working_url = None
-    
-    for url in possible_urls:
-        try:
-            response = requests.get(url, headers=headers, timeout=15)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                working_url = url
-                break
-                
-        except requests.RequestException:
-            continue
-    
-    if not soup:
-        print("❌ All URL formats failed")
-        return []
+def parse_listing_compumarts(html, base_url):
+    """Listing candidates from a CompuMarts search page, with sold-out labels"""
+    soup = BeautifulSoup(html, 'html.parser')
 
     # Try different selectors for product cards
     selectors_to_try = [
@@ -1341,16 +1978,14 @@ def scrape_compumarts(query):
                 "*:contains('Unavailable')"
             ]
             
-            stock_status = "In Stock"  # Default assumption
+            # None means "not sold out in search results", the pipeline then
+            # checks the product page
+            stock_status = None
             for selector in sold_out_selectors:
                 sold_out_label = card.select_one(selector)
                 if sold_out_label:
                     stock_status = "Out of Stock"
                     break
-            
-            # If not found as sold out in search results, check the product page
-            if stock_status == "In Stock":
-                stock_status = get_stock_status_compumarts(url)
 
             results.append({
                 "name": name,
@@ -1366,43 +2001,80 @@ def scrape_compumarts(query):
 
     return results
 
+def scrape_compumarts(query):
+    base_url = "https://www.compumarts.com"
+    
+    # Try different possible search URL formats
+    possible_urls = [
+        f"{base_url}/search?q={query.replace(' ', '+')}",
+        f"{base_url}/search?query={query.replace(' ', '+')}",
+        f"{base_url}/collections/all?filter.v.availability=1&sort_by=best-selling&q={query.replace(' ', '+')}",
+        f"{base_url}/ar/search?options%5Bprefix%5D=last&q={query.replace(' ', '+')}"
+    ]
+    
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    }
+
+    # Try different URL formats until one works
+    content = None
+    working_url = None
+    
+    for url in possible_urls:
+        try:
+            response = http_get(url, headers=headers, timeout=15)
+            
+            if response.status_code == 200:
+                content = response.content
+                working_url = url
+                break
+                
+        except requests.RequestException:
+            continue
+    
+    if content is None:
+        print("❌ All URL formats failed")
+        return []
+
+    results = run_parser(parse_listing_compumarts, content, base_url)
+
+    # If not found as sold out in search results, check the product page of
+    # matching products only
+    return run_listing_pipeline(results, query, stock_func=get_stock_status_compumarts)
+
 # ✅ 14. compunilestore
+def parse_stock_compunilestore(html):
+    """Stock status from a downloaded Compunilestore product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the specific out-of-stock element
+    out_of_stock_element = soup.select_one("p.stock.out-of-stock")
+    if out_of_stock_element:
+        # Check if it contains "Out of stock" text
+        stock_text = out_of_stock_element.get_text().lower()
+        if "out of stock" in stock_text:
+            return "Out of Stock"
+
+    # Additional check for other out-of-stock indicators
+    out_of_stock_indicators = soup.select("*:contains('Out of stock'), *:contains('out of stock')")
+    for indicator in out_of_stock_indicators:
+        if "out-of-stock" in indicator.get("class", []):
+            return "Out of Stock"
+
+    # If no out-of-stock indicator found, assume in stock
+    return "In Stock"
+
 def get_stock_status_compunilestore(product_url):
     """
     Fetch the actual stock status from the product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the specific out-of-stock element
-            out_of_stock_element = soup.select_one("p.stock.out-of-stock")
-            if out_of_stock_element:
-                # Check if it contains "Out of stock" text
-                stock_text = out_of_stock_element.get_text().lower()
-                if "out of stock" in stock_text:
-                    return "Out of Stock"
-            
-            # Additional check for other out-of-stock indicators
-            out_of_stock_indicators = soup.select("*:contains('Out of stock'), *:contains('out of stock')")
-            for indicator in out_of_stock_indicators:
-                if "out-of-stock" in indicator.get("class", []):
-                    return "Out of Stock"
-            
-            # If no out-of-stock indicator found, assume in stock
-            return "In Stock"
-            
-    except Exception as e:
-        print(f"Error fetching stock status for {product_url}: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_compunilestore, "Compunilestore", headers={"User-Agent": "Mozilla/5.0"})
 
 def scrape_compunilestore(query):
     url = "https://compunilestore.com/wp-admin/admin-ajax.php"
     params = {
         "action": "woodmart_ajax_search",
-        "number": 20,
+        "number": listing_size(20),
         "post_type": "product",
         "product_cat": 0,
         "query": query
@@ -1414,7 +2086,7 @@ def scrape_compunilestore(query):
         "Accept": "application/json"
     }
 
-    response = requests.get(url, params=params, headers=headers)
+    response = http_get(url, params=params, headers=headers)
 
     results = []
 
@@ -1432,35 +2104,26 @@ def scrape_compunilestore(query):
                 else:
                     price = None
 
-                if name and product_url and price:
-                    # Get actual stock status from product page
-                    stock_status = get_stock_status_compunilestore(product_url)
-                    
+                if name and product_url:
                     results.append({
                         "name": name,
                         "price": price,
                         "url": product_url,
                         "store": "Compunilestore",
-                        "availability": stock_status
+                        "availability": None
                     })
         except Exception as e:
             print("❌ JSON parse error:", e)
     else:
         print("❌ HTTP error:", response.status_code)
 
-    return results
+    # Get actual stock status from product page for matching products only
+    return run_listing_pipeline(results, query, stock_func=get_stock_status_compunilestore)
 
 # ✅ 15. compuscience
-def scrape_compuscience(query):
-    base_url = "https://compuscience.com.eg"
-    search_url = f"{base_url}/ar/بحث?controller=search&orderby=position&orderway=desc&search_category=all&submit_search=&search_query={query.replace(' ', '+')}"
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0"
-    }
-
-    response = requests.get(search_url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
+def parse_listing_compuscience(html, base_url):
+    """Listing candidates from a CompuScience search page"""
+    soup = BeautifulSoup(html, "html.parser")
     
     results = []
     products = soup.select("article.product-miniature")
@@ -1492,48 +2155,58 @@ def scrape_compuscience(query):
 
     return results
 
+def scrape_compuscience(query):
+    base_url = "https://compuscience.com.eg"
+    search_url = f"{base_url}/ar/بحث?controller=search&orderby=position&orderway=desc&search_category=all&submit_search=&search_query={query.replace(' ', '+')}"
+    
+    headers = {
+        "User-Agent": "Mozilla/5.0"
+    }
+
+    response = http_get(search_url, headers=headers)
+    results = run_parser(parse_listing_compuscience, response.content, base_url)
+
+    return run_listing_pipeline(results, query)
+
 # ✅ 16. MaximumHardware
+def parse_stock_maximumhardware(html):
+    """Stock status from a downloaded MaximumHardware product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("li.product-stock")
+    if stock_element:
+        # Check CSS classes first
+        if "in-stock" in stock_element.get("class", []):
+            return "In Stock"
+        elif "out-of-stock" in stock_element.get("class", []):
+            return "Out of Stock"
+        else:
+            # Fallback: check the span text content
+            stock_span = stock_element.select_one("span")
+            if stock_span:
+                stock_text = stock_span.get_text().strip().lower()
+                if "in stock" in stock_text:
+                    return "In Stock"
+                elif "out of stock" in stock_text:
+                    return "Out of Stock"
+
+    # Additional fallback: look for other common stock indicators
+    stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out Of Stock')")
+    for indicator in stock_indicators:
+        text = indicator.get_text().lower()
+        if "in stock" in text:
+            return "In Stock"
+        elif "out of stock" in text:
+            return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_maximumhardware(product_url):
     """
     Fetch the actual stock status from the MaximumHardware product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("li.product-stock")
-            if stock_element:
-                # Check CSS classes first
-                if "in-stock" in stock_element.get("class", []):
-                    return "In Stock"
-                elif "out-of-stock" in stock_element.get("class", []):
-                    return "Out of Stock"
-                else:
-                    # Fallback: check the span text content
-                    stock_span = stock_element.select_one("span")
-                    if stock_span:
-                        stock_text = stock_span.get_text().strip().lower()
-                        if "in stock" in stock_text:
-                            return "In Stock"
-                        elif "out of stock" in stock_text:
-                            return "Out of Stock"
-            
-            # Additional fallback: look for other common stock indicators
-            stock_indicators = soup.select("span:contains('In Stock'), span:contains('Out Of Stock')")
-            for indicator in stock_indicators:
-                text = indicator.get_text().lower()
-                if "in stock" in text:
-                    return "In Stock"
-                elif "out of stock" in text:
-                    return "Out of Stock"
-                    
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching stock status from MaximumHardware: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_maximumhardware, "MaximumHardware", headers={"User-Agent": "Mozilla/5.0"})
 
 def scrape_maximumhardware(query):
     url = f"https://maximumhardware.store/index.php?route=journal3/search&search={query}"
@@ -1544,7 +2217,7 @@ def scrape_maximumhardware(query):
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_get(url, headers=headers, timeout=10)
         data = response.json()
 
         results = []
@@ -1561,46 +2234,41 @@ def scrape_maximumhardware(query):
                 numbers = re.findall(r'\d+', price_text.replace(",", ""))
                 price = int("".join(numbers)) if numbers else None
 
-            if title and link and price and price > 1:
-                # Get actual stock status from product page
-                stock_status = get_stock_status_maximumhardware(link)
-                
+            if title and link:
                 results.append({
                     "name": title.strip(),
                     "price": price,
                     "url": link,
                     "store": "MaximumHardware",
-                    "availability": stock_status
+                    "availability": None
                 })
-        return results
+
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_maximumhardware)
 
     except Exception as e:
         print(f"❌ Error fetching from MaximumHardware: {e}")
         return []
 # ✅ 17. quantumtechnology
+def parse_stock_quantum(html):
+    """Stock status from a downloaded QuantumTechnology product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the out of stock element
+    out_of_stock_element = soup.select_one("p.stock.out-of-stock")
+    if out_of_stock_element:
+        stock_text = out_of_stock_element.get_text().lower().strip()
+        if "out of stock" in stock_text:
+            return "Out of Stock"
+
+    # If no out-of-stock element found, assume it's in stock
+    return "In Stock"
+
 def get_stock_status_quantum(product_url):
     """
     Fetch the actual stock status from the QuantumTechnology product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the out of stock element
-            out_of_stock_element = soup.select_one("p.stock.out-of-stock")
-            if out_of_stock_element:
-                stock_text = out_of_stock_element.get_text().lower().strip()
-                if "out of stock" in stock_text:
-                    return "Out of Stock"
-            
-            # If no out-of-stock element found, assume it's in stock
-            return "In Stock"
-            
-    except Exception as e:
-        print(f"Error fetching stock status from QuantumTechnology: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_quantum, "QuantumTechnology", headers={"User-Agent": "Mozilla/5.0"})
 
 def extract_price_from_html(price_html):
     try:
@@ -1619,7 +2287,7 @@ def scrape_quantumtechnology(query):
         url = f"https://quantumtechnologyeg.com/wp-admin/admin-ajax.php"
         params = {
             "action": "woodmart_ajax_search",
-            "number": "20",
+            "number": str(listing_size(20)),
             "post_type": "product",
             "product_cat": "0",
             "query": query
@@ -1629,7 +2297,7 @@ def scrape_quantumtechnology(query):
             "X-Requested-With": "XMLHttpRequest"
         }
 
-        response = requests.get(url, params=params, headers=headers)
+        response = http_get(url, params=params, headers=headers)
         response.raise_for_status()
         data = response.json()
 
@@ -1640,63 +2308,58 @@ def scrape_quantumtechnology(query):
             raw_price = product.get("price")
             price = extract_price_from_html(raw_price)
 
-            if price is not None and price > 1:  # Filter out invalid prices
-                # Get actual stock status from product page
-                stock_status = get_stock_status_quantum(product_url)
-                
+            if title and product_url:
                 results.append({
                     "name": title,
                     "price": price,
                     "url": product_url,
                     "store": "QuantumTechnology",
-                    "availability": stock_status
+                    "availability": None
                 })
 
-        return results
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(results, query, stock_func=get_stock_status_quantum)
 
     except Exception as e:
         print("❌ Error scraping QuantumTechnology:", e)
         return []
 
 # ✅ 18. HighEndStore
+def parse_stock_highendstore(html):
+    """Stock status from a downloaded HighEndStore product page"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for the stock status element
+    stock_element = soup.select_one("li.product-stock")
+    if stock_element:
+        if "in-stock" in stock_element.get("class", []):
+            return "In Stock"
+        elif "out-of-stock" in stock_element.get("class", []):
+            return "Out of Stock"
+        else:
+            # Fallback: check the text content
+            stock_text = stock_element.get_text().lower()
+            if "in stock" in stock_text:
+                return "In Stock"
+            elif "out of stock" in stock_text:
+                return "Out of Stock"
+
+    # Additional fallback: look for other common stock indicators
+    stock_spans = soup.select("span")
+    for span in stock_spans:
+        text = span.get_text().lower().strip()
+        if text == "in stock":
+            return "In Stock"
+        elif text == "out of stock":
+            return "Out of Stock"
+
+    return "Check site"
+
 def get_stock_status_highendstore(product_url):
     """
     Fetch the actual stock status from the HighEndStore product page
     """
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(product_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Look for the stock status element
-            stock_element = soup.select_one("li.product-stock")
-            if stock_element:
-                if "in-stock" in stock_element.get("class", []):
-                    return "In Stock"
-                elif "out-of-stock" in stock_element.get("class", []):
-                    return "Out of Stock"
-                else:
-                    # Fallback: check the text content
-                    stock_text = stock_element.get_text().lower()
-                    if "in stock" in stock_text:
-                        return "In Stock"
-                    elif "out of stock" in stock_text:
-                        return "Out of Stock"
-            
-            # Additional fallback: look for other common stock indicators
-            stock_spans = soup.select("span")
-            for span in stock_spans:
-                text = span.get_text().lower().strip()
-                if text == "in stock":
-                    return "In Stock"
-                elif text == "out of stock":
-                    return "Out of Stock"
-                    
-        return "Check site"
-    except Exception as e:
-        print(f"Error fetching stock status from HighEndStore: {e}")
-        return "Check site"
+    return fetch_stock_status(product_url, parse_stock_highendstore, "HighEndStore", headers={"User-Agent": "Mozilla/5.0"})
 
 def scrape_highendstore(search_term):
     try:
@@ -1707,7 +2370,7 @@ def scrape_highendstore(search_term):
             "X-Requested-With": "XMLHttpRequest"
         }
 
-        response = requests.get(url, headers=headers)
+        response = http_get(url, headers=headers)
         data = response.json()
 
         products = []
@@ -1717,19 +2380,17 @@ def scrape_highendstore(search_term):
                 price_num = float(price_str.replace(",", "").replace("EGP", "").strip())
                 product_url = item["href"]
 
-                # Get actual stock status from product page
-                stock_status = get_stock_status_highendstore(product_url)
-
                 product = {
                     "name": item["name"].strip(),
                     "price": price_num,
                     "url": product_url,
                     "store": "HighEndStore",
-                    "availability": stock_status
+                    "availability": None
                 }
                 products.append(product)
 
-        return products
+        # Get actual stock status from product page for matching products only
+        return run_listing_pipeline(products, search_term, stock_func=get_stock_status_highendstore)
 
     except Exception as e:
         print(f"❌ Error scraping HighEndStore: {e}")
@@ -1746,7 +2407,7 @@ def scrape_newvision(query="rtx 4070"):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = http_get(url, headers=headers, params=params)
         response.raise_for_status()
         raw_json = json.loads(response.text)
         suggestions = raw_json.get("suggestions", [])
@@ -1762,13 +2423,14 @@ def scrape_newvision(query="rtx 4070"):
             price = float(match.group(1).replace(".", "").replace(",", "")) if match else None
 
             results.append({
-                "title": title,
+                "name": title,
                 "price": price,
                 "url": url,
-                "source": "NewVision"
+                "store": "NewVision",
+                "availability": "Check site"
             })
 
-        return results
+        return run_listing_pipeline(results, query)
 
     except Exception as e:
         print(f"❌ Error scraping NewVision: {e}")
@@ -0,0 +1,415 @@
+"""
+Async HTTP JSON API in front of the scraping engine.
+
+    python price_api.py --port 8080
+
+    GET /health
+    GET /stores
+    GET /metrics                         (Prometheus text format)
+    GET /search?q=rtx+4070&stores=Sigma,KimoStore&min_price=20000&stock=In+Stock&sort=price_asc
+    GET /search?q=ssd&deep=1             (also fetch further result pages)
+    GET /search?q=rtx+4070&expand=1      (also search alternative spellings of the query)
+    GET /search?q=rtx+4070&view=best     (one row per product matched across stores)
+    GET /history?url=https://...&since=2024-06-01   (needs --history; or model=4070&stores=Sigma)
+    GET /search/stream?q=rtx+4070        (NDJSON: one line per store as it lands, then a summary)
+
+All clients share the process-wide HTTP connection pool and product-page cache
+(old_stores), plus a result cache keyed on (query, stores). Identical queries
+that arrive while a scrape is running attach to it instead of starting another.
+Filters and sort are applied per request on top of the shared results.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cachetools
+from aiohttp import web
+
+import telemetry
+from offers import frame_to_records, offers_to_frame
+from old_stores import configure_parse_pool, deep_search
+from product_matching import best_price_view
+from price_engine import (
+    PARSE_PROCESSES, PRICE_HISTORY_DIR, SORT_KEYS, STORE_SCRAPERS, apply_filters, apply_rate_limits,
+    build_scrapers, configure_history, did_you_mean, filter_mask, finalize_results, get_history,
+    parse_rate_limit, record_history, search_key,
+)
+from specs import FacetIndex
+
+logger = logging.getLogger("price_api")
+
+STOCK_CHOICES = ["In Stock", "Out of Stock", "Check site"]
+
+# Spec facets that can be selected with query parameters (brand=MSI,ASUS&capacity=16GB)
+FACET_PARAMS = ["brand", "capacity", "memory"]
+
+# Short sort names for query strings, next to the app's own labels
+SORT_ALIASES = {
+    "price_asc": "Price (Low to High)",
+    "price_desc": "Price (High to Low)",
+    "store": "Store Name",
+    "name": "Product Name",
+    "relevance": "Relevance",
+}
+
+
+class _InflightSearch:
+    """One running scrape that any number of requests can follow"""
+
+    def __init__(self):
+        self.events = []  # (store, offers, error) in completion order
+        self.result = None
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def finish(self, result):
+        async with self._changed:
+            self.result = result
+            self.done = True
+            self._changed.notify_all()
+
+    async def follow(self):
+        """Replay the stores finished so far, then yield the rest as they land"""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.events) or self.done)
+                batch = self.events[index:]
+                done = self.done
+            index += len(batch)
+            for event in batch:
+                yield event
+            if done and index == len(self.events):
+                return
+
+
+class SearchService:
+    """Shared result cache and single-flight scraping for all API clients"""
+
+    def __init__(self, max_workers=8, cache_ttl=300, cache_size=256):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+        self.cache = cachetools.TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.inflight = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "scrapes": 0}
+
+    @staticmethod
+    def cache_key(query, stores, deep=False, expand=False):
+        return search_key(query, stores, deep, expand)
+
+    def _start(self, key, query, stores, deep, expand):
+        flight = _InflightSearch()
+        self.inflight[key] = flight
+        self.stats["scrapes"] += 1
+        asyncio.get_running_loop().create_task(self._run(key, query, stores, deep, expand, flight))
+        return flight
+
+    async def _run(self, key, query, stores, deep, expand, flight):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        # The task runs in its own context copy; scrapers get a copy of it
+        deep_search.set(deep)
+
+        async def scrape_one(store_name, scraper_func):
+            try:
+                run = contextvars.copy_context().run
+                return store_name, await loop.run_in_executor(self.executor, run, scraper_func, query), None
+            except Exception as e:
+                return store_name, [], str(e)
+
+        all_offers = []
+        try:
+            tasks = [scrape_one(name, func) for name, func in build_scrapers(stores, expand).items()]
+            for coro in asyncio.as_completed(tasks):
+                store_name, offers, error = await coro
+                all_offers.extend(offers)
+                await flight.publish((store_name, offers, error))
+
+            with telemetry.timed("filter", "all"):
+                df = await loop.run_in_executor(self.executor, finalize_results, offers_to_frame(all_offers), query)
+            await loop.run_in_executor(self.executor, record_history, df, query)
+            self.cache[key] = df
+            logger.info(f"Scraped '{query}' in {time.perf_counter() - started:.1f}s: {len(df)} offers")
+        except Exception as e:
+            logger.error(f"Search failed for '{query}': {e}")
+            df = offers_to_frame([])
+        finally:
+            self.inflight.pop(key, None)
+
+        await flight.finish(df)
+
+    def lookup(self, query, stores, deep=False, expand=False):
+        """(cached DataFrame, None) or (None, in-flight search to follow)"""
+        self.stats["requests"] += 1
+        key = self.cache_key(query, stores, deep, expand)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached, None
+
+        flight = self.inflight.get(key)
+        if flight is not None:
+            self.stats["coalesced"] += 1
+            return None, flight
+
+        return None, self._start(key, query, stores, deep, expand)
+
+    async def search(self, query, stores, deep=False, expand=False):
+        cached, flight = self.lookup(query, stores, deep, expand)
+        if cached is not None:
+            return cached, True
+        async for _ in flight.follow():
+            pass
+        return flight.result, False
+
+
+def parse_search_params(request):
+    """Validated search parameters from the query string; raises HTTPBadRequest"""
+    params = request.query
+
+    query = " ".join(params.get("q", "").split())
+    if not query:
+        raise _bad_request("missing query parameter 'q'")
+
+    stores = [s.strip() for s in params.get("stores", "").split(",") if s.strip()]
+    unknown = sorted(set(stores) - set(STORE_SCRAPERS))
+    if unknown:
+        raise _bad_request(f"unknown stores: {', '.join(unknown)}")
+
+    try:
+        min_price = int(params.get("min_price", 0))
+        max_price = int(params.get("max_price", 10**9))
+    except ValueError:
+        raise _bad_request("min_price and max_price must be integers")
+
+    stock = [s for value in params.getall("stock", []) for s in value.split(",") if s]
+    if any(s not in STOCK_CHOICES for s in stock):
+        raise _bad_request(f"stock must be one of: {', '.join(STOCK_CHOICES)}")
+
+    view = params.get("view", "offers")
+    if view not in ("offers", "best"):
+        raise _bad_request("view must be one of: offers, best")
+
+    sort = params.get("sort", "price_asc")
+    sort = SORT_ALIASES.get(sort, sort)
+    if sort not in SORT_KEYS:
+        raise _bad_request(f"sort must be one of: {', '.join(list(SORT_ALIASES) + list(SORT_KEYS))}")
+
+    return {
+        "query": query,
+        "stores": stores,
+        "deep": params.get("deep", "").lower() in ("1", "true", "yes"),
+        "expand": params.get("expand", "").lower() in ("1", "true", "yes"),
+        "view": view,
+        "filters": (min_price, max_price, stock, sort),
+        "facets": {
+            facet: [v.strip() for value in params.getall(facet, []) for v in value.split(",") if v.strip()]
+            for facet in FACET_PARAMS
+        },
+    }
+
+
+def _bad_request(message):
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def handle_stores(request):
+    return web.json_response({"stores": list(STORE_SCRAPERS)})
+
+
+async def handle_stats(request):
+    service = request.app["service"]
+    return web.json_response(dict(service.stats, inflight=len(service.inflight), cached=len(service.cache)))
+
+
+async def handle_metrics(request):
+    """Scraping telemetry in the Prometheus text format"""
+    return web.Response(text=telemetry.to_prometheus(), content_type="text/plain",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+async def handle_search(request):
+    params = parse_search_params(request)
+    started = time.perf_counter()
+
+    df, cached = await request.app["service"].search(params["query"], params["stores"], params["deep"],
+                                                         params["expand"])
+    # Filtering and matching a large result set would stall every other client on the loop
+    results = await asyncio.get_running_loop().run_in_executor(None, search_results, df, params)
+
+    body = {
+        "query": params["query"],
+        "cached": cached,
+        "count": len(results["offers"]),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        **results,
+    }
+    return web.json_response(body, dumps=lambda obj: json.dumps(obj, ensure_ascii=False))
+
+
+def search_results(df, params):
+    """Filtered offers and facet counts of a search response (and suggestions when nothing was found)"""
+    facet_index = FacetIndex(df)
+    counts = facet_index.counts(params["facets"], base=filter_mask(df, *params["filters"][:3]))
+    filtered = apply_filters(df, *params["filters"], query=params["query"],
+                             facets=params["facets"], facet_index=facet_index)
+    results = {
+        "offers": best_price_records(filtered) if params["view"] == "best" else frame_to_records(filtered),
+        # Results each facet value would leave, given the other selections
+        "facets": {facet: {value: n for value, n in values.items() if n} for facet, values in counts.items()},
+    }
+    if df.empty:
+        results["did_you_mean"] = did_you_mean(params["query"])
+    return results
+
+
+def best_price_records(df):
+    """Best offer per matched product, with how many stores list it and the spread"""
+    best = best_price_view(df)
+    records = frame_to_records(best)
+    for record, row in zip(records, best.itertuples(index=False)):
+        record.update(stores=int(row.stores), offers=int(row.offers),
+                      max_price=int(row.max_price), savings=int(row.savings))
+    return records
+
+
+async def handle_history(request):
+    """Recorded offers for product URLs or a model number, oldest first"""
+    history = get_history()
+    if history is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "price history is not enabled (--history)"}),
+                               content_type="application/json")
+
+    params = request.query
+    urls = [u for value in params.getall("url", []) for u in value.split(",") if u] or None
+    model = params.get("model") or None
+    if urls is None and model is None:
+        raise _bad_request("give at least one 'url' or a 'model'")
+    stores = [s.strip() for s in params.get("stores", "").split(",") if s.strip()] or None
+
+    try:
+        df = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: history.query(urls=urls, model=model, stores=stores,
+                                        since=params.get("since"), until=params.get("until"))
+        )
+    except (ValueError, OSError) as e:
+        raise _bad_request(str(e))
+
+    return web.json_response({
+        "count": len(df),
+        "rows": [
+            {
+                "scraped_at": row.scraped_at.isoformat(),
+                "store": row.store,
+                "name": row.name,
+                "url": row.url,
+                "price": int(row.price),
+                "availability": row.availability,
+            }
+            for row in df.itertuples(index=False)
+        ],
+    }, dumps=lambda obj: json.dumps(obj, ensure_ascii=False))
+
+
+async def handle_search_stream(request):
+    """NDJSON stream: a line per store as it finishes, then the merged summary"""
+    params = parse_search_params(request)
+    query = params["query"]
+    filters = params["filters"]
+    facets = params["facets"]
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+
+    async def send(obj):
+        await response.write((json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def filtered_records(df):
+        return frame_to_records(apply_filters(df, *filters, query=query, facets=facets))
+
+    loop = asyncio.get_running_loop()
+    cached, flight = request.app["service"].lookup(query, params["stores"], params["deep"], params["expand"])
+
+    if cached is None:
+        async for store_name, offers, error in flight.follow():
+            partial = await loop.run_in_executor(
+                None, lambda: filtered_records(finalize_results(offers_to_frame(offers), query))
+            )
+            await send({
+                "type": "store",
+                "store": store_name,
+                "error": error,
+                "count": len(partial),
+                "offers": partial,
+            })
+        df = flight.result
+    else:
+        df = cached
+
+    records = await loop.run_in_executor(None, filtered_records, df)
+    await send({
+        "type": "result",
+        "query": query,
+        "cached": cached is not None,
+        "count": len(records),
+        "offers": records,
+    })
+    await response.write_eof()
+    return response
+
+
+def create_app(service=None):
+    app = web.Application()
+    app["service"] = service or SearchService()
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/stores", handle_stores)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/search", handle_search)
+    app.router.add_get("/search/stream", handle_search_stream)
+    app.router.add_get("/history", handle_history)
+
+    async def shutdown(app):
+        app["service"].executor.shutdown(wait=False, cancel_futures=True)
+
+    app.on_cleanup.append(shutdown)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP JSON API for Egypt tech price comparison")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="scraper threads shared by all requests")
+    parser.add_argument("--cache-ttl", type=int, default=300, help="seconds to keep search results")
+    parser.add_argument("--parse-processes", type=int, default=PARSE_PROCESSES,
+                        help="worker processes for HTML parsing (0 = in the scraper threads)")
+    parser.add_argument("--rate-limit", action="append", type=parse_rate_limit, metavar="STORE=RATE[:BURST]",
+                        help="requests per second for a store's hosts, or default=RATE for the rest (repeatable)")
+    parser.add_argument("--history", default=PRICE_HISTORY_DIR, metavar="DIR",
+                        help="record every search in the price history in DIR and serve /history (default: $PRICE_HISTORY_DIR)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    configure_parse_pool(args.parse_processes)
+    apply_rate_limits(args.rate_limit)
+    configure_history(args.history)
+    service = SearchService(max_workers=args.workers, cache_ttl=args.cache_ttl)
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
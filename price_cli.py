@@ -0,0 +1,169 @@
+"""
+Headless batch mode: run a file of queries through the scraping engine and
+stream the offers as JSON Lines or CSV.
+
+    python price_cli.py watchlist.txt --stores Sigma,KimoStore --format csv -o prices.csv
+    echo "rtx 4070" | python price_cli.py - --min-price 20000
+
+The queries file has one query per line; blank lines and lines starting with
+"#" are skipped. All queries share the engine's pooled HTTP session and its
+product-page cache, so a product matched by several queries is fetched once.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import telemetry
+from offers import frame_to_records
+from old_stores import configure_parse_pool, page_cache_stats
+from price_engine import (
+    PARSE_PROCESSES, PRICE_HISTORY_DIR, SORT_KEYS, STORE_SCRAPERS, apply_filters, apply_rate_limits,
+    configure_history, parse_rate_limit, search,
+)
+
+logger = logging.getLogger("price_cli")
+
+OUTPUT_FIELDS = ["query", "name", "price", "store", "availability", "url"]
+
+STOCK_CHOICES = ["In Stock", "Out of Stock", "Check site"]
+
+
+def read_queries(path):
+    """Queries from a file (or "-" for stdin), normalized and deduplicated in order"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        queries = []
+        seen = set()
+        for line in stream:
+            query = " ".join(line.split())
+            if not query or query.startswith("#"):
+                continue
+            key = query.lower()
+            if key not in seen:
+                seen.add(key)
+                queries.append(query)
+        return queries
+
+
+class OfferWriter:
+    """Streams offer rows in JSON Lines or CSV format"""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.rows = 0
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=OUTPUT_FIELDS)
+            self._csv.writeheader()
+
+    def write_frame(self, query, df):
+        for offer in frame_to_records(df):
+            record = dict(offer, query=query)
+            if self._csv is not None:
+                self._csv.writerow(record)
+            else:
+                self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.rows += 1
+        self.stream.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk price lookups across Egyptian tech stores")
+    parser.add_argument("queries", help='file with one query per line, or "-" for stdin')
+    parser.add_argument("--stores", help="comma-separated store names (default: all stores)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--min-price", type=int, default=0)
+    parser.add_argument("--max-price", type=int, default=10**9)
+    parser.add_argument("--stock", action="append", choices=STOCK_CHOICES,
+                        help="only include this availability (repeatable)")
+    parser.add_argument("--sort", choices=list(SORT_KEYS), default="Price (Low to High)")
+    parser.add_argument("--deep", action="store_true",
+                        help="also fetch further result pages from stores that paginate (slower, more offers)")
+    parser.add_argument("--expand", action="store_true",
+                        help="also search each store for alternative spellings of the query (\"geforce rtx ...\")")
+    parser.add_argument("--parallel", type=int, default=2,
+                        help="queries scraped at the same time (each fans out over stores)")
+    parser.add_argument("--parse-processes", type=int, default=PARSE_PROCESSES,
+                        help="worker processes for HTML parsing (default: $PARSE_PROCESSES or 0 = in-thread)")
+    parser.add_argument("--metrics", help="write scraping telemetry (Prometheus text format) to this file")
+    parser.add_argument("--history", default=PRICE_HISTORY_DIR, metavar="DIR",
+                        help="append every query's offers to the price history in DIR (default: $PRICE_HISTORY_DIR)")
+    parser.add_argument("--rate-limit", action="append", type=parse_rate_limit, metavar="STORE=RATE[:BURST]",
+                        help="requests per second for a store's hosts, or default=RATE for the rest (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.stores:
+        args.stores = [s.strip() for s in args.stores.split(",") if s.strip()]
+        unknown = sorted(set(args.stores) - set(STORE_SCRAPERS))
+        if unknown:
+            parser.error(f"unknown stores: {', '.join(unknown)} (known: {', '.join(STORE_SCRAPERS)})")
+    return args
+
+
+def run_batch(queries, writer, stores=None, min_price=0, max_price=10**9,
+              stock_options=None, sort_option="Price (Low to High)", parallel=2, deep=False, expand=False):
+    """Scrape every query and stream its filtered offers as soon as it completes"""
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        future_to_query = {executor.submit(search, query, stores, deep=deep, expand=expand): query for query in queries}
+
+        for future in as_completed(future_to_query):
+            query = future_to_query[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                logger.error(f"Query failed: {query}: {e}")
+                continue
+
+            df = apply_filters(df, min_price, max_price, stock_options, sort_option, query=query)
+            writer.write_frame(query, df)
+            logger.info(f"{query}: {len(df)} offers")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    queries = read_queries(args.queries)
+    if not queries:
+        logger.warning("No queries to run")
+        return 0
+
+    configure_parse_pool(args.parse_processes)
+    apply_rate_limits(args.rate_limit)
+    configure_history(args.history)
+
+    if args.output:
+        out = open(args.output, "w", newline="", encoding="utf-8")
+    else:
+        out = contextlib.nullcontext(sys.stdout)
+    started = time.perf_counter()
+
+    # The scrapers print progress to stdout; keep it off the data stream
+    with out as stream, contextlib.redirect_stdout(sys.stderr):
+        writer = OfferWriter(stream, args.format)
+        run_batch(queries, writer, stores=args.stores,
+                  min_price=args.min_price, max_price=args.max_price,
+                  stock_options=args.stock, sort_option=args.sort,
+                  parallel=args.parallel, deep=args.deep, expand=args.expand)
+
+    stats = page_cache_stats()
+    logger.info(
+        f"{len(queries)} queries, {writer.rows} offers in {time.perf_counter() - started:.1f}s; "
+        f"product pages: {stats['misses']} fetched, {stats['hits'] + stats['coalesced']} reused"
+    )
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(telemetry.to_prometheus())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
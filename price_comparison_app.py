@@ -1,23 +1,22 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import re
 import pandas as pd
 from datetime import datetime
-import time
-from difflib import SequenceMatcher
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-import asyncio
-import aiohttp
-from urllib.parse import urljoin, urlparse
-import functools
 import cachetools
-from typing import List, Dict, Any
-from functools import wraps
+from typing import List
 import traceback
 import logging
-from old_stores import *
+import time
+import contextlib
+import telemetry
+import tracing
+from product_matching import best_price_view, match_products
+from price_engine import (
+    PROBLEMATIC_STORES, SORT_KEYS, PriceIndex, apply_filters, build_scrapers, filter_mask, get_history,
+    build_sort_index, compute_price_aggregates, did_you_mean, search, search_in_progress,
+    smart_search_terms,
+)
+from specs import FACETS, FacetIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,189 +30,21 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Enhanced session configuration with more robust settings
-def get_session_config():
-    return {
-        'timeout': aiohttp.ClientTimeout(total=30, connect=10),  # Increased timeouts
-        'connector': aiohttp.TCPConnector(
-            limit=30,  # Reduced connection pool size
-            limit_per_host=5,  # Reduced max connections per host
-            ttl_dns_cache=300,
-            use_dns_cache=True,
-            enable_cleanup_closed=True,  # Clean up closed connections
-        ),
-        'headers': {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9,ar;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0'
-        }
-    }
-
-# Enhanced cache decorator
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=100, ttl=300))
-def get_cached_results(query: str, stores_hash: str) -> pd.DataFrame:
-    """Cache results for 5 minutes to avoid repeated scraping"""
-    return None
-
-class FastScraper:
-    def __init__(self):
-        self.session = None
-        self.results_cache = cachetools.TTLCache(maxsize=50, ttl=300)
-        
-    async def __aenter__(self):
-        session_config = get_session_config()
-        self.session = aiohttp.ClientSession(**session_config)
-        return self
-        
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
-    
-    async def scrape_store_async(self, store_name: str, scraper_func, query: str, semaphore: asyncio.Semaphore, progress_callback=None) -> tuple:
-        """Enhanced async wrapper with better error handling"""
-        async with semaphore:
-            try:
-                # Add delay between requests to avoid rate limiting
-                await asyncio.sleep(0.5)
-                
-                loop = asyncio.get_event_loop()
-                # Increased timeout for problematic stores
-                timeout = 45 if store_name in ['ElBadrGroup', 'ElnourTech', 'MaximumHardware'] else 30
-                
-                results = await asyncio.wait_for(
-                    loop.run_in_executor(None, scraper_func, query),
-                    timeout=timeout
-                )
-                
-                if progress_callback:
-                    progress_callback(store_name, len(results), None)
-                
-                logger.info(f"Successfully scraped {store_name}: {len(results)} products")
-                return store_name, results, None
-                
-            except asyncio.TimeoutError:
-                error_msg = f"Timeout after {timeout}s"
-                logger.error(f"Timeout scraping {store_name}: {error_msg}")
-                if progress_callback:
-                    progress_callback(store_name, 0, error_msg)
-                return store_name, [], error_msg
-                
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Error scraping {store_name}: {error_msg}")
-                logger.error(traceback.format_exc())
-                if progress_callback:
-                    progress_callback(store_name, 0, error_msg)
-                return store_name, [], error_msg
-
-    async def scrape_multiple_stores(self, query: str, scrapers_dict: dict, max_concurrent: int = 5, progress_callback=None) -> pd.DataFrame:
-        """Enhanced scraping with reduced concurrency for cloud stability"""
-        # Reduced concurrency for cloud environments
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        tasks = [
-            self.scrape_store_async(store_name, scraper_func, query, semaphore, progress_callback)
-            for store_name, scraper_func in scrapers_dict.items()
-        ]
-        
-        all_data = []
-        successful_stores = []
-        failed_stores = []
-        
-        for coro in asyncio.as_completed(tasks):
-            try:
-                store_name, results, error = await coro
-                
-                if error:
-                    failed_stores.append((store_name, error))
-                else:
-                    all_data.extend(results)
-                    successful_stores.append(store_name)
-                    
-            except Exception as e:
-                logger.error(f"Unexpected error in scraping task: {e}")
-        
-        # Log summary
-        logger.info(f"Scraping completed. Successful: {len(successful_stores)}, Failed: {len(failed_stores)}")
-        if failed_stores:
-            logger.warning(f"Failed stores: {failed_stores}")
-        
-        return pd.DataFrame(all_data)
-
-def safe_scraper_wrapper(scraper_func, store_name):
-    """Wrapper to make scraper functions more robust"""
-    def wrapped_scraper(query):
-        try:
-            logger.info(f"Starting scrape for {store_name} with query: {query}")
-            
-            # Add retry logic for problematic stores
-            max_retries = 3 if store_name in ['ElBadrGroup', 'ElnourTech', 'MaximumHardware'] else 1
-            
-            for attempt in range(max_retries):
-                try:
-                    results = scraper_func(query)
-                    logger.info(f"Attempt {attempt + 1} for {store_name}: {len(results)} products found")
-                    return results
-                    
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1} failed for {store_name}: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)  # Wait before retry
-                    else:
-                        raise e
-                        
-        except Exception as e:
-            logger.error(f"All attempts failed for {store_name}: {e}")
-            return []
-            
-    return wrapped_scraper
-
-def scrape_all_optimized(query: str, selected_stores: List[str] = None) -> pd.DataFrame:
+def scrape_all_optimized(query: str, selected_stores: List[str] = None, use_cache: bool = True,
+                         deep: bool = False, expand: bool = False) -> pd.DataFrame:
     """Enhanced optimized scraping with better error handling"""
     
-    # All available scrapers with safe wrappers
-    all_scrapers = {
-        "Sigma": safe_scraper_wrapper(scrape_sigma, "Sigma"),
-        "Elnekhely": safe_scraper_wrapper(scrape_elnekhely, "Elnekhely"),
-        "ElBadrGroup": safe_scraper_wrapper(scrape_elbadrgroupe, "ElBadrGroup"),
-        "BarakaComputer": safe_scraper_wrapper(scrape_barakacomputer, "BarakaComputer"),
-        "DeltaComputer": safe_scraper_wrapper(scrape_deltacomputer, "DeltaComputer"),
-        "ElnourTech": safe_scraper_wrapper(scrape_elnourtech, "ElnourTech"),
-        "SolidHardware": safe_scraper_wrapper(scrape_solidhardware, "SolidHardware"),
-        "AlFrensia": safe_scraper_wrapper(scrape_alfrensia, "AlFrensia"),
-        "AHWStore": safe_scraper_wrapper(scrape_ahwstore, "AHWStore"),
-        "KimoStore": safe_scraper_wrapper(scrape_kimostore, "KimoStore"),
-        "UpToDate": safe_scraper_wrapper(scrape_uptodate, "UpToDate"),
-        "ABCShop": safe_scraper_wrapper(scrape_abcshop, "ABCShop"),
-        "CompuMarts": safe_scraper_wrapper(scrape_compumarts, "CompuMarts"),
-        "CompuNileStore": safe_scraper_wrapper(scrape_compunilestore, "CompuNileStore"),
-        "CompuScience": safe_scraper_wrapper(scrape_compuscience, "CompuScience"),
-        "MaximumHardware": safe_scraper_wrapper(scrape_maximumhardware, "MaximumHardware"),
-        "HighEndStore": safe_scraper_wrapper(scrape_highendstore, "HighEndStore"),
-        "QuantumTechnology": safe_scraper_wrapper(scrape_quantumtechnology, "QuantumTechnology")
-    }
-    
-    # Use selected stores or all stores
-    scrapers_to_use = {}
-    if selected_stores:
-        scrapers_to_use = {name: func for name, func in all_scrapers.items() if name in selected_stores}
-    else:
-        scrapers_to_use = all_scrapers
+    # Use selected stores or all stores, with safe wrappers
+    scrapers_to_use = build_scrapers(selected_stores)
     
     # Check cache first
-    cache_key = f"{query}_{hash(frozenset(scrapers_to_use.keys()))}"
+    cache_key = (f"{query}_{hash(frozenset(scrapers_to_use.keys()))}"
+                 f"{'_deep' if deep else ''}{'_expand' if expand else ''}")
     
     if 'scraping_cache' not in st.session_state:
         st.session_state.scraping_cache = {}
     
-    if cache_key in st.session_state.scraping_cache:
+    if use_cache and cache_key in st.session_state.scraping_cache:
         cached_data, timestamp = st.session_state.scraping_cache[cache_key]
         if (datetime.now() - timestamp).seconds < 300:
             st.info("📦 Using cached results (less than 5 minutes old)")
@@ -239,10 +70,15 @@ def scrape_all_optimized(query: str, selected_stores: List[str] = None) -> pd.Da
         
         progress_bar.progress(progress, text=status_text)
     
+    if search_in_progress(query, selected_stores, deep, expand):
+        # Another session is scraping the same query; wait for its results
+        # instead of hitting every store again
+        progress_bar.progress(0, text="⏳ Same search already running, waiting for its results...")
+    
     try:
         # Always use threaded approach for cloud stability
         logger.info("Using threaded scraping for cloud compatibility")
-        df = scrape_all_sequential_fallback(query, scrapers_to_use, progress_bar, total_stores, update_progress)
+        df = search(query, selected_stores, update_progress, deep=deep, expand=expand)
         
     except Exception as e:
         st.error(f"Error during scraping: {e}")
@@ -259,17 +95,8 @@ def scrape_all_optimized(query: str, selected_stores: List[str] = None) -> pd.Da
             st.write(f"**{store}:** {status}")
     
     if not df.empty:
-        # Filter out products with price <= 1 EGP
-        df = df[df['price'] > 1]
-        
-        # Apply filtering
-        df_filtered = filter_products_by_all_words(df, query)
-        
-        # Remove duplicates
-        df_filtered = df_filtered.drop_duplicates(subset=['name', 'price'], keep='first')
-        
         # Cache results
-        st.session_state.scraping_cache[cache_key] = (df_filtered, datetime.now())
+        st.session_state.scraping_cache[cache_key] = (df, datetime.now())
         
         # Limit cache size
         if len(st.session_state.scraping_cache) > 10:
@@ -277,105 +104,15 @@ def scrape_all_optimized(query: str, selected_stores: List[str] = None) -> pd.Da
                            key=lambda k: st.session_state.scraping_cache[k][1])
             del st.session_state.scraping_cache[oldest_key]
         
-        return df_filtered
+        return df
     
     return df
 
-def scrape_all_sequential_fallback(query: str, scrapers_dict: dict, progress_bar, total_stores: int, update_progress_callback) -> pd.DataFrame:
-    """Enhanced fallback with better error handling and progress tracking"""
-    all_data = []
-    
-    # Reduced max_workers for cloud stability
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_store = {
-            executor.submit(scraper_func, query): store_name 
-            for store_name, scraper_func in scrapers_dict.items()
-        }
-        
-        completed = 0
-        
-        for future in as_completed(future_to_store):
-            store_name = future_to_store[future]
-            completed += 1
-            
-            try:
-                # Increased timeout for problematic stores
-                timeout = 60 if store_name in ['ElBadrGroup', 'ElnourTech', 'MaximumHardware'] else 30
-                results = future.result(timeout=timeout)
-                
-                if results:
-                    all_data.extend(results)
-                    logger.info(f"Successfully scraped {store_name}: {len(results)} products")
-                else:
-                    logger.warning(f"No results from {store_name}")
-                
-                update_progress_callback(store_name, len(results), None)
-                
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Error scraping {store_name}: {error_msg}")
-                update_progress_callback(store_name, 0, error_msg)
-    
-    logger.info(f"Total products collected: {len(all_data)}")
-    return pd.DataFrame(all_data)
-
 # Keep all existing utility functions
 def extract_price(price_str):
     numbers = re.findall(r'\d+', price_str.replace(",", ""))
     return int("".join(numbers)) if numbers else None
 
-def filter_products_by_all_words(df, search_query):
-    """Filter products that contain ALL words from the search query"""
-    if df.empty or not search_query:
-        return df
-    
-    df = df.dropna(subset=['name'])
-    df = df[df['name'].astype(str).str.strip() != '']
-    
-    search_words = search_query.lower().strip().split()
-    
-    if not search_words:
-        return df
-    
-    def contains_all_words(product_name):
-        if pd.isna(product_name) or product_name is None:
-            return False
-        
-        product_name_lower = str(product_name).lower()
-        return all(word in product_name_lower for word in search_words)
-    
-    df_filtered = df[df['name'].apply(contains_all_words)]
-    df_filtered = df_filtered.sort_values('price', ascending=True)
-    
-    return df_filtered
-
-def smart_search_terms(query):
-    """Generate alternative search terms for better results"""
-    alternatives = []
-    query_lower = query.lower()
-    
-    if 'rtx' in query_lower:
-        alternatives.append(query.replace('rtx', 'geforce rtx'))
-        alternatives.append(query.replace('rtx', 'nvidia rtx'))
-    
-    if 'gtx' in query_lower:
-        alternatives.append(query.replace('gtx', 'geforce gtx'))
-        alternatives.append(query.replace('gtx', 'nvidia gtx'))
-    
-    if 'rx' in query_lower and 'rtx' not in query_lower:
-        alternatives.append(query.replace('rx', 'radeon rx'))
-        alternatives.append(query.replace('rx', 'amd rx'))
-    
-    if any(cpu in query_lower for cpu in ['i3', 'i5', 'i7', 'i9']):
-        alternatives.append(query + ' processor')
-        alternatives.append(query + ' cpu')
-    
-    if 'ryzen' in query_lower:
-        alternatives.append(query + ' processor')
-        alternatives.append(query + ' cpu')
-    
-    return alternatives[:2]
-
 def extract_price_european_format(text):
     """Handle European number format like 31.999,00 EGP"""
     if not text:
@@ -394,30 +131,244 @@ def extract_price_european_format(text):
     numbers = re.findall(r'\d+', text.replace(",", ""))
     return int("".join(numbers)) if numbers else None
 
-def scrape_all(query, selected_stores=None):
+def scrape_all(query, selected_stores=None, use_cache=True, deep=False, expand=False):
     """Wrapper to maintain compatibility"""
-    return scrape_all_optimized(query, selected_stores)
+    return scrape_all_optimized(query, selected_stores, use_cache, deep, expand)
 
-def apply_filters(df, min_price, max_price, stock_options, sort_option):
-    """Apply all filters locally to the cached data"""
-    if df.empty:
-        return df
-        
-    df = df[(df['price'] >= min_price) & (df['price'] <= max_price)]
-    
-    if stock_options:
-        df = df[df['availability'].isin(stock_options)]
-    
-    if sort_option == "Price (Low to High)":
-        df = df.sort_values('price')
-    elif sort_option == "Price (High to Low)":
-        df = df.sort_values('price', ascending=False)
-    elif sort_option == "Store Name":
-        df = df.sort_values('store')
-    elif sort_option == "Product Name":
-        df = df.sort_values('name')
-        
-    return df
+def set_raw_data(df):
+    """Replace the searched data and invalidate everything derived from it"""
+    st.session_state.raw_data = df
+    st.session_state.data_version += 1
+    st.session_state.sort_indexes = {}
+    st.session_state.product_ids = None
+    st.session_state.facet_index = None
+    st.session_state.price_index = None
+    st.session_state.view_cache.clear()
+    # Spec values of the previous results mean nothing for the new ones
+    for facet in FACETS:
+        st.session_state.pop(f'facet_{facet}', None)
+
+def get_sort_index(sort_option):
+    """Presorted row order for the current data version, built lazily per sort key"""
+    sort_indexes = st.session_state.sort_indexes
+    if sort_option not in sort_indexes:
+        sort_indexes[sort_option] = build_sort_index(
+            st.session_state.raw_data, sort_option, st.session_state.get('last_query', "")
+        )
+    return sort_indexes[sort_option]
+
+def get_facet_index():
+    """Spec facet masks of the raw rows, built once per data version"""
+    if st.session_state.get('facet_index') is None:
+        with telemetry.timed("filter", "facets"):
+            st.session_state.facet_index = FacetIndex(st.session_state.raw_data)
+    return st.session_state.facet_index
+
+def get_price_index():
+    """Price-sorted row positions of the raw rows, built once per data version"""
+    if st.session_state.get('price_index') is None:
+        st.session_state.price_index = PriceIndex(st.session_state.raw_data)
+    return st.session_state.price_index
+
+def get_filtered_view(min_price, max_price, stock_options, sort_option, facets=None):
+    """apply_filters memoized on (data version, min_price, max_price, stock options, sort, facets)"""
+    facets = {facet: values for facet, values in (facets or {}).items() if values}
+    key = ('view', st.session_state.data_version, min_price, max_price,
+           tuple(sorted(stock_options)), sort_option,
+           tuple((facet, tuple(sorted(values))) for facet, values in sorted(facets.items())))
+
+    view_cache = st.session_state.view_cache
+    if key not in view_cache:
+        # Price sorts are slices of the price index; the other sorts have a presorted index each
+        by_price = SORT_KEYS.get(sort_option, (None,))[0] == 'price'
+        sort_index = get_sort_index(sort_option) if sort_option in SORT_KEYS and not by_price else None
+        with telemetry.timed("filter", "view"):
+            view_cache[key] = apply_filters(
+                st.session_state.raw_data, min_price, max_price,
+                stock_options, sort_option, sort_index=sort_index,
+                facets=facets, facet_index=get_facet_index() if facets else None,
+                price_index=get_price_index() if by_price else None
+            )
+    return view_cache[key], key
+
+def get_product_ids():
+    """Cross-store product group of every raw row, matched once per data version"""
+    if st.session_state.get('product_ids') is None:
+        with telemetry.timed("filter", "match"):
+            st.session_state.product_ids = match_products(st.session_state.raw_data)
+    return st.session_state.product_ids
+
+def get_best_price_view(view_key, df):
+    """best_price_view of a filtered view, memoized on the same key"""
+    key = ('best',) + view_key[1:]
+    view_cache = st.session_state.view_cache
+    if key not in view_cache:
+        view_cache[key] = best_price_view(df, get_product_ids())
+    return view_cache[key]
+
+def get_price_aggregates(view_key, df):
+    """compute_price_aggregates memoized on the same key as the filtered view"""
+    key = ('aggregates',) + view_key[1:]
+    view_cache = st.session_state.view_cache
+    if key not in view_cache:
+        view_cache[key] = compute_price_aggregates(df)
+    return view_cache[key]
+
+STOCK_ICONS = {
+    "In Stock": "🟢",
+    "Out of Stock": "🔴",
+    "Check site": "⚪"
+}
+
+PAGE_SIZE_OPTIONS = [10, 20, 50]
+
+FACET_LABELS = {
+    "brand": "🏷️ Brand",
+    "capacity": "💾 Capacity",
+    "memory": "🧠 Memory type",
+    "store": "🏪 Store",
+}
+
+def render_facet_filters(min_price, max_price, stock_options):
+    """
+    A multiselect per spec facet, each value with the number of results it
+    would leave given the other selections and the price and stock filters.
+    Returns the selection as {facet: values}.
+    """
+    index = get_facet_index()
+    raw = st.session_state.raw_data
+    selection = {facet: st.session_state.get(f'facet_{facet}', []) for facet in index.facets}
+    counts = index.counts(selection, base=filter_mask(raw, min_price, max_price, stock_options))
+
+    for column, facet in zip(st.columns(len(index.facets) or 1), index.facets):
+        # Values that would leave nothing are hidden unless already selected
+        options = [v for v in index.values[facet] if counts[facet][v] or v in selection[facet]]
+        with column:
+            selection[facet] = st.multiselect(
+                FACET_LABELS.get(facet, facet.title()),
+                options,
+                format_func=lambda value, facet=facet: f"{value} ({counts[facet][value]})",
+                key=f'facet_{facet}',
+            )
+    return selection
+
+def render_results_table(df):
+    """Render all results as a single dataframe element with link columns"""
+    table = pd.DataFrame({
+        'Product': df['name'],
+        'Price (EGP)': df['price'],
+        'Store': df['store'],
+        'Stock': df['availability'].map(lambda a: f"{STOCK_ICONS.get(a, '⚪')} {a}"),
+        'Link': df['url'],
+    })
+    st.dataframe(
+        table,
+        hide_index=True,
+        column_config={
+            'Price (EGP)': st.column_config.NumberColumn(format="%d"),
+            'Link': st.column_config.LinkColumn(display_text="🛒 View Product"),
+        }
+    )
+
+def render_best_prices(df):
+    """One row per product matched across stores, with its best offer"""
+    table = pd.DataFrame({
+        'Product': df['name'],
+        'Best Price (EGP)': df['price'],
+        'Store': df['store'],
+        'Stock': df['availability'].map(lambda a: f"{STOCK_ICONS.get(a, '⚪')} {a}"),
+        'Stores': df['stores'],
+        'Save vs. Highest (EGP)': df['savings'],
+        'Link': df['url'],
+    })
+    st.dataframe(
+        table,
+        hide_index=True,
+        column_config={
+            'Best Price (EGP)': st.column_config.NumberColumn(format="%d"),
+            'Save vs. Highest (EGP)': st.column_config.NumberColumn(format="%d"),
+            'Link': st.column_config.LinkColumn(display_text="🛒 View Product"),
+        }
+    )
+
+def render_price_history(df_filtered, best):
+    """Daily lowest price per store of one matched product, from the recorded history"""
+    history = get_history()
+    if history is None or best.empty:
+        return
+
+    with st.expander("📈 Price history", expanded=False):
+        choice = st.selectbox("Product:", best.index, format_func=lambda i: best.at[i, 'name'],
+                              key='history_product')
+        group = best.at[choice, 'product_id']
+        urls = df_filtered['url'][get_product_ids().loc[df_filtered.index] == group].tolist()
+        daily = history.price_over_time(urls=urls)
+        if daily.empty:
+            st.info("No recorded prices for this product yet.")
+        else:
+            st.line_chart(daily, x_label="Day", y_label="Lowest price (EGP)")
+
+def search_for(suggestion):
+    st.session_state.search_query = suggestion
+    st.session_state.pending_search = True
+
+def render_suggestions(query):
+    """
+    "Did you mean" searches built from the product names scraped so far,
+    or the rule-based alternative spellings when none fit
+    """
+    suggestions = did_you_mean(query)
+    alternatives = suggestions or smart_search_terms(query)
+    if not alternatives:
+        return
+
+    st.info("💡 Did you mean:" if suggestions else "💡 Try these alternative searches:")
+    if not suggestions and not st.session_state.get("last_expand", False):
+        st.caption("Or tick **🔀 Search alternative spellings** to include them in the same search.")
+    for alt in alternatives:
+        if st.button(f"🔍 Search for: {alt}", key=f"suggest_{alt}", on_click=search_for, args=(alt,)):
+            st.rerun()  # the whole app, also from inside the results fragment
+
+def render_product_cards(df, page_size):
+    """Render one page of product cards so element count stays flat as results grow"""
+    total_pages = max(1, -(-len(df) // page_size))
+
+    # Clamp the stored page when a filter change shrinks the result set
+    if st.session_state.get('results_page', 1) > total_pages:
+        st.session_state.results_page = total_pages
+
+    page = st.number_input(
+        f"Page (of {total_pages})",
+        min_value=1,
+        max_value=total_pages,
+        step=1,
+        key='results_page'
+    )
+
+    start = (page - 1) * page_size
+    page_df = df.iloc[start:start + page_size]
+
+    for i, row in zip(range(start, start + len(page_df)), page_df.itertuples(index=False)):
+        with st.container():
+            col1, col2, col3 = st.columns([4, 1, 1])
+
+            with col1:
+                st.markdown(f"**[{row.name}]({row.url})**")
+                stock_color = STOCK_ICONS.get(row.availability, "⚪")
+                st.caption(f"🏪 {row.store} • {stock_color} {row.availability}")
+
+            with col2:
+                st.markdown(f"### 💰 {row.price:,} EGP")
+
+            with col3:
+                if row.availability == "Out of Stock":
+                    st.button("❌ Out of Stock", disabled=True, key=f"disabled_{i}")
+                else:
+                    st.link_button("🛒 View Product", row.url)
+
+            st.divider()
+
+    st.caption(f"Showing {start + 1}-{start + len(page_df)} of {len(df)} products")
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -429,6 +380,202 @@ def initialize_session_state():
         st.session_state.last_stores = []
     if 'scraping_cache' not in st.session_state:
         st.session_state.scraping_cache = {}
+    if 'data_version' not in st.session_state:
+        st.session_state.data_version = 0
+    if 'sort_indexes' not in st.session_state:
+        st.session_state.sort_indexes = {}
+    if 'product_ids' not in st.session_state:
+        st.session_state.product_ids = None
+    if 'facet_index' not in st.session_state:
+        st.session_state.facet_index = None
+    if 'price_index' not in st.session_state:
+        st.session_state.price_index = None
+    if 'view_cache' not in st.session_state:
+        # Filtered views and their aggregates, keyed on data version + filters
+        st.session_state.view_cache = cachetools.LRUCache(maxsize=32)
+
+@st.fragment
+def render_results_section():
+    """
+    Filters, sort and results view. Runs as a fragment so that changing a
+    filter only re-executes apply_filters and the results against the cached
+    st.session_state.raw_data instead of rebuilding the whole page.
+    """
+    render_started = time.perf_counter()
+
+    with st.expander("🔧 Filter & Sort Results", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            min_price = st.number_input("Minimum Price (EGP)", min_value=0, value=0, key='min_price')
+        with col2:
+            max_price = st.number_input("Maximum Price (EGP)", min_value=0, value=100000, key='max_price')
+        with col3:
+            sort_option = st.selectbox(
+                "Sort results by:",
+                ["Price (Low to High)", "Price (High to Low)", "Relevance", "Store Name", "Product Name"],
+                key='sort_option'
+            )
+        with col4:
+            stock_options = st.multiselect(
+                "📦 Filter by availability:",
+                ["In Stock", "Out of Stock", "Check site"],
+                default=["In Stock", "Out of Stock", "Check site"],
+                help="Select which stock statuses to include in results",
+                key='stock_options'
+            )
+
+        facets = render_facet_filters(min_price, max_price, stock_options)
+
+    df_filtered, view_key = get_filtered_view(
+        min_price,
+        max_price,
+        stock_options,
+        sort_option,
+        facets
+    )
+    
+    if df_filtered.empty:
+        st.warning("❌ No results found with current filters. Try adjusting your filters or search terms.")
+        
+        st.info("""
+        💡 **Search Tips:**
+        - Use specific terms like "32gb ddr4 ram" instead of just "ram"
+        - All words in your search must appear in the product name
+        - Try different word combinations if no results appear
+        """)
+        
+        render_suggestions(st.session_state.last_query)
+    else:
+        summary, stats_df, store_stats = get_price_aggregates(view_key, df_filtered)
+
+        # Display summary metrics
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Results", summary['count'])
+        with col2:
+            st.metric("Lowest Price", f"{summary['min']:,} EGP")
+        with col3:
+            st.metric("Highest Price", f"{summary['max']:,} EGP")
+        with col4:
+            st.metric("Stores Found", summary['stores'])
+        
+        # Show which of the problematic stores actually returned results
+        working_problematic = [store for store in PROBLEMATIC_STORES if store in df_filtered['store'].values]
+        if working_problematic:
+            st.success(f"✅ Successfully retrieved data from: {', '.join(working_problematic)}")
+        
+        # Create tabs for different views
+        tab1, tab_best, tab2 = st.tabs(["📋 Product List", "🏷️ Best Price per Product", "📊 Price Analysis"])
+        
+        with tab1:
+            st.subheader("🛍️ Available Products")
+
+            view_col, size_col = st.columns([3, 1])
+            with view_col:
+                view_mode = st.radio(
+                    "View as:",
+                    ["Table", "Cards"],
+                    horizontal=True,
+                    help="The table renders every result in one element; cards are paginated"
+                )
+            with size_col:
+                page_size = st.selectbox("Cards per page:", PAGE_SIZE_OPTIONS, index=1,
+                                         disabled=view_mode != "Cards")
+
+            if view_mode == "Table":
+                render_results_table(df_filtered)
+            else:
+                render_product_cards(df_filtered, page_size)
+
+        with tab_best:
+            best = get_best_price_view(view_key, df_filtered)
+            st.subheader("🏷️ Best Price per Product")
+            st.caption(f"{len(df_filtered)} offers matched to {len(best)} products across stores")
+            render_best_prices(best)
+            render_price_history(df_filtered, best)
+
+        with tab2:
+            st.subheader("📊 Price Analysis")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.write("**Price Statistics:**")
+                st.dataframe(stats_df, hide_index=True)
+            
+            with col2:
+                st.write("**Store Comparison:**")
+                st.dataframe(store_stats)
+
+    render_ended = time.perf_counter()
+    telemetry.observe("render", "app", render_ended - render_started)
+    tracing.record("results", "render", "app", render_started, render_ended)
+
+def trace_scope(trace):
+    """Activate a profiling trace, or do nothing without one"""
+    return trace.activate() if trace is not None else contextlib.nullcontext()
+
+def render_search_profile(trace):
+    """Waterfall of the spans recorded for one profiled search, plus downloads"""
+    import altair as alt
+
+    with st.expander(f"🔬 Search profile: '{trace.label}' ({trace.duration:.1f}s)", expanded=True):
+        rows = trace.rows()
+        if not rows:
+            st.caption("Nothing was recorded (the results came from a cache or an identical search already running).")
+            return
+
+        spans = pd.DataFrame(rows)
+        # One lane per store, in the order the stores started
+        lanes = list(dict.fromkeys(spans["store"]))
+        chart = alt.Chart(spans).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since search start"),
+            x2="end_ms:Q",
+            y=alt.Y("store:N", sort=lanes, title=None),
+            color=alt.Color("phase:N"),
+            tooltip=[c for c in ["store", "phase", "name", "duration_ms", "status", "bytes", "headers_ms", "url", "error"]
+                     if c in spans.columns],
+        ).properties(height=28 * len(lanes) + 40)
+        st.altair_chart(chart)
+
+        st.write("**Time by phase (sum over spans, overlapping across stores):**")
+        st.dataframe(spans.groupby("phase")["duration_ms"].agg(["count", "sum", "max"]).round(1))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ Trace (Chrome/Perfetto JSON)", trace.to_chrome_trace(),
+                               file_name="search-trace.json", mime="application/json")
+        profile = trace.profile_text()
+        if profile:
+            with col2:
+                st.download_button("⬇️ Parse cProfile", profile,
+                                   file_name="parse-profile.txt", mime="text/plain")
+            st.text(profile[:4000])
+
+def render_diagnostics():
+    """Sidebar panel with the process-wide scraping telemetry"""
+    with st.expander("🩺 Diagnostics", expanded=False):
+        phases = telemetry.phase_summary()
+        if not phases:
+            st.caption("No searches recorded yet.")
+            return
+
+        st.write("**Latency by phase and store:**")
+        st.dataframe(pd.DataFrame(phases), hide_index=True)
+
+        stores = telemetry.store_summary()
+        if stores:
+            st.write("**Requests, bytes and cache by store:**")
+            st.dataframe(pd.DataFrame(stores), hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ Metrics", telemetry.to_prometheus(),
+                               file_name="price_scraper_metrics.txt", mime="text/plain")
+        with col2:
+            if st.button("Reset", key="reset_telemetry"):
+                telemetry.reset()
+                st.rerun()
 
 # === Enhanced Streamlit UI ===
 st.title("💻 Egypt Tech Price Comparison")
@@ -467,164 +614,79 @@ with st.sidebar:
         default=default_stores,
         help="ElBadrGroup, ElnourTech, and MaximumHardware are included by default"
     )
-    
-    st.subheader("Price Range")
-    min_price = st.number_input("Minimum Price (EGP)", min_value=0, value=0)
-    max_price = st.number_input("Maximum Price (EGP)", min_value=0, value=100000)
-    
-    st.subheader("Sort By")
-    sort_option = st.selectbox(
-        "Sort results by:",
-        ["Price (Low to High)", "Price (High to Low)", "Store Name", "Product Name"]
-    )
-    
-    st.subheader("📦 Stock Status")
-    stock_options = st.multiselect(
-        "Filter by availability:",
-        ["In Stock", "Out of Stock", "Check site"],
-        default=["In Stock", "Out of Stock", "Check site"],
-        help="Select which stock statuses to include in results"
-    )
+
+    deep = st.checkbox("📚 Deep search", key="deep_search",
+                       help="Also fetch the further result pages of stores that paginate (slower, finds more offers for broad queries)")
+    expand = st.checkbox("🔀 Search alternative spellings", key="expand_search",
+                         help="Also search every store for variants like \"geforce rtx ...\" in the same search and merge the results")
+
+    st.subheader("Profiling")
+    profile_search = st.checkbox("🔬 Profile this search", key="profile_search",
+                                 help="Record a span timeline of the next search (bypasses the results cache)")
+    profile_parse = st.checkbox("Include cProfile of parse steps", key="profile_parse",
+                                disabled=not profile_search)
 
 # Main search interface
 col1, col2 = st.columns([3, 1])
 with col1:
-    query = st.text_input("🔍 Search for a product:", placeholder="Enter product name...")
+    query = st.text_input("🔍 Search for a product:", placeholder="Enter product name...", key="search_query")
 with col2:
     st.write("")
     search_button = st.button("🔍 Search", type="primary")
 
 # Check if we need to fetch new data
+# A suggestion button fills in the query and searches right away
+search_button = st.session_state.pop("pending_search", False) or search_button
+
 need_new_data = (
     search_button and query and 
     (query != st.session_state.last_query or 
-     selected_stores != st.session_state.last_stores)
+     selected_stores != st.session_state.last_stores or
+     deep != st.session_state.get("last_deep", False) or
+     expand != st.session_state.get("last_expand", False) or
+     profile_search)
 )
 
+# A profiled search records its scrape and the first render of its results
+trace = tracing.Trace(query, profile_parse=profile_parse) if need_new_data and profile_search else None
+
 # Fetch new data only when necessary
 if need_new_data:
-    with st.spinner("🔄 Fetching data from selected stores..."):
-        df = scrape_all(query, selected_stores)
+    with st.spinner("🔄 Fetching data from selected stores..."), trace_scope(trace):
+        df = scrape_all(query, selected_stores, use_cache=trace is None, deep=deep, expand=expand)
         
-        st.session_state.raw_data = df
+        set_raw_data(df)
         st.session_state.last_query = query
         st.session_state.last_stores = selected_stores
+        st.session_state.last_deep = deep
+        st.session_state.last_expand = expand
 
-# Apply filters to cached data
+# Filter and show cached data; widget changes in here rerun only the fragment
 if not st.session_state.raw_data.empty:
-    df_filtered = apply_filters(
-        st.session_state.raw_data,
-        min_price,
-        max_price,
-        stock_options,
-        sort_option
-    )
-    
-    if df_filtered.empty:
-        st.warning("❌ No results found with current filters. Try adjusting your filters or search terms.")
-        
-        st.info("""
-        💡 **Search Tips:**
-        - Use specific terms like "32gb ddr4 ram" instead of just "ram"
-        - All words in your search must appear in the product name
-        - Try different word combinations if no results appear
-        """)
-        
-        alternatives = smart_search_terms(st.session_state.last_query)
-        if alternatives:
-            st.info("💡 Try these alternative searches:")
-            for alt in alternatives:
-                if st.button(f"🔍 Search for: {alt}"):
-                    query = alt
-                    st.session_state.last_query = ""
-                    st.rerun()
-    else:
-        # Display summary metrics
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Results", len(df_filtered))
-        with col2:
-            st.metric("Lowest Price", f"{df_filtered['price'].min():,} EGP")
-        with col3:
-            st.metric("Highest Price", f"{df_filtered['price'].max():,} EGP")
-        with col4:
-            st.metric("Stores Found", df_filtered['store'].nunique())
-        
-        # Show which of the problematic stores actually returned results
-        problematic_stores = ['ElBadrGroup', 'ElnourTech', 'MaximumHardware']
-        working_problematic = [store for store in problematic_stores if store in df_filtered['store'].values]
-        if working_problematic:
-            st.success(f"✅ Successfully retrieved data from: {', '.join(working_problematic)}")
-        
-        # Create tabs for different views
-        tab1, tab2 = st.tabs(["📋 Product List", "📊 Price Analysis"])
-        
-        with tab1:
-            st.subheader("🛍️ Available Products")
-            
-            for i, row in df_filtered.iterrows():
-                with st.container():
-                    col1, col2, col3 = st.columns([4, 1, 1])
-                    
-                    with col1:
-                        st.markdown(f"**[{row['name']}]({row['url']})**")
-                        
-                        stock_color = {
-                            "In Stock": "🟢",
-                            "Out of Stock": "🔴", 
-                            "Check site": "⚪"
-                        }.get(row['availability'], "⚪")
-                        
-                        st.caption(f"🏪 {row['store']} • {stock_color} {row['availability']}")
-                    
-                    with col2:
-                        st.markdown(f"### 💰 {row['price']:,} EGP")
-                    
-                    with col3:
-                        if row['availability'] == "Out of Stock":
-                            st.button("❌ Out of Stock", disabled=True, key=f"disabled_{i}")
-                        else:
-                            st.link_button("🛒 View Product", row['url'])
-                    
-                    st.divider()
-        
-        with tab2:
-            st.subheader("📊 Price Analysis")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Price Statistics:**")
-                stats_df = pd.DataFrame({
-                    'Metric': ['Average Price', 'Median Price', 'Price Range', 'Standard Deviation'],
-                    'Value': [
-                        f"{df_filtered['price'].mean():.0f} EGP",
-                        f"{df_filtered['price'].median():.0f} EGP",
-                        f"{df_filtered['price'].max() - df_filtered['price'].min():,} EGP",
-                        f"{df_filtered['price'].std():.0f} EGP"
-                    ]
-                })
-                st.dataframe(stats_df, hide_index=True)
-            
-            with col2:
-                st.write("**Store Comparison:**")
-                store_stats = df_filtered.groupby('store').agg({
-                    'price': ['count', 'mean', 'min', 'max']
-                }).round(0)
-                store_stats.columns = ['Products', 'Avg Price', 'Min Price', 'Max Price']
-                st.dataframe(store_stats)
+    with trace_scope(trace):
+        render_results_section()
+elif query and query == st.session_state.last_query:
+    st.warning(f"❌ No products found for '{query}'.")
+    render_suggestions(query)
 elif query:
     st.info("👆 Click the Search button to find products!")
 
+if trace is not None:
+    st.session_state.last_trace = trace
+if st.session_state.get("last_trace") is not None:
+    render_search_profile(st.session_state.last_trace)
+
 # Sidebar clear results button
 with st.sidebar:
     if not st.session_state.raw_data.empty:
         if st.button("🗑️ Clear Results"):
-            st.session_state.raw_data = pd.DataFrame()
+            set_raw_data(pd.DataFrame())
             st.session_state.last_query = ""
             st.session_state.last_stores = []
             st.rerun()
 
+    render_diagnostics()
+
 # Footer
 st.markdown("---")
 st.markdown(f"""
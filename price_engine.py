@@ -0,0 +1,509 @@
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+import telemetry
+import tracing
+from fuzzy_search import TrigramIndex, match_mask
+from offers import offers_to_frame
+from old_stores import (
+    ExpansionScope, NotModified, SingleFlight, configure_parse_pool, configure_rate_limits,
+    deep_search, expansion_scope, parse_pool_size, query_words,
+    scrape_abcshop, scrape_ahwstore, scrape_alfrensia, scrape_barakacomputer,
+    scrape_compumarts, scrape_compunilestore, scrape_compuscience,
+    scrape_deltacomputer, scrape_elbadrgroupe, scrape_elnekhely,
+    scrape_elnourtech, scrape_highendstore, scrape_kimostore,
+    scrape_maximumhardware, scrape_quantumtechnology, scrape_sigma,
+    scrape_solidhardware, scrape_uptodate,
+)
+from relevance import relevance_scores
+from specs import FacetIndex, add_specs
+
+# Headless search engine: everything between a query and a results DataFrame,
+# with no Streamlit dependency, so the app, CLIs and workers share it.
+
+logger = logging.getLogger(__name__)
+
+# Stores that need longer timeouts and retries
+PROBLEMATIC_STORES = ['ElBadrGroup', 'ElnourTech', 'MaximumHardware']
+
+# Worker processes for HTML parsing (0 = parse in the scraper threads). The
+# CLI and API take --parse-processes; the app reads the environment.
+PARSE_PROCESSES = int(os.environ.get("PARSE_PROCESSES", "0"))
+
+# Directory of the on-disk price history (price_history.py); every search's
+# results are appended to it. Off unless set; the CLI and API take --history.
+PRICE_HISTORY_DIR = os.environ.get("PRICE_HISTORY_DIR", "")
+
+# All available scrapers, keyed by the store names shown in the app
+STORE_SCRAPERS = {
+    "Sigma": scrape_sigma,
+    "Elnekhely": scrape_elnekhely,
+    "ElBadrGroup": scrape_elbadrgroupe,
+    "BarakaComputer": scrape_barakacomputer,
+    "DeltaComputer": scrape_deltacomputer,
+    "ElnourTech": scrape_elnourtech,
+    "SolidHardware": scrape_solidhardware,
+    "AlFrensia": scrape_alfrensia,
+    "AHWStore": scrape_ahwstore,
+    "KimoStore": scrape_kimostore,
+    "UpToDate": scrape_uptodate,
+    "ABCShop": scrape_abcshop,
+    "CompuMarts": scrape_compumarts,
+    "CompuNileStore": scrape_compunilestore,
+    "CompuScience": scrape_compuscience,
+    "MaximumHardware": scrape_maximumhardware,
+    "HighEndStore": scrape_highendstore,
+    "QuantumTechnology": scrape_quantumtechnology
+}
+
+def parse_rate_limit(spec: str) -> tuple:
+    """
+    Parse a "Store=RATE[:BURST]" option (or "default=RATE[:BURST]") into
+    (store, (rate, burst)). Burst defaults to twice the rate.
+    """
+    store, sep, value = spec.partition("=")
+    store = store.strip()
+    if not sep or (store != "default" and store not in STORE_SCRAPERS):
+        raise ValueError(f"expected STORE=RATE[:BURST] with a known store, got {spec!r}")
+    rate, _, burst = value.partition(":")
+    rate = float(rate)
+    burst = int(burst) if burst else max(1, round(rate * 2))
+    if rate < 0 or burst < 1:
+        raise ValueError(f"rate must be >= 0 and burst >= 1, got {spec!r}")
+    return store, (rate, burst)
+
+def apply_rate_limits(specs) -> None:
+    """Apply parsed --rate-limit options on top of the built-in per-store limits"""
+    limits = dict(specs or [])
+    default = limits.pop("default", None)
+    if limits or default:
+        configure_rate_limits(limits, default=default)
+
+_history = None
+
+def configure_history(path: str):
+    """Record every search's results under path (None or "" turns recording off); returns the store"""
+    global _history
+    if path:
+        from price_history import PriceHistory
+        _history = PriceHistory(path)
+    else:
+        _history = None
+    return _history
+
+def get_history():
+    """The configured PriceHistory, set up from PRICE_HISTORY_DIR on first use (None when off)"""
+    if _history is None and PRICE_HISTORY_DIR:
+        configure_history(PRICE_HISTORY_DIR)
+    return _history
+
+def record_history(df: pd.DataFrame, query: str) -> None:
+    history = get_history()
+    if history is None or df.empty:
+        return
+    try:
+        history.append(df, query)
+    except Exception as e:
+        logger.error(f"Could not record price history for '{query}': {e}")
+
+def safe_scraper_wrapper(scraper_func, store_name):
+    """Wrapper to make scraper functions more robust"""
+    def wrapped_scraper(query):
+        with telemetry.store_scope(store_name), tracing.span(store_name, "store", store_name):
+            return scrape_with_retries(query)
+
+    def scrape_with_retries(query):
+        try:
+            logger.info(f"Starting scrape for {store_name} with query: {query}")
+            
+            # Add retry logic for problematic stores
+            max_retries = 3 if store_name in PROBLEMATIC_STORES else 1
+            
+            for attempt in range(max_retries):
+                try:
+                    if attempt:
+                        telemetry.incr("scrape_retries_total", store_name)
+                    results = scraper_func(query)
+                    logger.info(f"Attempt {attempt + 1} for {store_name}: {len(results)} products found")
+                    return results
+
+                except NotModified:
+                    # Conditional re-check: nothing changed, the caller reuses its offers
+                    return []
+                except Exception as e:
+                    logger.warning(f"Attempt {attempt + 1} failed for {store_name}: {e}")
+                    if attempt < max_retries - 1:
+                        time.sleep(2)  # Wait before retry
+                    else:
+                        raise e
+                        
+        except Exception as e:
+            logger.error(f"All attempts failed for {store_name}: {e}")
+            return []
+            
+    return wrapped_scraper
+
+def query_variants(query: str) -> List[str]:
+    """The query followed by its smart_search_terms alternatives, without repeats"""
+    variants = {}
+    for variant in [query] + smart_search_terms(query):
+        variants.setdefault(" ".join(variant.lower().split()), variant)
+    return list(variants.values())
+
+def expanded_scraper(scraper_func):
+    """
+    Run a store's scraper for every variant of the query concurrently and
+    return the union of their offers, one per product URL. The variants
+    share an ExpansionScope, so they match on the original query.
+    """
+    def run_variants(query):
+        variants = query_variants(query)
+        scope = ExpansionScope(query)
+
+        def run_variant(variant):
+            expansion_scope.set(scope)  # in this variant's own context copy
+            return scraper_func(variant)
+
+        with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run_variant, v) for v in variants]
+            offers = {}
+            for future in futures:
+                for offer in future.result():
+                    offers.setdefault(offer.url or id(offer), offer)
+            return list(offers.values())
+
+    return run_variants
+
+def build_scrapers(selected_stores: List[str] = None, expand: bool = False) -> dict:
+    """
+    Safe-wrapped scrapers for the selected stores (all stores if none
+    selected). With expand=True each one also searches the query's variants.
+    """
+    scrapers = {
+        name: safe_scraper_wrapper(func, name)
+        for name, func in STORE_SCRAPERS.items()
+        if not selected_stores or name in selected_stores
+    }
+    if expand:
+        scrapers = {name: expanded_scraper(func) for name, func in scrapers.items()}
+    return scrapers
+
+def scrape_stores(query: str, scrapers_dict: dict, progress_callback=None) -> pd.DataFrame:
+    """
+    Run the given scrapers in a thread pool and collect their offers.
+    progress_callback(store_name, products_count, error) is called as each
+    store finishes.
+    """
+    all_data = []
+
+    if PARSE_PROCESSES and not parse_pool_size():
+        configure_parse_pool(PARSE_PROCESSES)
+    
+    # Reduced max_workers for cloud stability
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        # Each scraper runs in a copy of the caller's context, so an active
+        # profiling trace (tracing.Trace) follows it into the worker thread
+        future_to_store = {
+            executor.submit(contextvars.copy_context().run, scraper_func, query): store_name 
+            for store_name, scraper_func in scrapers_dict.items()
+        }
+        
+        completed = 0
+        
+        for future in as_completed(future_to_store):
+            store_name = future_to_store[future]
+            completed += 1
+            
+            try:
+                # Increased timeout for problematic stores
+                timeout = 60 if store_name in PROBLEMATIC_STORES else 30
+                results = future.result(timeout=timeout)
+                
+                if results:
+                    all_data.extend(results)
+                    logger.info(f"Successfully scraped {store_name}: {len(results)} products")
+                else:
+                    logger.warning(f"No results from {store_name}")
+                
+                if progress_callback:
+                    progress_callback(store_name, len(results), None)
+                
+            except Exception as e:
+                error_msg = str(e)
+                if isinstance(e, TimeoutError):
+                    telemetry.incr("http_timeouts_total", store_name)
+                logger.error(f"Error scraping {store_name}: {error_msg}")
+                if progress_callback:
+                    progress_callback(store_name, 0, error_msg)
+    
+    logger.info(f"Total products collected: {len(all_data)}")
+    return offers_to_frame(all_data)
+
+# Words of every product name scraped by this process, for did_you_mean
+_vocabulary = TrigramIndex()
+
+def finalize_results(df: pd.DataFrame, query: str) -> pd.DataFrame:
+    """
+    Final pass over the collected offers. Each scraper already pre-filters its
+    listing (run_listing_pipeline) before fetching product pages; these passes
+    are cheap safety nets and remove duplicates across stores.
+    """
+    if df.empty:
+        return df
+
+    # Every scraped name feeds the "did you mean" vocabulary
+    _vocabulary.add_names(df['name'].unique())
+
+    df = df[df['price'] > 1]
+
+    # Apply filtering
+    df_filtered = filter_products_by_all_words(df, query)
+
+    # Remove duplicates, then read brand, capacity, memory type and model from the names
+    return add_specs(df_filtered.drop_duplicates(subset=['name', 'price'], keep='first'))
+
+# Identical searches running at the same time (a trending query, several app
+# users or batch workers) share one scrape
+_search_flight = SingleFlight()
+
+def search_key(query: str, selected_stores: List[str] = None, deep: bool = False,
+               expand: bool = False) -> tuple:
+    """Identity of a search: normalized query, the set of stores it covers, its depth and expansion"""
+    stores = frozenset(name for name in STORE_SCRAPERS if not selected_stores or name in selected_stores)
+    return " ".join(query.lower().split()), stores, bool(deep), bool(expand)
+
+def search_in_progress(query: str, selected_stores: List[str] = None, deep: bool = False,
+                       expand: bool = False) -> bool:
+    return _search_flight.in_flight(search_key(query, selected_stores, deep, expand))
+
+def search_stats() -> dict:
+    """Searches requested and how many of them joined one already running"""
+    return dict(_search_flight.stats)
+
+def _run_search(query, selected_stores, progress_callback, deep, expand):
+    scrapers = build_scrapers(selected_stores, expand)
+    token = deep_search.set(deep)
+    try:
+        df = scrape_stores(query, scrapers, progress_callback)
+    finally:
+        deep_search.reset(token)
+    with telemetry.timed("filter", "all"):
+        df = finalize_results(df, query)
+    record_history(df, query)
+    return df
+
+def search(query: str, selected_stores: List[str] = None, progress_callback=None,
+           deep: bool = False, expand: bool = False) -> pd.DataFrame:
+    """
+    Scrape the selected stores for a query and return the filtered offers.
+    With deep=True stores that paginate their results are searched past the
+    first page (within a per-store budget, see old_stores). With expand=True
+    each store is also searched for the query's alternative spellings
+    (smart_search_terms) at the same time, and the offers merged. A caller that
+    arrives while the same search is running waits for it and gets the same
+    DataFrame; only the first caller's progress_callback is called. Treat the
+    result as read-only.
+    """
+    return _search_flight.do(search_key(query, selected_stores, deep, expand), _run_search,
+                             query, selected_stores, progress_callback, deep, expand)
+
+def filter_products_by_all_words(df, search_query):
+    """Filter products that match ALL words from the search query (typo-tolerant, see fuzzy_search)"""
+    if df.empty or not search_query:
+        return df
+    
+    df = df.dropna(subset=['name'])
+    df = df[df['name'].astype(str).str.strip() != '']
+    
+    search_words = query_words(search_query)
+
+    if not search_words:
+        return df
+
+    df_filtered = df[match_mask(df['name'], search_words)]
+    df_filtered = df_filtered.sort_values('price', ascending=True)
+    
+    return df_filtered
+
+def did_you_mean(query: str, limit: int = 3) -> List[str]:
+    """Corrected spellings of a query from the names seen so far (empty until something was scraped)"""
+    return _vocabulary.suggest(query, limit)
+
+def smart_search_terms(query):
+    """Generate alternative search terms for better results"""
+    alternatives = []
+    query_lower = query.lower()
+    
+    if 'rtx' in query_lower:
+        alternatives.append(query.replace('rtx', 'geforce rtx'))
+        alternatives.append(query.replace('rtx', 'nvidia rtx'))
+    
+    if 'gtx' in query_lower:
+        alternatives.append(query.replace('gtx', 'geforce gtx'))
+        alternatives.append(query.replace('gtx', 'nvidia gtx'))
+    
+    if 'rx' in query_lower and 'rtx' not in query_lower:
+        alternatives.append(query.replace('rx', 'radeon rx'))
+        alternatives.append(query.replace('rx', 'amd rx'))
+    
+    if any(cpu in query_lower for cpu in ['i3', 'i5', 'i7', 'i9']):
+        alternatives.append(query + ' processor')
+        alternatives.append(query + ' cpu')
+    
+    if 'ryzen' in query_lower:
+        alternatives.append(query + ' processor')
+        alternatives.append(query + ' cpu')
+    
+    return alternatives[:2]
+
+SORT_KEYS = {
+    "Price (Low to High)": ('price', True),
+    "Price (High to Low)": ('price', False),
+    "Relevance": ('relevance', False),
+    "Store Name": ('store', True),
+    "Product Name": ('name', True),
+}
+
+def build_sort_index(df, sort_option, query=""):
+    """Positional row order of df for a sort option, computed once per data version"""
+    column, ascending = SORT_KEYS[sort_option]
+    if column == 'relevance':
+        # Best match first, the cheaper offer first among equally relevant ones
+        scores = relevance_scores(df['name'], query)
+        return np.lexsort((df['price'].to_numpy(), -scores))
+    ordered = df[column].reset_index(drop=True).sort_values(ascending=ascending, kind='stable')
+    return ordered.index.to_numpy()
+
+class PriceIndex:
+    """
+    Row positions of a results frame sorted by price, overall and per store,
+    built once per data version. A price range is two binary searches into
+    these, so a price-sorted view of a range is a slice instead of a mask
+    over every row and a sort.
+    """
+
+    def __init__(self, df):
+        prices = df['price'].to_numpy().astype(np.int64)
+        # Ties keep row order, as in the stable sort of build_sort_index
+        self.ascending = np.argsort(prices, kind='stable')
+        self.descending = np.argsort(-prices, kind='stable')
+        self.prices = prices[self.ascending]
+        self.negated = -prices[self.descending]
+
+        codes, stores = pd.factorize(df['store'].to_numpy()[self.ascending])
+        by_code = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(stores)))[:-1]
+        self.by_store = {}  # store -> (its positions by ascending price, their prices)
+        for store, members in zip(stores, np.split(by_code, bounds)):
+            self.by_store[store] = (self.ascending[members], self.prices[members])
+
+    def rows(self, min_price, max_price, stores=None, descending=False):
+        """Positions of the rows priced in [min_price, max_price] in price order, optionally of some stores only"""
+        if not stores:
+            if descending:
+                keys, order = self.negated, self.descending
+                low, high = -max_price, -min_price
+            else:
+                keys, order, low, high = self.prices, self.ascending, min_price, max_price
+            return order[np.searchsorted(keys, low, 'left'):np.searchsorted(keys, high, 'right')]
+
+        # Each store's range is a slice too; merging them re-sorts only the rows in range
+        slices = []
+        for store in stores:
+            positions, prices = self.by_store.get(store, (self.ascending[:0], self.prices[:0]))
+            start, stop = np.searchsorted(prices, min_price, 'left'), np.searchsorted(prices, max_price, 'right')
+            slices.append((positions[start:stop], prices[start:stop]))
+        positions = np.concatenate([s[0] for s in slices])
+        prices = np.concatenate([s[1] for s in slices])
+        return positions[np.lexsort((positions, -prices if descending else prices))]
+
+def filter_mask(df, min_price, max_price, stock_options):
+    """Boolean row mask of the price range and stock filters"""
+    mask = (df['price'] >= min_price) & (df['price'] <= max_price)
+
+    if stock_options:
+        mask &= df['availability'].isin(stock_options)
+    return mask.to_numpy()
+
+def _isin_at(column, values, rows):
+    """column.isin(values) at the positions rows only"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        wanted = column.cat.categories.get_indexer(list(values))
+        return np.isin(column.cat.codes.to_numpy()[rows], wanted[wanted >= 0])
+    return column.iloc[rows].isin(values).to_numpy()
+
+def apply_filters(df, min_price, max_price, stock_options, sort_option, sort_index=None, query="",
+                  facets=None, facet_index=None, price_index=None):
+    """
+    Apply all filters locally to the cached data. With a presorted sort_index
+    the sort becomes a reindex of the rows that pass the filter masks. The
+    query is only needed to build a relevance order. facets selects spec
+    values ({'brand': ['MSI'], 'capacity': ['16GB']}) through a FacetIndex
+    of df, built here when none is given. With a PriceIndex of df, price
+    sorts are served from a slice of it.
+    """
+    if df.empty:
+        return df
+
+    facets = {facet: values for facet, values in (facets or {}).items() if values}
+    if facets and facet_index is None:
+        facet_index = FacetIndex(df)
+
+    column, ascending = SORT_KEYS.get(sort_option, (None, True))
+    if price_index is not None and column == 'price':
+        # The price range in price order, with the other filters as masks over it
+        rows = price_index.rows(min_price, max_price, facets.get('store'), descending=not ascending)
+        keep = np.ones(len(rows), dtype=bool)
+        if stock_options:
+            keep &= _isin_at(df['availability'], stock_options, rows)
+        if facets:
+            keep &= facet_index.mask(facets)[rows]
+        return df.take(rows[keep])
+
+    mask = filter_mask(df, min_price, max_price, stock_options)
+
+    if facets:
+        mask = facet_index.mask(facets, base=mask)
+
+    if sort_option not in SORT_KEYS:
+        return df[mask]
+
+    if sort_index is None:
+        sort_index = build_sort_index(df, sort_option, query)
+
+    keep = mask[sort_index]
+    return df.take(sort_index[keep])
+
+def compute_price_aggregates(df):
+    """Summary metrics, price statistics and per-store comparison for a filtered view"""
+    prices = df['price']
+    summary = {
+        'count': len(df),
+        'min': prices.min(),
+        'max': prices.max(),
+        'stores': df['store'].nunique(),
+    }
+
+    stats_df = pd.DataFrame({
+        'Metric': ['Average Price', 'Median Price', 'Price Range', 'Standard Deviation'],
+        'Value': [
+            f"{prices.mean():.0f} EGP",
+            f"{prices.median():.0f} EGP",
+            f"{summary['max'] - summary['min']:,} EGP",
+            f"{prices.std():.0f} EGP"
+        ]
+    })
+
+    store_stats = df.groupby('store', observed=True).agg({
+        'price': ['count', 'mean', 'min', 'max']
+    }).round(0)
+    store_stats.columns = ['Products', 'Avg Price', 'Min Price', 'Max Price']
+
+    return summary, stats_df, store_stats
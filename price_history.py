@@ -0,0 +1,215 @@
+"""
+On-disk price history of the scraped offers.
+
+    python price_history.py history/ --url https://www.sigma-computer.com/... --since 2024-06-01
+    python price_history.py history/ --model 4070 --stores Sigma,KimoStore --daily
+    python price_history.py history/ --compact 2024-06-01
+"""
+import argparse
+import os
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from old_stores import STORE_HOSTS, store_for_url
+from specs import extract_specs, model_label
+
+# On-disk price history: every search's offers appended as Parquet, one
+# directory per day and store (hive layout: day=2024-06-01/store=Sigma/).
+# Queries go through pyarrow.dataset, so filters on day and store prune whole
+# directories and filters on url/model skip row groups by their min/max
+# statistics. Rows are written sorted by url to keep those ranges tight;
+# compact() merges a day's small per-search files into one file per store.
+
+SCHEMA = pa.schema([
+    ("scraped_at", pa.timestamp("ms", tz="UTC")),
+    ("query", pa.string()),
+    ("name", pa.string()),
+    ("url", pa.string()),
+    ("model", pa.string()),
+    ("price", pa.int32()),
+    ("availability", pa.dictionary(pa.int8(), pa.string())),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("day", pa.string()), ("store", pa.string())]), flavor="hive")
+
+ROW_GROUP_SIZE = 4096
+
+
+def _day(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc).date()
+    return value.isoformat()
+
+
+class PriceHistory:
+    """Append-only price history under `root`, queryable by product URL, model, store and time"""
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+        self._compact_lock = threading.Lock()
+
+    def append(self, df, query="", scraped_at=None):
+        """Write a results frame as one file per store; returns the paths written"""
+        if df.empty:
+            return []
+        # The spec model column ("4070 Ti", "13400F"), so model queries agree with the app's facets
+        models = df["model"] if "model" in df else extract_specs(df["name"])["model"]
+        scraped_at = pd.Timestamp(scraped_at or datetime.now(timezone.utc))
+        scraped_at = scraped_at.tz_localize("UTC") if scraped_at.tzinfo is None else scraped_at.tz_convert("UTC")
+        scraped_at = scraped_at.floor("ms")
+        day = _day(scraped_at.to_pydatetime())
+
+        frame = pd.DataFrame({
+            "scraped_at": scraped_at,
+            "query": query,
+            "name": df["name"].astype(str).to_numpy(),
+            "url": df["url"].astype(str).to_numpy(),
+            "model": models.astype(object).where(models.notna(), None).to_numpy(),
+            "price": df["price"].astype("int32").to_numpy(),
+            "availability": df["availability"].astype(str).to_numpy(),
+            "store": df["store"].astype(str).to_numpy(),
+        })
+
+        written = []
+        stamp = datetime.now(timezone.utc).strftime("%H%M%S")
+        for store, rows in frame.groupby("store", sort=False):
+            rows = rows.drop(columns="store").sort_values("url", kind="stable")
+            directory = os.path.join(self.root, f"day={day}", f"store={store}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+            table = pa.Table.from_pandas(rows, schema=SCHEMA, preserve_index=False)
+            pq.write_table(table, path, row_group_size=ROW_GROUP_SIZE)
+            written.append(path)
+        return written
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING, schema=_DATASET_SCHEMA)
+
+    @staticmethod
+    def _filter(urls=None, model=None, stores=None, since=None, until=None):
+        if urls is not None and not stores:
+            # A product URL's host names its store, which prunes every other store's directories
+            url_stores = {store_for_url(url) for url in urls}
+            if url_stores and url_stores <= set(STORE_HOSTS):
+                stores = url_stores
+
+        conditions = []
+        if since is not None:
+            conditions.append(ds.field("day") >= _day(since))
+        if until is not None:
+            conditions.append(ds.field("day") <= _day(until))
+        if stores:
+            conditions.append(ds.field("store").isin(list(stores)))
+        if urls is not None:
+            conditions.append(ds.field("url").isin(list(urls)))
+        if model is not None:
+            conditions.append(ds.field("model") == model_label(model))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def query(self, urls=None, model=None, stores=None, since=None, until=None, columns=None):
+        """
+        History rows matching every given filter. since/until are days
+        (date, datetime or 'YYYY-MM-DD'), inclusive. Only the matching day and
+        store directories are opened.
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns or _DATASET_SCHEMA.names)
+        table = self.dataset().to_table(
+            columns=columns, filter=self._filter(urls, model, stores, since, until)
+        )
+        df = table.to_pandas()
+        if "availability" in df:
+            df["availability"] = df["availability"].astype(str)
+        return df.sort_values("scraped_at", kind="stable").reset_index(drop=True) if "scraped_at" in df else df
+
+    def files_scanned(self, **filters):
+        """Files a query with these filters would open (partition pruning only)"""
+        if not os.path.isdir(self.root):
+            return 0
+        return sum(1 for _ in self.dataset().get_fragments(filter=self._filter(**filters)))
+
+    def price_over_time(self, urls=None, model=None, stores=None, since=None, until=None):
+        """Lowest price per day and store (days as rows, stores as columns)"""
+        df = self.query(urls, model, stores, since, until, columns=["day", "store", "price"])
+        if df.empty:
+            return pd.DataFrame()
+        daily = df.groupby(["day", "store"], observed=True)["price"].min().unstack("store")
+        daily.index = pd.to_datetime(daily.index)
+        return daily.sort_index()
+
+    def compact(self, day=None):
+        """
+        Merge each store's files of a day (default: yesterday, UTC) into one
+        url-sorted file. Don't run it for a day that is still being written.
+        """
+        day = _day(day or (datetime.now(timezone.utc).date() - timedelta(days=1)))
+        day_dir = os.path.join(self.root, f"day={day}")
+        if not os.path.isdir(day_dir):
+            return 0
+
+        merged = 0
+        with self._compact_lock:
+            for store_dir in sorted(os.listdir(day_dir)):
+                directory = os.path.join(day_dir, store_dir)
+                parts = sorted(f for f in os.listdir(directory) if f.endswith(".parquet"))
+                if len(parts) < 2:
+                    continue
+                paths = [os.path.join(directory, f) for f in parts]
+                table = pa.concat_tables(pq.read_table(p, schema=SCHEMA) for p in paths)
+                table = table.take(pc.sort_indices(table, [("url", "ascending"), ("scraped_at", "ascending")]))
+                name = f"compacted-{uuid.uuid4().hex[:8]}.parquet"
+                # Written under a _-prefixed name first; dataset discovery skips those
+                pq.write_table(table, os.path.join(directory, "_" + name), row_group_size=ROW_GROUP_SIZE)
+                os.replace(os.path.join(directory, "_" + name), os.path.join(directory, name))
+                for path in paths:
+                    os.remove(path)
+                merged += len(paths)
+        return merged
+
+
+_DATASET_SCHEMA = pa.schema(list(SCHEMA) + [("day", pa.string()), ("store", pa.string())])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or compact the price history")
+    parser.add_argument("root", help="history directory (as given to --history / PRICE_HISTORY_DIR)")
+    parser.add_argument("--url", action="append", help="product URL (repeatable)")
+    parser.add_argument("--model", help="model number, e.g. 4070, '4070 ti' or 13400f")
+    parser.add_argument("--stores", help="comma-separated store names")
+    parser.add_argument("--since", help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day, YYYY-MM-DD")
+    parser.add_argument("--daily", action="store_true", help="lowest price per day and store instead of every row")
+    parser.add_argument("--compact", nargs="?", const="", metavar="DAY",
+                        help="merge a day's files (default: yesterday) instead of querying")
+    args = parser.parse_args(argv)
+
+    history = PriceHistory(args.root)
+    if args.compact is not None:
+        print(f"Merged {history.compact(args.compact or None)} files")
+        return 0
+    if not args.url and not args.model:
+        parser.error("give --url or --model")
+
+    stores = [s.strip() for s in args.stores.split(",")] if args.stores else None
+    filters = dict(urls=args.url, model=args.model, stores=stores, since=args.since, until=args.until)
+    df = history.price_over_time(**filters) if args.daily else history.query(**filters)
+    df.to_csv(sys.stdout, index=args.daily)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Cross-store entity resolution: groups offers for the same product (the same
+# GPU listed by six stores under six spellings) so the app can show one row
+# per product with its best price.
+#
+# Names are normalized to token sets. Offers are blocked on their model
+# number tokens (4070, 13400f, ...) plus variant words (ti, super, xt), since
+# offers with different model numbers are never the same product. Inside a
+# block, MinHash signatures and LSH banding propose candidate pairs, which are
+# verified on exact token Jaccard and memory size, and merged with
+# union-find. No step compares all pairs, so it stays near-linear in the
+# number of offers.
+
+NUM_PERM = 64          # MinHash permutations
+BANDS = 16             # LSH bands of NUM_PERM // BANDS rows each
+MIN_JACCARD = 0.5      # token-set similarity needed to merge two offers
+
+_MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+
+# Words that vary between stores' listings of the same product
+FILLER_WORDS = {
+    "geforce", "nvidia", "amd", "radeon", "intel", "graphics", "graphic", "card", "video", "gpu",
+    "edition", "with", "and", "for", "the", "new", "original", "desktop", "processor", "cpu",
+    "gddr6", "gddr6x", "gddr7", "-", "|", "/",
+}
+VARIANT_WORDS = {"ti", "super", "xt", "xtx", "gre", "pro", "max", "plus", "ultra"}
+BRANDS = {
+    "msi", "asus", "gigabyte", "zotac", "pny", "palit", "gainward", "inno3d", "sapphire", "powercolor",
+    "xfx", "asrock", "galax", "colorful", "biostar", "evga", "corsair", "kingston", "samsung", "crucial",
+    "wd", "seagate", "lexar", "adata", "teamgroup", "gskill", "hp", "dell", "lenovo", "acer", "lg",
+}
+
+_CAPACITY = re.compile(r"^(\d+)(gb|tb|g|t)$")
+_UNIT = re.compile(r"^\d+(mhz|hz|w|mm|inch|in|ms|rpm|cm|bit)$")
+_SPLIT = re.compile(r"(?<=[a-z])(?=\d{3,})")
+
+
+def name_tokens(name):
+    """Normalized token set of a product name"""
+    text = str(name).lower().replace("-", " ").replace("_", " ")
+    text = _SPLIT.sub(" ", text)  # rtx4070 -> rtx 4070
+    text = re.sub(r"(\d+)\s+(gb|tb)\b", r"\1\2", text)
+    tokens = set()
+    for token in re.findall(r"[a-z0-9.+]+", text):
+        token = token.strip(".+")
+        if not token or token in FILLER_WORDS:
+            continue
+        capacity = _CAPACITY.match(token)
+        if capacity:
+            unit = "tb" if capacity.group(2).startswith("t") else "gb"
+            token = capacity.group(1) + unit
+        tokens.add(token)
+    return frozenset(tokens)
+
+
+def model_key(tokens):
+    """
+    Blocking key: model number tokens (digits, not a capacity or unit) plus
+    variant words. Offers with different keys are never merged.
+    """
+    models = sorted(
+        t for t in tokens
+        if any(c.isdigit() for c in t) and not _CAPACITY.match(t) and not _UNIT.match(t) and len(t) >= 3
+    )
+    variants = sorted(tokens & VARIANT_WORDS)
+    return " ".join(models + variants)
+
+
+def _capacities(tokens):
+    return {t for t in tokens if _CAPACITY.match(t)}
+
+
+def _conflict(a, b):
+    return bool(a and b and a != b)
+
+
+def _compatible(a, b):
+    """Verification of a candidate pair of token sets"""
+    if _conflict(a & BRANDS, b & BRANDS) or _conflict(_capacities(a), _capacities(b)):
+        return False
+    return len(a & b) / len(a | b) >= MIN_JACCARD
+
+
+def minhash_signatures(token_sets, chunk=4096):
+    """(n, NUM_PERM) MinHash signatures of token sets, vectorized over the tokens of `chunk` sets at a time"""
+    out = np.empty((len(token_sets), NUM_PERM), dtype=np.uint64)
+    for start in range(0, len(token_sets), chunk):
+        part = [tokens or frozenset([""]) for tokens in token_sets[start:start + chunk]]
+        lengths = np.fromiter((len(t) for t in part), dtype=np.int64, count=len(part))
+        hashes = np.fromiter((zlib.crc32(tok.encode()) for tokens in part for tok in tokens),
+                             dtype=np.uint64, count=int(lengths.sum()))
+        # (a*h + b) mod p per permutation and token; h < 2^32 and a < 2^31 keep it in uint64
+        permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % np.uint64(_MERSENNE)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        out[start:start + len(part)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return out
+
+
+class _UnionFind:
+    """
+    Union-find over token sets whose roots carry the brands and capacities
+    of their whole group, so a group never takes in an offer that conflicts
+    with any of its members, not only with the one it was compared to.
+    """
+
+    def __init__(self, token_sets):
+        self.parent = list(range(len(token_sets)))
+        self.brands = [tokens & BRANDS for tokens in token_sets]
+        self.capacities = [_capacities(tokens) for tokens in token_sets]
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, i, j):
+        """Merges the groups of i and j; False when their brands or capacities conflict"""
+        ri, rj = self.find(i), self.find(j)
+        if ri == rj:
+            return True
+        if _conflict(self.brands[ri], self.brands[rj]) or _conflict(self.capacities[ri], self.capacities[rj]):
+            return False
+        root, child = min(ri, rj), max(ri, rj)
+        self.parent[child] = root
+        self.brands[root] = self.brands[root] | self.brands[child]
+        self.capacities[root] = self.capacities[root] | self.capacities[child]
+        return True
+
+
+def match_products(df):
+    """
+    Product group id for every offer in df (a Series aligned on df's index).
+    Offers of the same product across stores share an id.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype="int64")
+
+    # Identical names (after normalization) are matched once
+    unique = {}
+    offer_sets = [unique.setdefault(name_tokens(name), len(unique)) for name in df["name"]]
+    token_sets = list(unique)
+    keys = [model_key(tokens) for tokens in token_sets]
+    signatures = minhash_signatures(token_sets)
+    rows = NUM_PERM // BANDS
+
+    groups = _UnionFind(token_sets)
+    buckets = {}
+    for i, key in enumerate(keys):
+        bands = signatures[i].reshape(BANDS, rows)
+        for band in range(BANDS):
+            buckets.setdefault((key, band, bands[band].tobytes()), []).append(i)
+
+    for members in buckets.values():
+        # Linking each member to the bucket's first or previous member is
+        # enough for union-find and keeps big buckets linear
+        head = members[0]
+        for prev, i in zip(members, members[1:]):
+            if groups.find(i) == groups.find(head):
+                continue
+            if _compatible(token_sets[head], token_sets[i]) and groups.union(head, i):
+                continue
+            if prev != head and _compatible(token_sets[prev], token_sets[i]):
+                groups.union(prev, i)
+
+    roots = np.array([groups.find(i) for i in range(len(token_sets))], dtype=np.int64)
+    ids = np.unique(roots, return_inverse=True)[1]
+    return pd.Series(ids[np.array(offer_sets, dtype=np.int64)], index=df.index, name="product_id")
+
+
+BEST_PRICE_COLUMNS = ["product_id", "name", "price", "store", "availability", "url",
+                      "stores", "offers", "max_price", "savings"]
+
+
+def best_price_view(df, product_ids=None):
+    """
+    One row per matched product: its cheapest in-stock offer (cheapest of
+    any offer when none is in stock), how many stores and offers list it,
+    the highest price and the saving against it. product_ids can be a
+    precomputed match_products result covering df's index.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=BEST_PRICE_COLUMNS)
+
+    ids = match_products(df) if product_ids is None else product_ids.loc[df.index]
+    work = df.assign(product_id=ids.to_numpy(), _unavailable=(df["availability"] != "In Stock").to_numpy())
+
+    best = (work.sort_values(["product_id", "_unavailable", "price"], kind="stable")
+                .drop_duplicates("product_id")
+                .set_index("product_id"))
+    grouped = work.groupby("product_id")
+    best["stores"] = grouped["store"].nunique()
+    best["offers"] = grouped.size()
+    best["max_price"] = grouped["price"].max()
+    best["savings"] = best["max_price"] - best["price"]
+
+    return (best.reset_index()
+                .sort_values(["price", "name"], kind="stable")
+                .reset_index(drop=True)[BEST_PRICE_COLUMNS])
@@ -0,0 +1,122 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from product_matching import BRANDS, model_key, name_tokens
+
+# Relevance ranking of result names for a query: BM25 over the names'
+# letter and digit runs ("RTX4070Ti" -> rtx, 4070, ti), plus a boost for
+# names carrying exactly the query's model number (4070, not 4070 Ti or
+# 4070S) and a penalty for accessories (a "RTX 4070 backplate" matches every
+# query word but isn't what the query asks for). Generic words such as "fan"
+# or "box" are also part of real products' names ("Dual Fan", a boxed CPU),
+# so they only count when the name has no brand, capacity or model.
+#
+# TokenIndex flattens all names into parallel (document, term) arrays once,
+# so scoring a query is a handful of numpy passes over them; the engine turns
+# the scores into a presorted row order, like the other sort keys.
+
+K1 = 1.2                 # BM25 term-frequency saturation
+B = 0.75                 # BM25 length normalization
+MODEL_BOOST = 4.0        # name has exactly the query's model number and variant
+ACCESSORY_PENALTY = 6.0  # name is an accessory the query didn't ask for
+
+VARIANT_WORDS = ["ti", "super", "xt", "xtx", "gre", "pro", "max", "plus", "ultra"]
+ACCESSORY_WORDS = [
+    "backplate", "bracket", "holder", "riser", "cable", "adapter", "extension", "waterblock", "sticker",
+]
+GENERIC_ACCESSORY_WORDS = ["block", "cooler", "fan", "stand", "support", "cover", "case", "bag", "box"]
+
+_PARTS = re.compile(r"\d+|[^\W\d_]+")
+_CAPACITY = re.compile(r"^\d+(gb|tb)$")
+_VARIANTS = r"(?:" + "|".join(VARIANT_WORDS) + r")(?![^\W\d_])"
+
+
+def _names_a_product(name):
+    """Whether a name has a brand, capacity or model number, as product_matching tokenizes it"""
+    tokens = name_tokens(name)
+    return bool(tokens & BRANDS or model_key(tokens - set(VARIANT_WORDS)) or any(_CAPACITY.match(t) for t in tokens))
+
+
+def _words_pattern(words):
+    """Regex for any of the words, not inside a longer word (digits may touch it: 4070ti)"""
+    return r"(?<![^\W\d_])(?:" + "|".join(map(re.escape, words)) + r")(?![^\W\d_])" if words else None
+
+
+class TokenIndex:
+    """Names flattened to (document, term id) arrays with BM25 statistics"""
+
+    def __init__(self, names):
+        self.lower = pd.Series(names, dtype=object).astype(str).str.lower().reset_index(drop=True)
+        parts = self.lower.str.findall(_PARTS).explode().dropna()
+        self.doc = parts.index.to_numpy(dtype=np.int64)
+        self.term, vocabulary = pd.factorize(parts.to_numpy())
+        self.vocabulary = pd.Index(vocabulary)
+        self.n_docs = len(self.lower)
+        self.doc_len = np.bincount(self.doc, minlength=self.n_docs)
+        self.avg_len = self.doc_len.mean() if self.n_docs else 0.0
+        # Documents containing each term (a term repeated in one name counts once)
+        pairs = np.unique(self.doc * max(len(self.vocabulary), 1) + self.term)
+        self.doc_freq = np.bincount(pairs % max(len(self.vocabulary), 1), minlength=len(self.vocabulary))
+
+    def bm25(self, terms):
+        """BM25 score of every document for the query terms"""
+        scores = np.zeros(self.n_docs)
+        if not self.n_docs:
+            return scores
+        norm = K1 * (1 - B + B * self.doc_len / (self.avg_len or 1))
+        for term in set(terms):
+            term_id = self.vocabulary.get_indexer([term])[0]
+            if term_id < 0:
+                continue
+            tf = np.bincount(self.doc[self.term == term_id], minlength=self.n_docs)
+            df = self.doc_freq[term_id]
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            scores += idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def scores(self, query, model_boost=MODEL_BOOST, accessory_penalty=ACCESSORY_PENALTY):
+        query = str(query or "").lower()
+        terms = _PARTS.findall(query)
+        scores = self.bm25(terms)
+        if not self.n_docs:
+            return scores
+
+        models = [t for t in re.findall(r"[^\W_]+", query) if any(c.isdigit() for c in t) and len(t) >= 3]
+        if models and model_boost:
+            variants = [v for v in VARIANT_WORDS if v in terms]
+            exact = np.ones(self.n_docs, dtype=bool)
+            for model in models:
+                # The model number (4070, 4070ti ~ "4070 Ti"), also right after letters (rtx4070),
+                # but not with a suffix of its own (4070s, 7600x); variant words are checked below
+                body = r"[\s\-_/.,]*".join(map(re.escape, _PARTS.findall(model)))
+                exact &= self.lower.str.contains(rf"(?<!\d){body}(?!\d)(?!(?!{_VARIANTS})[^\W\d_])").to_numpy()
+            extra = _words_pattern([v for v in VARIANT_WORDS if v not in variants])
+            if extra:
+                exact &= ~self.lower.str.contains(extra).to_numpy()
+            for variant in variants:
+                exact &= self.lower.str.contains(_words_pattern([variant])).to_numpy()
+            scores += model_boost * exact
+
+        if accessory_penalty:
+            scores -= accessory_penalty * self.accessories(terms)
+        return scores
+
+    def accessories(self, terms=()):
+        """Which names are accessories, not counting accessory words among the query terms"""
+        unasked = _words_pattern([w for w in ACCESSORY_WORDS if w not in terms])
+        found = np.zeros(self.n_docs, dtype=bool)
+        if unasked:
+            found |= self.lower.str.contains(unasked).to_numpy()
+        generic = _words_pattern([w for w in GENERIC_ACCESSORY_WORDS if w not in terms])
+        if generic:
+            candidates = self.lower.str.contains(generic).to_numpy() & ~found
+            if candidates.any():
+                found[candidates] = [not _names_a_product(name) for name in self.lower[candidates]]
+        return found
+
+
+def relevance_scores(names, query, **weights):
+    """Relevance of each name to the query (higher is better), as a numpy array"""
+    return TokenIndex(names).scores(query, **weights)
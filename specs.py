@@ -0,0 +1,181 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from product_matching import BRANDS
+
+# Structured specs read from product names, and a facet index over them.
+#
+# extract_specs fills brand, capacity ("16GB", "1TB"), memory type ("DDR5",
+# "GDDR6X") and model ("4070 Ti", "13400F") columns with one str.extract
+# pass per spec over the distinct names; the engine adds them to every
+# result frame in finalize_results.
+#
+# FacetIndex keeps a boolean row mask per facet value, built once per data
+# version. Drilling down (MSI, 16GB, at Sigma) is then OR within a facet and
+# AND across facets of those masks, and the live count of every value is a
+# bincount of the facet's codes under the other facets' selection.
+
+SPEC_COLUMNS = ["brand", "capacity", "memory", "model"]
+FACETS = ["brand", "capacity", "memory", "store"]
+
+# Display labels; other brands are shown capitalized
+BRAND_LABELS = {
+    "msi": "MSI", "asus": "ASUS", "pny": "PNY", "xfx": "XFX", "asrock": "ASRock", "evga": "EVGA",
+    "wd": "WD", "hp": "HP", "lg": "LG", "adata": "ADATA", "gskill": "G.Skill", "inno3d": "Inno3D",
+    "powercolor": "PowerColor", "teamgroup": "TeamGroup", "amd": "AMD", "nvidia": "NVIDIA",
+}
+# Chip makers, the brand of names without a board partner (Intel Core i5, AMD Ryzen)
+CHIP_BRANDS = {"intel", "amd", "nvidia"}
+# Other spellings of a brand in names
+BRAND_ALIASES = {"g.skill": "gskill", "g skill": "gskill", "team group": "teamgroup", "western digital": "wd"}
+
+VARIANT_LABELS = {"ti": "Ti", "super": "Super", "xt": "XT", "xtx": "XTX", "gre": "GRE"}
+
+_BRAND = re.compile(
+    r"(?<![^\W_])(" + "|".join(map(re.escape, sorted(BRANDS | CHIP_BRANDS | set(BRAND_ALIASES), key=len, reverse=True)))
+    + r")(?![^\W_])"
+)
+# A kit ("2x16GB", not "Ventus 2X 12GB") or a single size ("16 GB", "12G",
+# "1TB"); the first one in a name wins
+_CAPACITY = re.compile(r"(?<![\d.])(?:(\d+)x)?(\d+(?:\.\d+)?)\s*(gb|tb|g)(?![^\W_])")
+_MEMORY = re.compile(r"(?<![^\W_])((?:lp)?g?ddr\d+x?)(?![^\W\d_])")
+# A 3-5 digit model number with its suffix letters (13400f, 7800x3d) and
+# variant word, after letters (rtx4070) or not; not a size, speed or DDR rating
+# (120mm, 1500rpm, 850w, with or without a space)
+_UNITS = r"(?:gb|tb|mb|mhz|ghz|hz|w|mm|cm|rpm|ms|inch)(?![^\W_])"
+_MODEL = re.compile(
+    r"(?<![\d.])(?<!ddr\d[\s-])(?<!ddr\d)(\d{3,5}(?!" + _UNITS + r")"
+    r"(?:(?!(?:ti|super|xtx|xt|gre)(?![^\W_]))[a-z]{1,2}\d?[a-z]?)?)"
+    r"(?![\d.])(?!\s*" + _UNITS + r")"
+    r"(?:[\s-]?(ti|super|xtx|xt|gre)(?![^\W_]))?"
+)
+
+
+def _capacity_labels(found):
+    count = pd.to_numeric(found[0], errors="coerce").fillna(1)
+    size = pd.to_numeric(found[1], errors="coerce") * count
+    unit = found[2].replace("g", "gb").str.upper()
+    return size.map(lambda s: f"{s:g}", na_action="ignore").astype(object).str.cat(unit.astype(object))
+
+
+def _model_labels(found):
+    number = found[0].str.upper().astype(object)
+    variant = found[1].map(VARIANT_LABELS).astype(object)
+    return number.where(variant.isna(), number.str.cat(variant, sep=" "))
+
+
+def extract_specs(names):
+    """
+    Spec columns (SPEC_COLUMNS, categorical, NaN where a name doesn't say)
+    for a Series of product names, aligned on its index
+    """
+    codes, unique = pd.factorize(pd.Series(names, dtype=object).astype(str).str.lower())
+    lower = pd.Series(unique, dtype=object)
+
+    brand = lower.str.extract(_BRAND)[0].replace(BRAND_ALIASES)
+    specs = {
+        "brand": brand.map(lambda b: BRAND_LABELS.get(b, b.capitalize()), na_action="ignore"),
+        "capacity": _capacity_labels(lower.str.extract(_CAPACITY)),
+        "memory": lower.str.extract(_MEMORY)[0].str.upper(),
+        "model": _model_labels(lower.str.extract(_MODEL)),
+    }
+
+    index = names.index if isinstance(names, pd.Series) else None
+    return pd.DataFrame({
+        column: pd.Categorical(values.to_numpy(dtype=object)[codes], categories=_ordered(values))
+        for column, values in specs.items()
+    }, index=index)
+
+
+def _ordered(values):
+    """Facet values in display order: sizes by size, everything else alphabetically"""
+    distinct = values.dropna().unique().tolist()
+    return sorted(distinct, key=_sort_key)
+
+
+def _sort_key(value):
+    size = re.fullmatch(r"([\d.]+)(GB|TB)", value)
+    if size:
+        return (0, float(size.group(1)) * (1024 if size.group(2) == "TB" else 1), value)
+    return (1, 0, value.lower())
+
+
+def model_label(text):
+    """A model number as the model column spells it ("4070 ti" -> "4070 Ti"), or the text as given"""
+    found = extract_specs(pd.Series([str(text)]))["model"].iloc[0]
+    return text if pd.isna(found) else found
+
+
+def add_specs(df):
+    """df with its spec columns (re)filled from the names"""
+    return df.assign(**extract_specs(df["name"]))
+
+
+class FacetIndex:
+    """Row masks per facet value of a results frame, for drill-down and live counts"""
+
+    def __init__(self, df, facets=FACETS):
+        self.size = len(df)
+        self.facets = [f for f in facets if f in df]
+        self.values = {}   # facet -> values in display order
+        self.codes = {}    # facet -> value position of every row, -1 when missing
+        self.bitmaps = {}  # facet -> {value: bool mask of its rows}
+        for facet in self.facets:
+            column = df[facet]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                values = list(column.cat.categories)
+                codes = column.cat.codes.to_numpy().astype(np.int64)
+            else:
+                codes, values = pd.factorize(column, sort=True)
+                values = list(values)
+            self.values[facet] = values
+            self.codes[facet] = codes
+            rows_of = np.bincount(codes[codes >= 0], minlength=len(values))
+            # One argsort splits the rows by value; a mask per value is filled from its slice
+            order = np.argsort(codes, kind="stable")[np.count_nonzero(codes < 0):]
+            bitmaps = {}
+            for value, rows in zip(values, np.split(order, np.cumsum(rows_of)[:-1])):
+                mask = np.zeros(self.size, dtype=bool)
+                mask[rows] = True
+                bitmaps[value] = mask
+            self.bitmaps[facet] = bitmaps
+
+    def facet_mask(self, facet, selected):
+        """Rows having any of the selected values of one facet (None when none is selected)"""
+        if facet not in self.bitmaps or not selected:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        for value in selected:
+            bitmap = self.bitmaps[facet].get(value)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def mask(self, selection, base=None, skip=None):
+        """
+        Rows matching the selection ({facet: values}): any selected value
+        within a facet, every facet with a selection. base is an extra row
+        mask (the price and stock filters); skip leaves out one facet.
+        """
+        mask = np.ones(self.size, dtype=bool) if base is None else np.array(base, dtype=bool)
+        for facet, selected in (selection or {}).items():
+            if facet == skip:
+                continue
+            facet_mask = self.facet_mask(facet, selected)
+            if facet_mask is not None:
+                mask &= facet_mask
+        return mask
+
+    def counts(self, selection=None, base=None):
+        """
+        {facet: {value: rows}}: how many rows each value would leave given the
+        other facets' selections, so values can be added to a selection
+        """
+        out = {}
+        for facet in self.facets:
+            codes = self.codes[facet][self.mask(selection, base, skip=facet)]
+            rows = np.bincount(codes[codes >= 0], minlength=len(self.values[facet]))
+            out[facet] = dict(zip(self.values[facet], rows.tolist()))
+        return out
@@ -0,0 +1,195 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import tracing
+
+# Process-wide scraping metrics: latency histograms per (phase, store) and
+# counters per store. Stdlib only, since old_stores records into it on every
+# request. Exported as Prometheus text (price_api /metrics, price_cli
+# --metrics) and summarized in the app's diagnostics panel.
+
+PHASES = ["listing_fetch", "listing_parse", "page_fetch", "stock_parse", "filter", "render"]
+
+# Upper bounds in seconds, roughly log-spaced from 5 ms to 30 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTER_HELP = {
+    "http_requests_total": "HTTP requests sent to store hosts",
+    "http_bytes_total": "Response body bytes received from store hosts",
+    "http_errors_total": "HTTP requests that failed with a connection error or a non-2xx status",
+    "http_timeouts_total": "HTTP requests and store scrapes that timed out",
+    "scrape_retries_total": "Store scrapes retried after an error",
+    "page_cache_total": "Product-page lookups by result (hit, miss, coalesced)",
+    "rate_limit_wait_seconds_total": "Time spent waiting for a rate-limit token",
+    "listing_pages_total": "Extra listing pages fetched by deep searches",
+    "listing_not_modified_total": "Listing requests answered 304 Not Modified (store skipped by a re-check)",
+}
+
+# Store being scraped by the current thread, for metrics that can't be
+# attributed by URL (parse steps); set by the engine around each scraper
+current_store = ContextVar("current_store", default="other")
+
+_lock = threading.Lock()
+_histograms = {}  # (phase, store) -> Histogram
+_counters = {}    # (name, store, extra labels) -> value
+
+
+class Histogram:
+    """Latency histogram over LATENCY_BUCKETS (per-bucket counts, cumulated on export)"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else lower * 2
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return LATENCY_BUCKETS[-1]
+
+
+def observe(phase, store, seconds):
+    with _lock:
+        hist = _histograms.get((phase, store))
+        if hist is None:
+            hist = _histograms[(phase, store)] = Histogram()
+        hist.observe(seconds)
+
+
+def incr(name, store, value=1, **labels):
+    key = (name, store, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextmanager
+def timed(phase, store, name=None, **args):
+    """
+    Record the duration of the with-block, also when it raises. While a
+    profiling trace is active it is also added to it as a span.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        observe(phase, store, ended - started)
+        tracing.record(name or phase, phase, store, started, ended, **args)
+
+
+@contextmanager
+def store_scope(store):
+    token = current_store.set(store)
+    try:
+        yield
+    finally:
+        current_store.reset(token)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _phase_order(phase):
+    return PHASES.index(phase) if phase in PHASES else len(PHASES)
+
+
+def phase_summary():
+    """One row per (phase, store): count, total and mean/p50/p95 in milliseconds"""
+    with _lock:
+        items = sorted(_histograms.items(), key=lambda kv: (_phase_order(kv[0][0]), kv[0][1]))
+        return [
+            {
+                "phase": phase,
+                "store": store,
+                "count": hist.count,
+                "total_s": round(hist.sum, 3),
+                "mean_ms": round(hist.sum / hist.count * 1000, 1),
+                "p50_ms": round(hist.quantile(0.5) * 1000, 1),
+                "p95_ms": round(hist.quantile(0.95) * 1000, 1),
+            }
+            for (phase, store), hist in items
+        ]
+
+
+def store_summary():
+    """Per-store counters: requests, bytes, errors, timeouts, retries and page-cache hit ratio"""
+    with _lock:
+        counters = list(_counters.items())
+
+    stores = {}
+    for (name, store, labels), value in counters:
+        row = stores.setdefault(store, {"store": store})
+        if name == "page_cache_total":
+            row["cache_" + dict(labels)["result"]] = value
+        else:
+            row[name.replace("_total", "")] = value
+
+    for row in stores.values():
+        hits = row.get("cache_hit", 0) + row.get("cache_coalesced", 0)
+        lookups = hits + row.get("cache_miss", 0)
+        row["cache_hit_ratio"] = round(hits / lookups, 3) if lookups else None
+        if "rate_limit_wait_seconds" in row:
+            row["rate_limit_wait_seconds"] = round(row["rate_limit_wait_seconds"], 3)
+    return sorted(stores.values(), key=lambda row: row["store"])
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def to_prometheus(prefix="price_scraper"):
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    with _lock:
+        histograms = sorted(_histograms.items())
+        snapshot = [(key, hist.counts[:], hist.sum, hist.count) for key, hist in histograms]
+        counters = sorted(_counters.items())
+
+    lines = [
+        f"# HELP {prefix}_phase_seconds Latency of scraping phases by store",
+        f"# TYPE {prefix}_phase_seconds histogram",
+    ]
+    for (phase, store), counts, total, count in snapshot:
+        cumulative = 0
+        for bound, n in zip(list(LATENCY_BUCKETS) + ["+Inf"], counts):
+            cumulative += n
+            lines.append(f"{prefix}_phase_seconds_bucket{_labels(phase=phase, store=store, le=bound)} {cumulative}")
+        lines.append(f"{prefix}_phase_seconds_sum{_labels(phase=phase, store=store)} {total:.6f}")
+        lines.append(f"{prefix}_phase_seconds_count{_labels(phase=phase, store=store)} {count}")
+
+    by_name = {}
+    for (name, store, labels), value in counters:
+        by_name.setdefault(name, []).append((store, labels, value))
+    for name, rows in by_name.items():
+        lines.append(f"# HELP {prefix}_{name} {COUNTER_HELP.get(name, name)}")
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        for store, labels, value in rows:
+            value = value if isinstance(value, int) else f"{value:.6f}"
+            lines.append(f"{prefix}_{name}{_labels(store=store, **dict(labels))} {value}")
+
+    return "\n".join(lines) + "\n"
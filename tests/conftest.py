@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live at the repository root
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+@pytest.fixture
+def mock_stores():
+    """The mock store server with no latency, old_stores routed to it and its page cache empty"""
+    import old_stores
+    from mock_stores import MockStores
+
+    old_stores.configure_rate_limits({store: (0, 1) for store in old_stores.STORE_HOSTS}, default=(0, 1))
+    old_stores.clear_page_cache()
+    with MockStores(latency_ms=0, jitter_ms=0, page_kb=1, catalog_size=30) as mock:
+        mock.route_scrapers()
+        yield mock
+    old_stores.clear_page_cache()
@@ -0,0 +1,117 @@
+import gzip
+
+import pytest
+
+import mock_stores as mock_module
+import old_stores
+from catalog_refresh import CatalogRefresher, parse_args, parse_product_page, parse_sitemap
+
+URLSET = (b'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+          b'<url><loc>https://a.com/p/1</loc><lastmod>2024-06-01</lastmod></url>'
+          b'<url><loc> https://a.com/p/2 </loc></url></urlset>')
+INDEX = (b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+         b'<sitemap><loc>https://a.com/product-sitemap.xml</loc><lastmod>2024-06-02</lastmod></sitemap>'
+         b'</sitemapindex>')
+
+
+def test_parse_sitemap():
+    assert parse_sitemap(URLSET) == ("urlset", [("https://a.com/p/1", "2024-06-01"), ("https://a.com/p/2", None)])
+    assert parse_sitemap(gzip.compress(URLSET)) == parse_sitemap(URLSET)
+    assert parse_sitemap(INDEX) == ("index", [("https://a.com/product-sitemap.xml", "2024-06-02")])
+
+
+def test_parse_product_page_reads_json_ld():
+    html = ('<script type="application/ld+json">{"@graph": [{"@type": "WebPage"}, {"@type": "Product", '
+            '"name": "MSI RTX 4070", "offers": [{"price": "29,999.00", "availability": "https://schema.org/InStock"}]}]}'
+            '</script>')
+    assert parse_product_page(html) == {"name": "MSI RTX 4070", "price": 29999, "availability": "In Stock"}
+
+
+def test_parse_product_page_falls_back_to_meta_tags():
+    html = ('<meta property="og:title" content="ASUS RTX 4060"><meta property="product:price:amount" content="15000">'
+            '<meta property="product:availability" content="out of stock">')
+    assert parse_product_page(html) == {"name": "ASUS RTX 4060", "price": 15000, "availability": "Out of Stock"}
+    assert parse_product_page("<html><body>About us</body></html>") is None
+
+
+STORES = ["Sigma"]
+
+
+@pytest.fixture
+def refresher(mock_stores):
+    refresher = CatalogRefresher()
+    assert refresher.refresh(STORES) == []  # the first pass is a baseline
+    assert refresher.last_stats["fetched"] == mock_stores.catalog_size
+    return refresher
+
+
+def test_unchanged_refresh_costs_one_request(mock_stores, refresher):
+    requests = mock_stores.requests
+    assert refresher.refresh(STORES) == []
+    assert mock_stores.requests - requests == 1
+    assert mock_stores.not_modified >= 1
+
+
+def test_repriced_products_are_reported_right_after_the_first_pass(mock_stores, refresher):
+    # The first pass's pages are still in old_stores' page cache
+    change = mock_stores.change_catalog("Sigma", changed=3, added=1, seed=1)
+    events = refresher.refresh(STORES)
+    assert refresher.last_stats["fetched"] == 4
+    repriced = {e["url"] for e in events if e["kind"] in ("price_drop", "price_rise")}
+    assert repriced == set(change["changed"])
+    assert [e["url"] for e in events if e["kind"] == "new"] == change["added"]
+
+
+@pytest.fixture
+def paged(monkeypatch):
+    monkeypatch.setattr(mock_module, "SITEMAP_SIZE", 10)
+
+
+def test_removals_are_found_and_moved_products_are_not(mock_stores, paged, refresher):
+    # Item 5 goes without moving any lastmod, so later items shift down a sitemap page unnoticed;
+    # item 25 changes, so its page of the sitemap is read again and item 20 is missing from it
+    mock_stores.catalog_removed[("sigma-computer.com", "/product/catalog-item-5")] = 0
+    mock_stores.change_product("https://sigma-computer.com/product/catalog-item-25")
+    events = refresher.refresh(STORES)
+    assert {e["url"] for e in events} == {"https://sigma-computer.com/product/catalog-item-25"}
+    assert refresher.last_stats["fetched"] == 2  # item 25, and item 20 to check it still exists
+
+    refresher.full_recheck_after = 0
+    events = refresher.refresh(STORES)
+    assert [(e["kind"], e["url"]) for e in events] == [("gone", "https://sigma-computer.com/product/catalog-item-5")]
+
+
+def test_sitemaps_are_revalidated_with_if_modified_since(mock_stores, refresher):
+    entry = refresher.stores["Sigma"]
+    for record in entry["sitemaps"].values():
+        record.pop("etag", None)
+    assert all(record.get("last_modified") for record in entry["sitemaps"].values())
+
+    refresher.full_recheck_after = 0
+    not_modified = mock_stores.not_modified
+    assert refresher.refresh(STORES) == []
+    assert refresher.last_stats["sitemaps_read"] == 0
+    assert mock_stores.not_modified - not_modified == len(entry["sitemaps"])
+
+
+def test_capped_first_pass_reports_nothing_until_complete(mock_stores):
+    refresher = CatalogRefresher(max_pages=20)
+    assert refresher.refresh(STORES) == [] and refresher.last_stats["pending"] == 10
+    assert refresher.refresh(STORES) == [] and refresher.last_stats["pending"] == 0
+    change = mock_stores.change_catalog("Sigma", changed=2, seed=3)
+    assert {e["url"] for e in refresher.refresh(STORES)} == set(change["changed"])
+
+
+def test_mock_serves_last_modified(mock_stores):
+    response = old_stores.http_get("https://sigma-computer.com/sitemap.xml")
+    assert response.headers["Last-Modified"]
+    again = old_stores.http_get("https://sigma-computer.com/sitemap.xml",
+                                headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert again.status_code == 304
+
+
+def test_parse_args_checks_stores_against_the_sitemap_stores():
+    args = parse_args(["--stores", "Sigma", "--every", "3600", "--only", "gone"])
+    assert (args.stores, args.every, args.only, args.parallel) == (["Sigma"], 3600, {"gone"}, 4)
+    with pytest.raises(SystemExit):
+        parse_args(["--stores", "NoSuchStore"])
@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+import old_stores
+
+
+@pytest.fixture
+def deep(monkeypatch):
+    monkeypatch.setattr(old_stores, "DEEP_TIME_BUDGET", 0.5)
+    token = old_stores.deep_search.set(True)
+    yield
+    old_stores.deep_search.reset(token)
+
+
+def test_slow_caller_keeps_pages_that_landed_in_time(deep):
+    pages = []
+    for items in old_stores.fetch_remaining_pages(5, lambda n: [n]):
+        pages += items
+        time.sleep(0.3)  # enrichment of the page, longer than the budget in total
+    assert sorted(pages) == [2, 3, 4, 5]
+
+
+def test_pages_still_downloading_after_the_budget_are_skipped(deep):
+    def fetch_page(n):
+        time.sleep(0.05 if n == 2 else 2)
+        return [n]
+
+    assert list(old_stores.fetch_remaining_pages(4, fetch_page)) == [[2]]
+
+
+def test_off_outside_deep_mode():
+    assert list(old_stores.fetch_remaining_pages(5, lambda n: [n])) == []
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+import price_engine
+from old_stores import expansion_scope, run_listing_pipeline
+from price_engine import expanded_scraper, query_variants, safe_scraper_wrapper
+
+LISTING = [
+    {"name": f"MSI GeForce RTX 4070 Ventus {i}", "url": f"https://example.com/p/{i}", "price": 30000 + i,
+     "availability": None}
+    for i in range(6)
+]
+
+
+def listing_scraper(stock_func, seen_words=None):
+    def scraper(query):
+        if seen_words is not None:
+            seen_words.append(expansion_scope.get().words)
+        return run_listing_pipeline([dict(item) for item in LISTING], query, stock_func=stock_func)
+    return scraper
+
+
+def test_variants_are_merged_once_per_url():
+    words = []
+    offers = expanded_scraper(listing_scraper(lambda url: "In Stock", words))("rtx 4070")
+    assert len(query_variants("rtx 4070")) == 3
+    assert sorted(offer.url for offer in offers) == sorted(item["url"] for item in LISTING)
+    # Every variant matched on the original query's words
+    assert words == [["rtx", "4070"]] * 3
+
+
+def test_variant_only_offers_are_kept():
+    def scraper(query):
+        items = LISTING[:3] if query == "rtx 4070" else LISTING[2:]
+        return run_listing_pipeline([dict(item, availability="In Stock") for item in items], query)
+
+    offers = expanded_scraper(scraper)("rtx 4070")
+    assert sorted(offer.url for offer in offers) == sorted(item["url"] for item in LISTING)
+
+
+@pytest.mark.parametrize("store", ["ElBadrGroup", "Sigma"])
+def test_a_failed_variant_does_not_lose_products(monkeypatch, store):
+    monkeypatch.setattr(price_engine.time, "sleep", lambda seconds: None)
+    lock = threading.Lock()
+    failures = [1]
+
+    def stock(url):
+        with lock:
+            if failures[0]:
+                failures[0] -= 1
+                raise ConnectionError("connection reset")
+        return "In Stock"
+
+    offers = expanded_scraper(safe_scraper_wrapper(listing_scraper(stock), store))("rtx 4070")
+    # ElBadrGroup is retried; for other stores the remaining variants still cover every product
+    assert sorted(offer.url for offer in offers) == sorted(item["url"] for item in LISTING)
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from fuzzy_search import TrigramIndex, edit_distance, match_mask, name_matches
+
+NAMES = [
+    "MSI GeForce RTX 4070 Ventus 2X 12GB",
+    "ASUS TUF RTX 4070 Ti OC",
+    "Ultrageforce Sticker Pack",
+    "Gigabyte RTX 4060 Eagle",
+    "Samsung 990 Pro 1TB",
+    "Corsair Vengeance DDR5 32GB",
+]
+
+
+@pytest.mark.parametrize("query", [
+    "gforce", "geforce rtx", "rtx4070", "4070ti", "rtx 4060", "vengance ddr5", "samsng", "4070", "stickr",
+])
+def test_match_mask_agrees_with_name_matches(query):
+    words = query.split()
+    expected = [name_matches(name, words) for name in NAMES]
+    assert match_mask(pd.Series(NAMES), words).tolist() == expected
+
+
+def test_typos_match_whole_words_only():
+    assert name_matches(NAMES[0], ["gforce"])
+    assert not name_matches(NAMES[2], ["gforce"])
+    assert match_mask(pd.Series(NAMES), ["gforce"]).tolist() == [True, False, False, False, False, False]
+
+
+def test_model_numbers_never_match_fuzzily():
+    assert not name_matches("Gigabyte RTX 4060 Eagle", ["4070"])
+    assert name_matches("ASUS TUF RTX 4070 Ti OC", ["rtx4070", "4070ti"])
+
+
+def test_edit_distance_counts_a_swap_as_one_edit():
+    assert edit_distance("suepr", "super", 1) == 1
+    assert edit_distance("geforce", "gforce", 2) == 1
+    assert edit_distance("radeon", "nvidia", 2) == 3
+
+
+def test_suggest_corrects_and_splits_words():
+    index = TrigramIndex()
+    index.add_names(NAMES)
+    assert index.suggest("gforce rtx4070")[0] == "geforce rtx 4070"
+    assert index.suggest("rtx 4070") == []
@@ -0,0 +1,31 @@
+from offers import Offer, offers_to_frame
+from price_history import PriceHistory
+from specs import add_specs
+
+
+def offer(name, url, price=30000):
+    return Offer(name=name, url=url, price=price, store="Sigma", availability="In Stock")
+
+
+def test_model_key_ignores_other_numbers(tmp_path):
+    history = PriceHistory(tmp_path)
+    history.append(offers_to_frame([
+        offer("MSI RTX 4070 12GB GDDR6X 192bit", "https://www.sigma-computer.com/a"),
+        offer("ASUS RTX 4070 Ti Super 16GB", "https://www.sigma-computer.com/b"),
+    ]))
+    assert history.query(model="4070")["url"].tolist() == ["https://www.sigma-computer.com/a"]
+    assert history.query(model="4070 ti")["url"].tolist() == ["https://www.sigma-computer.com/b"]
+
+
+def test_model_key_matches_the_spec_column(tmp_path):
+    history = PriceHistory(tmp_path)
+    df = add_specs(offers_to_frame([offer("Intel Core i5-13400F Box", "https://www.sigma-computer.com/c")]))
+    history.append(df)
+    assert history.query()["model"].tolist() == df["model"].astype(str).tolist() == ["13400F"]
+    assert len(history.query(model="13400f")) == 1
+
+
+def test_names_without_a_model(tmp_path):
+    history = PriceHistory(tmp_path)
+    history.append(offers_to_frame([offer("Thermal Paste", "https://www.sigma-computer.com/d", 300)]))
+    assert history.query()["model"].isna().all()
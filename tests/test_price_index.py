@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from offers import AVAILABILITY_VALUES, Offer, offers_to_frame
+from price_engine import PriceIndex, apply_filters, build_sort_index
+from specs import FacetIndex, add_specs
+
+SORTS = ["Price (Low to High)", "Price (High to Low)"]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = random.Random(7)
+    brands = ["MSI", "ASUS", "Gigabyte", "Zotac"]
+    return add_specs(offers_to_frame([
+        Offer(
+            name=f"{rng.choice(brands)} RTX {rng.choice([4060, 4070, 4080])} {rng.choice([8, 12, 16])}GB",
+            url=f"https://example.com/p/{i}",
+            price=rng.randrange(5000, 60000, 500),  # coarse prices, so there are plenty of ties
+            store=rng.choice(["Sigma", "KimoStore", "ElBadrGroup", "AHWStore"]),
+            availability=rng.choice(AVAILABILITY_VALUES),
+        )
+        for i in range(2000)
+    ]))
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("low, high, stock, facets", [
+    (0, 10**9, [], None),
+    (20000, 40000, ["In Stock"], None),
+    (20000, 20000, [], None),
+    (15000, 50000, ["In Stock", "Check site"], {"store": ["Sigma", "KimoStore"]}),
+    (10000, 30000, [], {"brand": ["MSI"], "capacity": ["16GB"], "store": ["AHWStore"]}),
+    (10000, 30000, [], {"store": ["NoSuchStore"]}),
+    (70000, 80000, [], None),
+])
+def test_price_index_views_equal_sorted_views(frame, sort, low, high, stock, facets):
+    facet_index = FacetIndex(frame)
+    expected = apply_filters(frame, low, high, stock, sort, facets=facets, facet_index=facet_index)
+    served = apply_filters(frame, low, high, stock, sort, facets=facets, facet_index=facet_index,
+                           price_index=PriceIndex(frame))
+    pd.testing.assert_frame_equal(served, expected)
+
+
+def test_rows_are_the_range_in_price_order(frame):
+    index = PriceIndex(frame)
+    rows = index.rows(20000, 30000, stores=["Sigma", "KimoStore"], descending=True)
+    prices = frame["price"].to_numpy()[rows]
+    assert np.all(np.diff(prices) <= 0)
+    in_range = (frame["price"].between(20000, 30000) & frame["store"].isin(["Sigma", "KimoStore"])).sum()
+    assert len(rows) == in_range
+
+
+def test_presorted_index_matches_a_plain_sort(frame):
+    index = build_sort_index(frame, "Price (Low to High)")
+    assert frame["price"].to_numpy()[index].tolist() == sorted(frame["price"])
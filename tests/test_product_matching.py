@@ -0,0 +1,77 @@
+import pandas as pd
+
+from product_matching import best_price_view, match_products
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["name", "price", "store", "availability", "url"])
+
+
+def groups(names):
+    return match_products(pd.DataFrame({"name": names})).tolist()
+
+
+def test_spellings_of_one_product_share_a_group():
+    assert groups([
+        "MSI GeForce RTX 4070 Ventus 2X 12GB",
+        "MSI RTX4070 VENTUS 2X 12G",
+        "Msi Rtx 4070 Ventus 2x 12 GB Graphics Card",
+    ]) == [0, 0, 0]
+
+
+def test_model_numbers_brands_and_capacities_split_groups():
+    ids = groups([
+        "MSI GeForce RTX 4070 Ventus 2X 12GB",
+        "MSI GeForce RTX 4070 Ti Ventus 2X 12GB",
+        "ASUS GeForce RTX 4070 Ventus 2X 12GB",
+        "MSI GeForce RTX 4060 Ti Ventus 2X 8GB",
+        "MSI GeForce RTX 4060 Ti Ventus 2X 16GB",
+    ])
+    assert len(set(ids)) == 5
+
+
+def test_a_group_refuses_offers_conflicting_with_any_member():
+    # The capacity-less listing matches both; it must not bridge 8GB and 16GB
+    ids = groups([
+        "MSI GeForce RTX 4060 Ti Ventus 2X 8GB",
+        "MSI GeForce RTX 4060 Ti Ventus 2X",
+        "MSI GeForce RTX 4060 Ti Ventus 2X 16GB",
+    ])
+    assert ids[0] != ids[2]
+    assert ids[1] in (ids[0], ids[2])
+
+
+def test_ids_align_on_the_frame_index():
+    df = pd.DataFrame({"name": ["Kingston Fury 16GB DDR5 5600", "Kingston FURY 16 GB DDR5 5600"]}, index=[7, 3])
+    ids = match_products(df)
+    assert list(ids.index) == [7, 3] and ids.nunique() == 1
+    assert match_products(df.iloc[:0]).empty
+
+
+def test_best_price_view_keeps_the_cheapest_in_stock_offer():
+    df = frame([
+        ("MSI RTX 4070 Ventus 2X 12GB", 31000, "Sigma", "In Stock", "https://a/1"),
+        ("MSI GeForce RTX 4070 Ventus 2X 12G", 29000, "KimoStore", "Out of Stock", "https://b/1"),
+        ("MSI RTX4070 Ventus 2X 12GB", 30000, "ElBadrGroup", "In Stock", "https://c/1"),
+        ("Kingston Fury 16GB DDR5 5600", 3500, "Sigma", "Out of Stock", "https://a/2"),
+    ])
+    view = best_price_view(df)
+    assert view["name"].tolist() == ["Kingston Fury 16GB DDR5 5600", "MSI RTX4070 Ventus 2X 12GB"]
+    gpu = view.iloc[1]
+    assert (gpu["price"], gpu["store"], gpu["stores"], gpu["offers"]) == (30000, "ElBadrGroup", 3, 3)
+    assert (gpu["max_price"], gpu["savings"]) == (31000, 1000)
+    # Nothing in stock: the cheapest offer stands in
+    assert view.iloc[0]["availability"] == "Out of Stock"
+
+
+def test_best_price_view_takes_precomputed_ids():
+    df = frame([
+        ("Samsung 990 Pro 1TB", 6000, "Sigma", "In Stock", "https://a/1"),
+        ("Samsung 990 PRO 1 TB NVMe", 5800, "KimoStore", "In Stock", "https://b/1"),
+        ("Samsung 990 Pro 2TB", 11000, "Sigma", "In Stock", "https://a/2"),
+    ])
+    ids = match_products(df)
+    subset = df.iloc[1:]
+    pd.testing.assert_frame_equal(best_price_view(subset, ids), best_price_view(subset, ids.loc[subset.index]))
+    assert best_price_view(df, ids)["offers"].tolist() == [2, 1]
+    assert list(best_price_view(df.iloc[:0]).columns) == list(best_price_view(df).columns)
@@ -0,0 +1,96 @@
+from functools import partial
+
+import pytest
+
+import old_stores
+from old_stores import TokenBucket, configure_rate_limits
+
+
+class FakeClock:
+    """A monotonic clock that only moves when slept on or advanced"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Buckets made by old_stores run on a fake clock; the configured limits are restored afterwards"""
+    clock = FakeClock()
+    monkeypatch.setattr(old_stores, "TokenBucket", partial(TokenBucket, clock=clock, sleep=clock.sleep))
+    monkeypatch.setattr(old_stores, "STORE_RATE_LIMITS", dict(old_stores.STORE_RATE_LIMITS))
+    monkeypatch.setattr(old_stores, "DEFAULT_RATE_LIMIT", old_stores.DEFAULT_RATE_LIMIT)
+    old_stores._buckets.clear()
+    yield clock
+    old_stores._buckets.clear()
+
+
+def test_burst_is_served_without_waiting():
+    clock = FakeClock()
+    bucket = TokenBucket(2.0, 4, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(4)] == [0.0] * 4
+    assert clock.slept == []
+    # The fifth request waits for one token at 2 per second
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.slept == [pytest.approx(0.5)]
+    assert (bucket.requests, bucket.waited) == (5, pytest.approx(0.5))
+
+
+def test_tokens_refill_at_the_rate_up_to_the_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(4.0, 2, clock=clock, sleep=clock.sleep)
+    bucket.acquire(), bucket.acquire()
+    clock.advance(0.25)  # one token back
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.25)
+    clock.advance(60)  # idle time never banks more than the burst
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.25)
+
+
+def test_waiters_queue_behind_reserved_tokens():
+    clock = FakeClock()
+    bucket = TokenBucket(1.0, 1, clock=lambda: clock.now, sleep=lambda seconds: None)
+    # Nobody sleeps here, so each request reserves the next free slot
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_hosts_have_their_own_buckets(clock):
+    configure_rate_limits({"Sigma": (1.0, 1), "KimoStore": (1.0, 1)})
+    sigma, kimo = "https://www.sigma-computer.com/search?q=rtx", "https://kimostore.net/search?q=rtx"
+    sigma_bucket = old_stores._bucket_for(sigma)
+    assert old_stores._bucket_for(sigma.replace("www.", "")) is sigma_bucket
+    assert old_stores._bucket_for(kimo) is not sigma_bucket
+
+    assert sigma_bucket.acquire() == 0.0
+    assert old_stores._bucket_for(kimo).acquire() == 0.0  # Sigma's empty bucket doesn't hold KimoStore back
+    assert sigma_bucket.acquire() == pytest.approx(1.0)
+    assert set(old_stores.rate_limit_stats()) == {"sigma-computer.com", "kimostore.net"}
+
+
+def test_configure_rate_limits_overrides_and_disables(clock):
+    url, other = "https://kimostore.net/p/1", "https://unknown-shop.example/p/1"
+    configure_rate_limits({"KimoStore": (10.0, 3)}, default=(0.5, 2))
+    bucket = old_stores._bucket_for(url)
+    assert (bucket.rate, bucket.burst) == (10.0, 3)
+    assert (old_stores._bucket_for(other).rate, old_stores._bucket_for(other).burst) == (0.5, 2)
+
+    # Buckets are rebuilt, so a new limit applies right away
+    configure_rate_limits({"KimoStore": (1.0, 1)})
+    assert old_stores._bucket_for(url) is not bucket
+    assert old_stores._bucket_for(url).burst == 1
+    assert old_stores._bucket_for(other).rate == 0.5
+
+    configure_rate_limits({"KimoStore": (0, 1)})
+    assert old_stores._bucket_for(url) is None
@@ -0,0 +1,39 @@
+import numpy as np
+
+from relevance import TokenIndex, relevance_scores
+
+NAMES = [
+    "MSI GeForce RTX 4070 Ventus 2X Dual Fan 12GB",
+    "RTX 4070 backplate",
+    "ASUS TUF RTX 4070 Ti OC 12GB",
+    "Gigabyte RTX 4070 Super Eagle 12GB",
+    "Intel Core i5-12400F Box",
+    "ARGB Case Fan 120mm",
+]
+
+
+def ranking(query):
+    return [NAMES[i] for i in np.argsort(-relevance_scores(NAMES, query), kind="stable")]
+
+
+def test_exact_model_ranks_above_variants_and_accessories():
+    order = ranking("rtx 4070")
+    assert order[0] == "MSI GeForce RTX 4070 Ventus 2X Dual Fan 12GB"
+    assert order.index("RTX 4070 backplate") > order.index("ASUS TUF RTX 4070 Ti OC 12GB")
+
+
+def test_asked_variant_is_boosted():
+    assert ranking("rtx 4070 ti")[0] == "ASUS TUF RTX 4070 Ti OC 12GB"
+    assert ranking("4070 super")[0] == "Gigabyte RTX 4070 Super Eagle 12GB"
+
+
+def test_generic_words_do_not_make_real_products_accessories():
+    assert TokenIndex(NAMES).accessories().tolist() == [False, True, False, False, False, True]
+    assert relevance_scores(NAMES, "12400f").argmax() == NAMES.index("Intel Core i5-12400F Box")
+    scores = relevance_scores(NAMES, "rtx 4070")
+    assert scores[0] > scores[1]
+
+
+def test_accessories_asked_for_are_not_penalised():
+    assert ranking("rtx 4070 backplate")[0] == "RTX 4070 backplate"
+    assert ranking("case fan")[0] == "ARGB Case Fan 120mm"
@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import price_engine
+from offers import Offer
+from old_stores import SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_concurrently(flight, key, func, callers):
+    """Start `callers` calls of func under key while the first one is blocked; returns their futures"""
+    executor = ThreadPoolExecutor(max_workers=callers)
+    coalesced = flight.stats["coalesced"]
+    futures = [executor.submit(flight.do, key, func)]
+    wait_for(lambda: flight.in_flight(key))
+    futures += [executor.submit(flight.do, key, func) for _ in range(callers - 1)]
+    wait_for(lambda: flight.stats["coalesced"] - coalesced == callers - 1)
+    executor.shutdown(wait=False)
+    return futures
+
+
+def test_concurrent_callers_share_one_execution():
+    flight, release, runs = SingleFlight(), threading.Event(), []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return {"page": 1}
+
+    futures = run_concurrently(flight, "url", fetch, 4)
+    release.set()
+    results = [future.result(5) for future in futures]
+    assert len(runs) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats == {"calls": 4, "coalesced": 3}
+
+
+def test_an_exception_reaches_every_waiter():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ConnectionError("connection reset")
+
+    futures = run_concurrently(flight, "url", fetch, 3)
+    release.set()
+    for future in futures:
+        with pytest.raises(ConnectionError, match="connection reset"):
+            future.result(5)
+    assert not flight.in_flight("url")
+
+
+def test_the_key_is_released_after_completion():
+    flight, runs = SingleFlight(), []
+    assert flight.do("url", lambda: runs.append(1) or len(runs)) == 1
+    assert not flight.in_flight("url")
+    assert flight.do("url", lambda: runs.append(1) or len(runs)) == 2
+    with pytest.raises(ValueError):
+        flight.do("url", lambda: int("x"))
+    assert flight.do("url", lambda: runs.append(1) or len(runs)) == 3
+    assert flight.stats == {"calls": 4, "coalesced": 0}
+
+
+def test_identical_searches_share_one_scrape(monkeypatch):
+    release, runs = threading.Event(), []
+
+    def scraper(query):
+        runs.append(query)
+        release.wait(5)
+        return [Offer(name="MSI RTX 4070 Ventus 12GB", url="https://example.com/p/1", price=30000, store="Sigma",
+                      availability="In Stock")]
+
+    monkeypatch.setattr(price_engine, "build_scrapers", lambda *args, **kwargs: {"Sigma": scraper})
+    coalesced = price_engine.search_stats()["coalesced"]
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        first = executor.submit(price_engine.search, "rtx 4070")
+        wait_for(lambda: price_engine.search_in_progress("RTX  4070"))
+        # The same query up to case and spacing
+        others = [executor.submit(price_engine.search, q) for q in ("RTX  4070", " rtx 4070 ")]
+        wait_for(lambda: price_engine.search_stats()["coalesced"] - coalesced == 2)
+        release.set()
+        frames = [future.result(5) for future in [first] + others]
+    assert runs == ["rtx 4070"]
+    assert all(df is frames[0] for df in frames) and len(frames[0]) == 1
+    assert not price_engine.search_in_progress("rtx 4070")
+
+    price_engine.search("rtx 4070")
+    assert runs == ["rtx 4070", "rtx 4070"]
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from specs import FacetIndex, extract_specs, model_label
+
+
+@pytest.mark.parametrize("name, brand, capacity, memory, model", [
+    ("MSI GeForce RTX 4070 Ventus 2X 12GB GDDR6X", "MSI", "12GB", "GDDR6X", "4070"),
+    ("ASUS TUF RTX4070Ti OC 12G", "ASUS", "12GB", None, "4070 Ti"),
+    ("G.Skill Trident Z5 2x16GB DDR5 6000MHz", "G.Skill", "32GB", "DDR5", None),
+    ("Intel Core i5-13400F Box", "Intel", None, None, "13400F"),
+    ("AMD Ryzen 7 7800X3D", "AMD", None, None, "7800X3D"),
+    ("Sapphire Pulse RX 7900 XTX 24GB", "Sapphire", "24GB", None, "7900 XTX"),
+    ("Samsung 990 Pro 2TB NVMe", "Samsung", "2TB", None, "990"),
+])
+def test_extract_specs(name, brand, capacity, memory, model):
+    row = extract_specs(pd.Series([name])).iloc[0]
+    assert [None if pd.isna(v) else v for v in row] == [brand, capacity, memory, model]
+
+
+@pytest.mark.parametrize("name", ["ARGB Case Fan 120mm", "Fan 1500 rpm", "PSU 1000w 80+ Gold", "Monitor 240hz"])
+def test_sizes_and_speeds_are_not_models(name):
+    assert extract_specs(pd.Series([name]))["model"].isna().all()
+
+
+def test_model_label_spells_like_the_model_column():
+    assert model_label("4070 ti") == "4070 Ti"
+    assert model_label("13400f") == "13400F"
+    assert model_label("no model") == "no model"
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "brand": pd.Categorical(["MSI", "ASUS", "MSI", None, "ASUS"]),
+        "capacity": pd.Categorical(["16GB", "16GB", "8GB", "8GB", None], categories=["8GB", "16GB"]),
+        "store": ["Sigma", "Sigma", "KimoStore", "Sigma", "KimoStore"],
+    })
+
+
+def test_facet_mask_is_or_within_and_across_facets(frame):
+    index = FacetIndex(frame)
+    selection = {"brand": ["MSI", "ASUS"], "capacity": ["16GB"]}
+    assert index.mask(selection).tolist() == [True, True, False, False, False]
+    assert index.mask({"store": ["Unknown"]}).tolist() == [False] * 5
+
+
+def test_facet_counts_leave_out_the_facet_itself(frame):
+    index = FacetIndex(frame)
+    counts = index.counts({"brand": ["MSI"]}, base=np.array([True, True, True, True, False]))
+    assert counts["brand"] == {"ASUS": 1, "MSI": 2}
+    assert counts["capacity"] == {"8GB": 1, "16GB": 1}
+    assert counts["store"] == {"KimoStore": 1, "Sigma": 1}
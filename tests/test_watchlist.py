@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import price_engine
+import watchlist
+from watchlist import Watch, Watchlist, diff_offers, offer_hash
+
+
+def entry(name, url, price, availability):
+    return [offer_hash(name, url, price, availability), name, price, availability]
+
+
+def test_diff_offers_reports_each_kind_of_change():
+    old = {
+        "u1": entry("A", "u1", 100, "In Stock"),
+        "u2": entry("B", "u2", 200, "In Stock"),
+        "u3": entry("C", "u3", 300, "Out of Stock"),
+        "u4": entry("D", "u4", 400, "In Stock"),
+    }
+    new = {
+        "u1": entry("A", "u1", 90, "In Stock"),
+        "u2": entry("B", "u2", 200, "Out of Stock"),
+        "u3": entry("C", "u3", 350, "In Stock"),
+        "u5": entry("E", "u5", 500, "In Stock"),
+    }
+    kinds = sorted((event["url"], event["kind"]) for event in diff_offers(old, new))
+    assert kinds == [("u1", "price_drop"), ("u2", "out_of_stock"), ("u3", "back_in_stock"),
+                     ("u3", "price_rise"), ("u4", "gone"), ("u5", "new")]
+
+
+def test_diff_offers_ignores_unchanged_offers_and_unknown_stock_changes():
+    old = {"u1": entry("A", "u1", 100, "In Stock"), "u2": entry("B", "u2", 200, "Check site")}
+    new = {"u1": entry("A", "u1", 100, "In Stock"), "u2": entry("B", "u2", 200, "Out of Stock")}
+    assert diff_offers(old, new) == []
+
+
+def restock(mock, url, availability):
+    """Change the mock product page at url until its stock differs from availability"""
+    from mock_stores import product_body
+    from old_stores import parse_stock_sigma
+
+    while True:
+        revision = mock.change_product(url)
+        _, html = product_body("sigma-computer.com", url.split("sigma-computer.com", 1)[1], 1, revision)
+        if parse_stock_sigma(html) != availability:
+            return
+
+
+def test_recheck_inside_the_page_cache_ttl_sees_stock_changes(mock_stores, monkeypatch):
+    monkeypatch.setattr(watchlist, "FULL_RECHECK_AFTER", 0)  # re-scrape every time, no 304 shortcut
+    watches = Watchlist()
+    assert watches.check([Watch("rtx 4070")], stores=["Sigma"]) == []
+
+    offers = watches.searches["rtx 4070"]["Sigma"]["offers"]
+    url, (_, _, _, availability) = next(iter(offers.items()))
+    restock(mock_stores, url, availability)
+
+    events = watches.check([Watch("rtx 4070")], stores=["Sigma"])
+    assert [(e["url"], e["kind"]) for e in events] == [
+        (url, "back_in_stock" if availability != "In Stock" else "out_of_stock")
+    ]
+
+
+@pytest.fixture
+def history(tmp_path):
+    yield price_engine.configure_history(tmp_path)
+    price_engine.configure_history(None)
+
+
+def test_not_modified_stores_are_not_recorded_again(mock_stores, history):
+    watches = Watchlist()
+    watches.check([Watch("rtx 4070")], stores=["Sigma"])
+    recorded = len(history.query())
+    assert recorded
+
+    watches.check([Watch("rtx 4070")], stores=["Sigma"])
+    assert watches.last_stats["stores_skipped"] == 1
+    assert len(history.query()) == recorded
+
+
+def test_run_schedule_writes_filtered_events_each_round(tmp_path, monkeypatch):
+    rounds, sleeps = [], []
+
+    def check():
+        rounds.append(1)
+        return [{"kind": "price_drop", "url": f"u{len(rounds)}"}, {"kind": "new", "url": "u0"}]
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+
+    output = tmp_path / "events.jsonl"
+    args = watchlist.parse_args(["watch.txt", "--only", "price_drop", "-o", str(output)])
+    assert watchlist.run_schedule(args, check, lambda seconds: "done") == 0
+    monkeypatch.setattr(watchlist.time, "sleep", sleep)
+    args.every = 60
+    with pytest.raises(KeyboardInterrupt):
+        watchlist.run_schedule(args, check, lambda seconds: "done")
+
+    events = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [event["url"] for event in events] == ["u1", "u2", "u3"]
+    assert all(event["kind"] == "price_drop" and event["checked_at"] for event in events)
+    assert len(sleeps) == 2 and all(59 < seconds <= 60 for seconds in sleeps)
+
+
+def test_schedule_args_are_validated():
+    with pytest.raises(SystemExit):
+        watchlist.parse_args(["watch.txt", "--only", "price_drop,cheaper"])
+    with pytest.raises(SystemExit):
+        watchlist.parse_args(["watch.txt", "--stores", "Sigma,NoSuchStore"])
+    args = watchlist.parse_args(["watch.txt", "--stores", "Sigma, KimoStore", "--only", "new"])
+    assert (args.stores, args.only, args.every) == (["Sigma", "KimoStore"], {"new"}, 0)
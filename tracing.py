@@ -0,0 +1,149 @@
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Span recording for profiling a single search. Nothing is recorded unless a
+# Trace is active in the current context; the engine copies the context into
+# its scraper threads, so every store, request and parse step of that search
+# lands in the same trace. Exported in the Chrome trace-event format, which
+# chrome://tracing and https://ui.perfetto.dev open directly.
+
+current_trace = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans (and optionally cProfile stats of the parse steps) for one search"""
+
+    def __init__(self, label="", profile_parse=False):
+        self.label = label
+        self.profile_parse = profile_parse
+        self.spans = []
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._profiles = []
+        # cProfile can only profile one thread at a time, so profiled parse
+        # steps run one by one (their own durations stay meaningful)
+        self._profile_lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        """Record spans from the with-block (and threads started with its context)"""
+        token = current_trace.set(self)
+        if self.started is None:
+            # Re-activating (e.g. to add the render after the scrape) keeps the origin
+            self.started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.finished = time.perf_counter()
+            current_trace.reset(token)
+
+    def add(self, name, phase, store, start, end, **args):
+        span = {
+            "name": name,
+            "phase": phase,
+            "store": store,
+            "start": start,
+            "end": end,
+            "thread": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def profile(self, func, *args):
+        """Run func(*args) under cProfile and keep its stats"""
+        import cProfile
+
+        profiler = cProfile.Profile()
+        with self._profile_lock:
+            profiler.enable()
+            try:
+                return func(*args)
+            finally:
+                profiler.disable()
+                self._profiles.append(profiler)
+
+    @property
+    def duration(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started if self.started is not None else 0.0
+
+    def rows(self):
+        """Spans as plain dicts with start/end in ms from the start of the trace, in start order"""
+        origin = self.started or 0.0
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        return [
+            {
+                "store": s["store"],
+                "phase": s["phase"],
+                "name": s["name"],
+                "start_ms": round((s["start"] - origin) * 1000, 2),
+                "end_ms": round((s["end"] - origin) * 1000, 2),
+                "duration_ms": round((s["end"] - s["start"]) * 1000, 2),
+                **{k: v for k, v in s["args"].items() if v is not None},
+            }
+            for s in spans
+        ]
+
+    def to_chrome_trace(self):
+        """The trace as a Chrome trace-event JSON document (one track per thread)"""
+        origin = self.started or 0.0
+        threads = {}
+        events = [{"ph": "M", "pid": 1, "name": "process_name", "args": {"name": f"search: {self.label}"}}]
+
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        for s in spans:
+            tid = threads.setdefault(s["thread"], len(threads) + 1)
+            events.append({
+                "ph": "X",
+                "pid": 1,
+                "tid": tid,
+                "name": s["name"],
+                "cat": s["phase"],
+                "ts": round((s["start"] - origin) * 1e6, 1),
+                "dur": round((s["end"] - s["start"]) * 1e6, 1),
+                "args": dict(s["args"], store=s["store"]),
+            })
+        for thread, tid in threads.items():
+            events.append({"ph": "M", "pid": 1, "tid": tid, "name": "thread_name", "args": {"name": f"thread {tid}"}})
+
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+    def profile_text(self, limit=40):
+        """Combined cProfile stats of the parse steps, sorted by cumulative time"""
+        if not self._profiles:
+            return ""
+        import pstats
+
+        out = io.StringIO()
+        stats = pstats.Stats(*self._profiles, stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def record(name, phase, store, start, end, **args):
+    """Add a span to the active trace, if any"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, phase, store, start, end, **args)
+
+
+@contextmanager
+def span(name, phase, store, **args):
+    """Time the with-block as a span of the active trace (no-op without one)"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, phase, store, start, time.perf_counter(), **args)
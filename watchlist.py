@@ -0,0 +1,360 @@
+"""
+Watchlist: re-check watched searches and products on a schedule and report
+only what changed since the previous check.
+
+    python watchlist.py watch.txt --state watch-state.json --every 900
+    python watchlist.py watch.txt --only price_drop,back_in_stock -o alerts.jsonl
+
+watch.txt has one watch per line: a search query ("rtx 4070"), or a product
+URL followed by the query that finds it
+("https://www.sigma-computer.com/... rtx 4070"), which only reports changes of
+that product. Blank lines and lines starting with "#" are skipped.
+
+Changes are written as JSON Lines events, one per price or stock change:
+new, gone, price_drop, price_rise, back_in_stock, out_of_stock.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+
+from offers import Offer
+from old_stores import ListingValidators, conditional_listing, configure_parse_pool, pages_since, store_for_url
+from price_engine import (
+    PARSE_PROCESSES, PRICE_HISTORY_DIR, STORE_SCRAPERS, apply_rate_limits, build_scrapers,
+    configure_history, finalize_results, parse_rate_limit, record_history, scrape_stores, search_key,
+)
+
+# Every check scrapes the watched queries like a search does, then diffs the
+# offers per store against the last snapshot: each offer is hashed on
+# (name, url, price, availability) and only offers whose hash changed are
+# looked at. A store whose first listing request comes back 304 Not Modified
+# (old_stores.ListingValidators) isn't scraped at all; its previous offers are
+# carried over. Stock mostly comes from product pages, which a 304 on the
+# listing says nothing about, so a store is fully re-scraped at least every
+# FULL_RECHECK_AFTER seconds. Product pages are read fresh on every check
+# (old_stores.pages_since), never from a cached download of an earlier one, so
+# --every can be shorter than old_stores.PAGE_CACHE_TTL. Carried-over offers
+# are not written to the price history again.
+
+logger = logging.getLogger("watchlist")
+
+FULL_RECHECK_AFTER = 3600
+EVENT_KINDS = ["new", "gone", "price_drop", "price_rise", "back_in_stock", "out_of_stock"]
+
+
+@dataclass(frozen=True)
+class Watch:
+    query: str
+    url: Optional[str] = None  # report only this product's changes
+
+
+def parse_watch(line):
+    """A Watch from a watchlist line, or None for blank and comment lines"""
+    line = " ".join(line.split())
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith(("http://", "https://")):
+        url, _, query = line.partition(" ")
+        if not query:
+            raise ValueError(f"product watch needs the query that finds it: {line}")
+        return Watch(query, url)
+    return Watch(line)
+
+
+def read_watchlist(path):
+    with open(path, encoding="utf-8") as f:
+        return [watch for watch in map(parse_watch, f) if watch is not None]
+
+
+def offer_hash(name, url, price, availability):
+    key = f"{name}\x1f{url}\x1f{price}\x1f{availability}".encode("utf-8")
+    return hashlib.blake2b(key, digest_size=8).hexdigest()
+
+
+def store_snapshots(df):
+    """{store: {url: [hash, name, price, availability]}} of a results frame"""
+    snapshots = {}
+    for name, url, price, store, availability in df[["name", "url", "price", "store", "availability"]].itertuples(
+            index=False, name=None):
+        price, store, availability = int(price), str(store), str(availability)
+        snapshots.setdefault(store, {})[url] = [offer_hash(name, url, price, availability), name, price, availability]
+    return snapshots
+
+
+def snapshot_digest(offers):
+    """One hash over a store's offer hashes: equal digests mean nothing changed"""
+    return hashlib.blake2b("".join(sorted(entry[0] for entry in offers.values())).encode(),
+                           digest_size=8).hexdigest()
+
+
+def diff_offers(old, new):
+    """Change events between two {url: [hash, name, price, availability]} snapshots"""
+    events = []
+    for url, (digest, name, price, availability) in new.items():
+        before = old.get(url)
+        if before is None:
+            events.append({"kind": "new", "name": name, "url": url, "price": price, "availability": availability})
+            continue
+        if before[0] == digest:
+            continue
+        _, _, old_price, old_availability = before
+        base = {"name": name, "url": url, "price": price, "availability": availability}
+        if price != old_price:
+            kind = "price_drop" if price < old_price else "price_rise"
+            events.append(dict(base, kind=kind, old_price=old_price))
+        if availability != old_availability and "In Stock" in (availability, old_availability):
+            kind = "back_in_stock" if availability == "In Stock" else "out_of_stock"
+            events.append(dict(base, kind=kind, old_availability=old_availability))
+    for url in old.keys() - new.keys():
+        _, name, price, availability = old[url]
+        events.append({"kind": "gone", "name": name, "url": url, "price": price, "availability": availability})
+    return events
+
+
+class Watchlist:
+    """
+    Snapshots of the watched searches, kept in a JSON state file between
+    checks (in memory only without one)
+    """
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path
+        self.searches = {}  # normalized query -> {store: snapshot entry}
+        self.last_stats = {}
+        self._lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.searches = json.load(f).get("searches", {})
+
+    def save(self):
+        if not self.state_path:
+            return
+        tmp = f"{self.state_path}.tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"searches": self.searches}, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def check_query(self, query, stores=None):
+        """
+        Re-scrape one query and return its change events. Stores seen for
+        the first time only record a baseline.
+        """
+        key = search_key(query, stores)[0]
+        with self._lock:
+            previous = dict(self.searches.get(key, {}))
+        now = time.time()
+        started = time.monotonic()
+
+        validators = {}
+
+        def conditional(store, scraper):
+            entry = previous.get(store)
+            fresh = entry is not None and now - entry["full_check_at"] < FULL_RECHECK_AFTER
+            validators[store] = ListingValidators(entry["validators"] if fresh else None)
+
+            def run(query):
+                # Runs in the scrape_stores worker's own context copy
+                conditional_listing.set(validators[store])
+                pages_since.set(started)
+                offers = scraper(query)
+                if validators[store].not_modified:
+                    return [Offer(name, url, price, store, availability)
+                            for url, (_, name, price, availability) in entry["offers"].items()]
+                return offers
+            return run
+
+        scrapers = {store: conditional(store, scraper) for store, scraper in build_scrapers(stores).items()}
+        df = finalize_results(scrape_stores(query, scrapers), query)
+        # Offers carried over from a 304 were recorded when they were scraped
+        not_modified = [store for store in scrapers if validators[store].not_modified]
+        record_history(df[~df["store"].isin(not_modified)] if not_modified else df, query)
+        snapshots = store_snapshots(df)
+
+        events = []
+        entries = {}
+        skipped = 0
+        for store in scrapers:
+            offers = snapshots.get(store, {})
+            entry = previous.get(store)
+            if validators[store].not_modified:
+                skipped += 1
+                entries[store] = dict(entry, checked_at=now)
+                continue
+            if not offers and entry and entry["offers"]:
+                # Scrapers turn errors into empty results; don't report a
+                # store's whole catalog as gone because one check failed
+                logger.warning(f"{store} returned nothing for '{query}', keeping its previous offers")
+                entries[store] = entry
+                continue
+
+            digest = snapshot_digest(offers)
+            if entry is not None and entry["digest"] != digest:
+                events += [dict(event, query=query, store=store) for event in diff_offers(entry["offers"], offers)]
+            entries[store] = {
+                "checked_at": now, "full_check_at": now, "validators": validators[store].to_dict(),
+                "digest": digest, "offers": offers,
+            }
+
+        with self._lock:
+            self.searches[key] = dict(self.searches.get(key, {}), **entries)
+            self.last_stats["stores_checked"] = self.last_stats.get("stores_checked", 0) + len(scrapers)
+            self.last_stats["stores_skipped"] = self.last_stats.get("stores_skipped", 0) + skipped
+        return events
+
+    def check(self, watches, stores=None, parallel=2):
+        """
+        Re-check every watched query once (product watches only scrape their
+        product's store) and return the change events the watches ask for
+        """
+        queries = {}  # normalized query -> [query, stores (None = all), watched urls (None = every offer)]
+        for watch in watches:
+            if watch.url is not None and store_for_url(watch.url) not in STORE_SCRAPERS:
+                logger.warning(f"Not a known store's URL, skipped: {watch.url}")
+                continue
+            key = search_key(watch.query, stores)[0]
+            group = queries.setdefault(key, [watch.query, set(), set()])
+            if watch.url is None:
+                group[1] = group[2] = None
+            else:
+                if group[1] is not None:
+                    group[1].add(store_for_url(watch.url))
+                if group[2] is not None:
+                    group[2].add(watch.url)
+
+        self.last_stats = {"queries": len(queries)}
+        events = []
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+            futures = {}
+            for query, watch_stores, urls in queries.values():
+                selected = stores if watch_stores is None else [s for s in watch_stores if not stores or s in stores]
+                if not selected and watch_stores is not None:
+                    continue
+                futures[executor.submit(self.check_query, query, selected)] = (query, urls)
+
+            for future in as_completed(futures):
+                query, urls = futures[future]
+                try:
+                    found = future.result()
+                except Exception as e:
+                    logger.error(f"Re-check failed: {query}: {e}")
+                    continue
+                events += [event for event in found if urls is None or event["url"] in urls]
+
+        self.save()
+        self.last_stats["events"] = len(events)
+        return events
+
+
+def setup_logging():
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def add_schedule_args(parser, action):
+    """
+    Options shared by the scheduled CLIs (this one and catalog_refresh.py);
+    action names one round in the --every help ("re-check", "refresh").
+    Parse with parse_schedule_args.
+    """
+    parser.add_argument("--stores", help="comma-separated store names (default: all stores)")
+    parser.add_argument("--every", type=float, default=0, metavar="SECONDS",
+                        help=f"keep {action}ing at this interval (default: {action} once)")
+    parser.add_argument("--only", help=f"comma-separated event kinds to report ({', '.join(EVENT_KINDS)})")
+    parser.add_argument("-o", "--output", help="append events to this file (default: stdout)")
+    parser.add_argument("--parse-processes", type=int, default=PARSE_PROCESSES)
+    parser.add_argument("--rate-limit", action="append", type=parse_rate_limit, metavar="STORE=RATE[:BURST]",
+                        help="requests per second for a store's hosts, or default=RATE for the rest (repeatable)")
+
+
+def parse_schedule_args(parser, argv, stores):
+    """parser.parse_args, with --only and --stores (checked against stores) split into lists"""
+    args = parser.parse_args(argv)
+    if args.only:
+        args.only = {kind.strip() for kind in args.only.split(",") if kind.strip()}
+        unknown = sorted(args.only - set(EVENT_KINDS))
+        if unknown:
+            parser.error(f"unknown event kinds: {', '.join(unknown)}")
+    if args.stores:
+        args.stores = [s.strip() for s in args.stores.split(",") if s.strip()]
+        unknown = sorted(set(args.stores) - set(stores))
+        if unknown:
+            parser.error(f"unknown stores: {', '.join(unknown)} (known: {', '.join(stores)})")
+    return args
+
+
+def run_schedule(args, check, summary):
+    """
+    Run check() once, or every args.every seconds, writing the events it
+    returns (filtered on args.only) as JSON Lines to args.output or stdout.
+    summary(seconds) describes each round for the log. Returns the exit code.
+    """
+    if args.output:
+        out = open(args.output, "a", encoding="utf-8")
+    else:
+        out = contextlib.nullcontext(sys.stdout)
+
+    # The scrapers print progress to stdout; keep it off the event stream
+    with out as stream, contextlib.redirect_stdout(sys.stderr):
+        while True:
+            started = time.monotonic()
+            checked_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+            for event in check():
+                if not args.only or event["kind"] in args.only:
+                    stream.write(json.dumps(dict(event, checked_at=checked_at), ensure_ascii=False) + "\n")
+            stream.flush()
+            logger.info(summary(time.monotonic() - started))
+            if not args.every:
+                return 0
+            time.sleep(max(0.0, args.every - (time.monotonic() - started)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-check watched searches and report price and stock changes")
+    parser.add_argument("watchlist", help="file with one query, or product URL and query, per line")
+    parser.add_argument("--state", default="watchlist-state.json",
+                        help="snapshot file kept between checks (default: watchlist-state.json)")
+    add_schedule_args(parser, "re-check")
+    parser.add_argument("--parallel", type=int, default=2, help="queries re-checked at the same time")
+    parser.add_argument("--history", default=PRICE_HISTORY_DIR, metavar="DIR",
+                        help="also append every check to the price history in DIR")
+    return parse_schedule_args(parser, argv, STORE_SCRAPERS)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+
+    try:
+        watches = read_watchlist(args.watchlist)
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    if not watches:
+        logger.warning("Nothing to watch")
+        return 0
+
+    configure_parse_pool(args.parse_processes)
+    apply_rate_limits(args.rate_limit)
+    configure_history(args.history)
+    watchlist = Watchlist(args.state)
+
+    def summary(seconds):
+        stats = watchlist.last_stats
+        return (f"{stats['queries']} queries in {seconds:.1f}s: "
+                f"{stats.get('stores_skipped', 0)} of {stats.get('stores_checked', 0)} store scrapes "
+                f"skipped (not modified), {stats['events']} changes")
+
+    return run_schedule(args, lambda: watchlist.check(watches, stores=args.stores, parallel=args.parallel), summary)
+
+
+if __name__ == "__main__":
+    sys.exit(main())